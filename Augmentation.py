@@ -11,10 +11,22 @@ from rtree import index
 import numpy as np
 import math
 import time
+from Indexing import border_geometries, partition_aggregates, source_hash
+from RangeQuery import load_master_rows, owned_coordinates, partition_entries, partition_entry, read_partition
 
 # Ignore all warnings
 warnings.filterwarnings("ignore")
 
+DERIVE_INDEXES = True						# MODIFICA con False per non generare l'indice spaziale dei datasets aumentati (rotazione, rumore, unione)
+REBALANCE_MERGED_INDEXES = False			# MODIFICA con True per raggruppare le partizioni piccole nell'indice spaziale del dataset unito
+
+# Colonne della Master Table e valori di default delle colonne assenti negli indici meno recenti
+MASTER_COLUMNS = ["ID", "NamePartition", "NumberGeometries", "FileSize", "GeometryType", "Format", "PackedFile", "Offset", "Length", "LocalIndex",
+				  "Compression", "CompressionRatio", "DecodeMBps", "Replicated", "xMin", "yMin", "xMax", "yMax",
+				  "DataXMin", "DataYMin", "DataXMax", "DataYMax", "TotalArea", "AvgArea", "AvgWidth", "AvgHeight", "CountGrid",
+				  "SourceSize", "SourceMtime", "SourceHash", "IndexParameters"]
+MASTER_DEFAULTS = {"Format": "csv", "PackedFile": "", "Offset": 0, "Length": 0, "LocalIndex": "", "Compression": "none", "CompressionRatio": 1.0, "DecodeMBps": 0.0}
+
 # FUNZIONE "csvReading":
 # Funzione che legge il file contenente gli input e li restituisce come parametri.
 # Input:  filePath --> file contenente gli input.
@@ -242,18 +254,29 @@ def rotate_boxes(df, cx, cy, angle):
 
 	return new_xmin, new_ymin, new_xmax, new_ymax
 
+# FUNZIONE "read_partition_boxes":
+# Funzione che legge le box di una partizione con "read_partition" di "RangeQuery.py" (CSV o binaria, file dedicato o
+# file dati unico, eventualmente compressa).
+# Input: pathIndex --> percorso contenente l'indice spaziale del dataset;
+# 		 partition --> riga della Master Table relativa alla partizione da leggere (completata da "load_master_rows").
+# Output: df --> DataFrame con le box della partizione (colonne 0, 1, 2, 3).
+def read_partition_boxes(pathIndex, partition):
+	entry = partition_entry(pathIndex, partition, partition["xMax"], partition["yMax"])		# percorso, formato e compressione della partizione
+	return pd.DataFrame(np.array(read_partition(entry, "box"), dtype=float).reshape(-1, 4))	# copia in memoria (le partizioni binarie sono mappate da disco)
+
 # FUNZIONE "rotate_partition":
 # Funzione che legge, ruota e filtra la partizione.
-# Input: input_csv --> percorso dove si trova l'i-esima partizione da ruotare;
+# Input: pathIndex --> percorso contenente l'indice spaziale del dataset;
+# 		 partition --> riga della Master Table relativa all'i-esima partizione da ruotare;
 # 		 angle_degrees --> angolo in gradi con cui ruotare l'i-esima partizione;
 # 		 space_bounds --> limiti dello spazio (default da 0 a 10).
 # Output: filtered_df --> geometrie ruotate appartenenti all'i-esima partizione;
 # 		  removed_count --> eventuali geometrie (boxes) rimosse.
-def rotate_partition(input_csv, angle_degrees, space_bounds=(0, 0, 10, 10)):
+def rotate_partition(pathIndex, partition, angle_degrees, space_bounds=(0, 0, 10, 10)):
 	
 	angle_radians = math.radians(angle_degrees)														# conversione dell'angolo in radianti
 	cx, cy = (space_bounds[2] - space_bounds[0]) / 2, (space_bounds[3] - space_bounds[1]) / 2		# calcolo del centro dello spazio
-	df = pd.read_csv(input_csv, header=None, names=['xmin', 'ymin', 'xmax', 'ymax'])				# lettura del file ".csv" senza intestazione
+	df = read_partition_boxes(pathIndex, partition).set_axis(['xmin', 'ymin', 'xmax', 'ymax'], axis=1)	# lettura della partizione (".csv" senza intestazione o ".bin")
 	new_xmin, new_ymin, new_xmax, new_ymax = rotate_boxes(df, cx, cy, angle_radians)				# ruota tutte le box rispetto al centro indicato con l'angolo indicato
 
 	# Organizza le nuove box in un DataFrame nuovo "rotated_df"
@@ -295,16 +318,17 @@ def rotate_dataset(dataset_name, pathIndexes, output_ds, degree):
 		print(f"<System> The 'Master Table' of '{dataset_name}' not found in folder '{pathIndexes}/{dataset_name}'.")
 		return False
 
-	df_master = pd.read_csv(master_table, sep=',')									# lettura di "master_table"
-	partitions = df_master['NamePartition'].tolist()								# lista delle partizioni di "dataset_name"
+	partitions = load_master_rows(partitions_folder)								# lista delle partizioni di "dataset_name" (righe della Master Table)
 
 	output = []
 	geometry_removed = 0
+	partitions_by_name = {partition['NamePartition']: partition for partition in partitions}			# righe della Master Table per nome della partizione
+	rotated_partitions = []																			# coppie (riga della Master Table, partizione ruotata)
 	with ProcessPoolExecutor(max_workers=4) as executor:
 		futures = {}																					# dizionario per mappare la 'future' al nome della partizione
-		for part_file in partitions:																	# per ogni partizione presente in 'partitions'...
-			path_partition = os.path.join(partitions_folder, part_file)									# percorso dell'i-esima partizione						
-			futures[executor.submit(rotate_partition, path_partition, float(degree))] = part_file		# lancio delle rotazioni in parallelo
+		for partition in partitions:																	# per ogni partizione presente in 'partitions'...
+			part_file = partition['NamePartition']														# nome dell'i-esima partizione
+			futures[executor.submit(rotate_partition, partitions_folder, partition, float(degree))] = part_file	# lancio delle rotazioni in parallelo
 
 		for future in as_completed(futures):															# iterazione sulle "future" che sono terminate
 			part_file = futures[future]
@@ -312,6 +336,7 @@ def rotate_dataset(dataset_name, pathIndexes, output_ds, degree):
 				df_rotate, removed = future.result()													# ottenimento del risultato della task chiamata in precedenza
 				geometry_removed = geometry_removed + removed											# calcolo delle geometrie totali rimosse
 				output.append(df_rotate)																# aggiunta delle geometrie dell'i-esima partizione ruotata
+				rotated_partitions.append((partitions_by_name[part_file], df_rotate))					# partizione ruotata usata per derivare l'indice spaziale
 			except Exception as e:
 				print(f"<System> Failed rotating {part_file}: {e}")
 	
@@ -320,6 +345,9 @@ def rotate_dataset(dataset_name, pathIndexes, output_ds, degree):
 	final_df.to_csv(output_ds, index=False, header=False, quoting=csv.QUOTE_NONE)						# scrittura del file
 
 	print(f"<System> New dataset rotated file was saved at {output_ds}")
+
+	if DERIVE_INDEXES:																					# indice spaziale del dataset ruotato derivato dalle partizioni ruotate
+		derive_index_rotation(rotated_partitions, pathIndexes, os.path.splitext(os.path.basename(output_ds))[0], output_ds)
 	return output_ds, geometry_removed
 
 
@@ -664,8 +692,9 @@ def generate_one_box(args):
 
 def remove_boxes_parallel(disjoint_name, intersecting_name, output_path, num_boxes, pathIndexes):
 	# calcolo quante geometrie bisogna rimuovere in ciascuna partizione
-	disjoint_files = disjoint_name["ID"].tolist()
-	intersecting_files = intersecting_name["ID"].tolist()
+	disjoint_rows = {row["ID"]: row for row in disjoint_name.to_dict("records")}		# righe della Master Table delle partizioni disgiunte
+	disjoint_files = list(disjoint_rows)
+	intersecting_rows = intersecting_name.to_dict("records")							# righe della Master Table delle partizioni intersecanti
 
 	base = num_boxes // len(disjoint_files)					# numero di geometrie da rimuovere per ciascuna partizione (parte intera)
 	extra = num_boxes % len(disjoint_files)					# geometrie da rimuovere e distribuire tra alcune partizioni (parte decimale)
@@ -674,7 +703,7 @@ def remove_boxes_parallel(disjoint_name, intersecting_name, output_path, num_box
 		remove_plan[p] += 1
 	
 	# preparazione delle tasks e invio di quest'ultime per la rimozione delle geometrie
-	tasks = [(f, remove_plan[f], pathIndexes) for f in disjoint_files]
+	tasks = [(disjoint_rows[f], remove_plan[f], pathIndexes) for f in disjoint_files]
 	with Pool(cpu_count()) as pool:
 		results = pool.starmap(process_partition, tasks)
 		
@@ -693,19 +722,19 @@ def remove_boxes_parallel(disjoint_name, intersecting_name, output_path, num_box
 	
 	# leggo le geometrie presenti nelle partizioni che non intersecano la finestra di query
 	intersecting_dfs = []
-	for f in intersecting_files:
-		df_int = pd.read_csv(os.path.join(pathIndexes, f), header=None)
+	for row in intersecting_rows:
+		df_int = read_partition_boxes(pathIndexes, row)
 		intersecting_dfs.append(df_int)
 
 	final_df = pd.concat([final_df] + intersecting_dfs, ignore_index=True)				# concateno lon i risultati dopo la rimozione delle geometrie	
 	final_df.to_csv(output_path, header=False, index=False, quoting=csv.QUOTE_NONE)		# salvataggio del dataset finale
 
-def process_partition(file_path, to_remove, pathIndexes):
+def process_partition(partition, to_remove, pathIndexes):
 	# Se non ci sono geometrie da rimuovere, ritorno l'intera partizione
 	if to_remove <= 0:
-		return pd.read_csv(os.path.join(pathIndexes, file_path), header=None), 0
+		return read_partition_boxes(pathIndexes, partition), 0
     
-	df = pd.read_csv(os.path.join(pathIndexes, file_path), header=None)		# lettura delle geometrie presenti nella partizione
+	df = read_partition_boxes(pathIndexes, partition)						# lettura delle geometrie presenti nella partizione
 	remove_count = min(to_remove, len(df))									# se ci sono meno geometrie rispetto al numero da rimuovere, rimuovo quelle possibili
 	drop_idx = random.sample(range(len(df)), remove_count)					# scelgo random le geometrie da rimuovere
 	df_kept = df.drop(drop_idx)												# rimozione delle geometrie
@@ -889,7 +918,7 @@ def extract_numbers(dataset_name) -> str:
 	numbers = number.replace("dataset", "")
 	return numbers
 
-def generate_dataset_merge(pathDatasets, dataset1, dataset2, folder_output):
+def generate_dataset_merge(pathDatasets, dataset1, dataset2, folder_output, pathIndexes=None):
 	# composizione del nome del nuovo dataset combinato
 	n1, n2 = extract_numbers(dataset1), extract_numbers(dataset2)			# numero dataset_1 e dataset_2
 	dsNew_path = f"{folder_output}/dataset_{n1}_{n2}_combined.csv"			# percorso del file contenente il nuovo dataset
@@ -906,7 +935,228 @@ def generate_dataset_merge(pathDatasets, dataset1, dataset2, folder_output):
 		combined_dataset = pd.concat([dataset1_csv, dataset2_csv], ignore_index=True)				# concatenazione dei due datasets
 		combined_dataset.to_csv(dsNew_path, index=False, header=False, quoting=csv.QUOTE_NONE)		# salvataggio in un file ".csv"
 
+	# se richiesto e non ancora presente, derivo l'indice spaziale del nuovo dataset da quelli dei due datasets uniti
+	if DERIVE_INDEXES and pathIndexes is not None and not os.path.exists(f"{pathIndexes}/{dsNew_name}_spatialIndex/master_table.csv"):
+		derive_index_merge(dataset1, dataset2, dsNew_name, pathIndexes, dsNew_path, REBALANCE_MERGED_INDEXES)
+
 	return dsNew_name
+# -----------------------------------------------------------------------------------------------------------------------------------------------------------
+
+
+# -----------------------------------------------------------------------------------------------------------------------------------------------------------
+# Funzioni usate per DERIVARE l'indice spaziale dei datasets aumentati da quello del dataset di partenza!
+
+# FUNZIONE "save_master_rows":
+# Funzione che salva la Master Table dell'indice spaziale derivato (ID rinumerati da 0), con il dataset da cui è derivato
+# (come in "Indexing.py", così che l'indice non venga considerato da ricostruire) e i parametri di partizionamento
+# degli indici di partenza (lasciati vuoti se diversi tra loro).
+# Input: pathIndex --> percorso dell'indice spaziale derivato;
+# 		 rows --> righe della Master Table (dizionari);
+# 		 pathDataset --> percorso del dataset aumentato;
+# 		 parent_rows --> righe delle Master Table di partenza.
+def save_master_rows(pathIndex, rows, pathDataset, parent_rows):
+	parameters = {row.get("IndexParameters") for row in parent_rows if isinstance(row.get("IndexParameters"), str)}
+	source_stat = os.stat(pathDataset)
+	source = {
+		"SourceSize": source_stat.st_size,
+		"SourceMtime": source_stat.st_mtime_ns,
+		"SourceHash": source_hash(pathDataset),
+		"IndexParameters": parameters.pop() if len(parameters) == 1 else ""
+	}
+	for new_id, row in enumerate(rows):
+		row["ID"] = new_id
+		row.update(source)
+	pd.DataFrame(rows, columns=MASTER_COLUMNS).to_csv(os.path.join(pathIndex, "master_table.csv"), index=False)
+
+# FUNZIONE "reference_partition":
+# Funzione che riusa, senza copiarla, una partizione dell'indice di partenza: i nomi dei file vengono resi relativi
+# alla cartella dell'indice derivato ("../datasetN_spatialIndex/partition_3.csv"); la colonna 'Replicated' resta invariata.
+# Input: row --> riga della Master Table di partenza;
+# 		 parentIndex --> percorso dell'indice spaziale di partenza;
+# 		 pathIndex --> percorso dell'indice spaziale derivato.
+# Output: row --> riga della Master Table derivata.
+def reference_partition(row, parentIndex, pathIndex):
+	relative = os.path.relpath(parentIndex, pathIndex)								# cartella di partenza vista da quella derivata
+	row = dict(row)
+	for column in ("NamePartition", "PackedFile", "LocalIndex"):
+		if isinstance(row[column], str) and row[column] != "":
+			row[column] = os.path.join(relative, row[column])
+	return row
+
+# FUNZIONE "write_partition_boxes":
+# Funzione che salva una partizione dell'indice derivato (un file per partizione, nel formato indicato) e ne
+# restituisce la riga della Master Table (statistiche calcolate da "partition_aggregates" di "Indexing.py").
+# Input: pathIndex --> percorso dell'indice spaziale derivato;
+# 		 partition_id --> numero della partizione;
+# 		 boxes --> array (numero box x 4) con le box della partizione;
+# 		 formatPartition --> formato del file della partizione ('csv' o 'binary');
+# 		 bounds --> finestra della partizione (None --> MBR effettivo delle box);
+# 		 replicated --> box salvate anche in altre partizioni (0 --> nessuna, None --> regola del centroide).
+# Output: row --> riga della Master Table derivata.
+def write_partition_boxes(pathIndex, partition_id, boxes, formatPartition, bounds=None, replicated=0):
+	boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+	if formatPartition == "binary":													# colonne float64 xmin, ymin, xmax, ymax consecutive
+		name = f"partition_{partition_id}.bin"
+		content = np.ascontiguousarray(boxes.T, dtype="<f8").tobytes()
+	else:																			# CSV senza intestazione
+		name = f"partition_{partition_id}.csv"
+		content = pd.DataFrame(boxes).to_csv(index=False, header=False).encode()
+	with open(os.path.join(pathIndex, name), "wb") as file:
+		file.write(content)
+	if bounds is None:																# finestra pari all'MBR effettivo delle box
+		bounds = (boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max())
+	return {
+		**MASTER_DEFAULTS,
+		"ID": partition_id,
+		"NamePartition": name,
+		"NumberGeometries": len(boxes),
+		"FileSize": len(content),
+		"GeometryType": "BOX",
+		"Format": formatPartition,
+		"Length": len(content),
+		"Replicated": replicated,
+		"xMin": bounds[0], "yMin": bounds[1], "xMax": bounds[2], "yMax": bounds[3],
+		**partition_aggregates(boxes, bounds)
+	}
+
+# FUNZIONE "derive_index_rotation":
+# Funzione che genera l'indice spaziale del dataset ruotato: ogni partizione ruotata diventa una partizione dell'indice
+# derivato, con finestra ricalcolata come MBR delle box ruotate. Ogni box del dataset ruotato si trova in una sola
+# partizione (le copie delle box replicate sono righe distinte del dataset), quindi 'Replicated' è zero.
+# Input: rotated_partitions --> lista di coppie (riga della Master Table di partenza, DataFrame delle box ruotate);
+# 		 pathIndexes --> percorso contenente gli indici spaziali;
+# 		 rotated_dataset_name --> nome del dataset ruotato (senza estensione);
+# 		 pathDataset --> percorso del dataset ruotato.
+def derive_index_rotation(rotated_partitions, pathIndexes, rotated_dataset_name, pathDataset):
+	pathIndex = f"{pathIndexes}/{rotated_dataset_name}_spatialIndex"
+	os.makedirs(pathIndex, exist_ok=True)
+	rows = []
+	for row, df_rotate in rotated_partitions:
+		if len(df_rotate) > 0:														# le partizioni rimaste vuote dopo la rotazione non vengono salvate
+			rows.append(write_partition_boxes(pathIndex, len(rows), df_rotate.to_numpy(), row["Format"]))
+	save_master_rows(pathIndex, rows, pathDataset, [row for row, _ in rotated_partitions])
+	print(f"<System> Spatial index of '{rotated_dataset_name}' derived from the rotated partitions ({len(rows)} partitions).")
+
+# FUNZIONE "derive_index_merge":
+# Funzione che genera l'indice spaziale del dataset unito riusando le partizioni dei due indici di partenza (le Master
+# Table vengono concatenate). Con "rebalance" le partizioni piccole e vicine vengono raggruppate (fasce verticali e, in
+# ciascuna fascia, ordinamento per y) fino al numero massimo di geometrie per partizione dei due indici di partenza: le
+# partizioni raggruppate, e quelle con box condivise con altre partizioni, vengono riscritte con le sole box di cui sono
+# proprietarie ("owned_coordinates" di "RangeQuery.py"), così che ogni box compaia una sola volta ('Replicated' pari a zero).
+# Input: dataset1, dataset2 --> nomi dei datasets uniti;
+# 		 dsNew_name --> nome del dataset unito;
+# 		 pathIndexes --> percorso contenente gli indici spaziali;
+# 		 pathDataset --> percorso del dataset unito;
+# 		 rebalance --> TRUE per raggruppare le partizioni piccole.
+def derive_index_merge(dataset1, dataset2, dsNew_name, pathIndexes, pathDataset, rebalance=False):
+	pathIndex = f"{pathIndexes}/{dsNew_name}_spatialIndex"
+	os.makedirs(pathIndex, exist_ok=True)
+	partitions = []																	# terne (cartella indice di partenza, riga della Master Table, partizione)
+	for dataset in (dataset1, dataset2):
+		parentIndex = f"{pathIndexes}/{dataset}_spatialIndex"
+		parent_rows = load_master_rows(parentIndex)
+		partitions += [(parentIndex, row, entry) for row, entry in zip(parent_rows, partition_entries(parentIndex, parent_rows))]
+
+	groups = [[partition] for partition in partitions]								# senza ribilanciamento ogni partizione resta da sola
+	if rebalance and partitions:
+		target = max(row["NumberGeometries"] for _, row, _ in partitions)			# numero massimo di geometrie per partizione
+		centers = np.array([((row["xMin"] + row["xMax"]) / 2, (row["yMin"] + row["yMax"]) / 2) for _, row, _ in partitions])
+		n_slabs = max(1, math.ceil(math.sqrt(len(partitions))))
+		order_x = np.argsort(centers[:, 0], kind="stable")
+		groups = []
+		for slab in np.array_split(order_x, n_slabs):								# fasce verticali di partizioni
+			current, count = [], 0
+			for i in slab[np.argsort(centers[slab, 1], kind="stable")]:				# partizioni della fascia ordinate per y
+				size = partitions[i][1]["NumberGeometries"]
+				if current and count + size > target:
+					groups.append(current)
+					current, count = [], 0
+				current.append(partitions[i])
+				count += size
+			if current:
+				groups.append(current)
+
+	rows = []
+	for group in groups:
+		if len(group) == 1 and (not rebalance or group[0][2]["replicated"] == 0):	# partizione riusata così com'è
+			parentIndex, row, _ = group[0]
+			rows.append(reference_partition(row, parentIndex, pathIndex))
+			continue
+		owned = []																	# box di cui le partizioni del gruppo sono proprietarie (una sola copia per box)
+		for parentIndex, row, entry in group:
+			boxes = read_partition_boxes(parentIndex, row).to_numpy()
+			owned.append(boxes[owned_coordinates(entry, boxes)])
+		boxes = np.concatenate(owned)
+		if len(boxes) > 0:
+			rows.append(write_partition_boxes(pathIndex, len(rows), boxes, group[0][1]["Format"]))
+	save_master_rows(pathIndex, rows, pathDataset, [row for _, row, _ in partitions])
+	print(f"<System> Spatial index of '{dsNew_name}' derived from '{dataset1}' and '{dataset2}' ({len(rows)} partitions).")
+
+# FUNZIONE "derive_index_noise":
+# Funzione che genera l'indice spaziale del dataset con rumore modificando solo le partizioni interessate: le box aggiunte
+# vengono inserite nelle partizioni che intersecano (in una sola, se l'indice di partenza non replica le box) oppure, se
+# nessuna partizione ne è proprietaria ("owned_coordinates" di "RangeQuery.py"), in una nuova partizione; le box rimosse
+# vengono tolte dalle partizioni che le contengono; tutte le altre partizioni vengono riusate. Per le partizioni
+# riscritte 'Replicated' viene ricalcolato come in "saving_partitions" di "Indexing.py".
+# Input: dataset_name --> nome del dataset di partenza;
+# 		 new_dataset_name --> nome del dataset con rumore;
+# 		 input_dataset --> percorso del dataset di partenza;
+# 		 output_path --> percorso del dataset con rumore;
+# 		 pathIndexes --> percorso contenente gli indici spaziali.
+def derive_index_noise(dataset_name, new_dataset_name, input_dataset, output_path, pathIndexes):
+	parentIndex = f"{pathIndexes}/{dataset_name}_spatialIndex"
+	pathIndex = f"{pathIndexes}/{new_dataset_name}_spatialIndex"
+	os.makedirs(pathIndex, exist_ok=True)
+	rows = load_master_rows(parentIndex)
+	entries = partition_entries(parentIndex, rows)
+	copies = any(entry["replicated"] != 0 for entry in entries)					# box salvate in tutte le partizioni intersecate (replica o regola del centroide)
+
+	# differenza (come multinsieme) tra il dataset di partenza e quello con rumore
+	columns = [0, 1, 2, 3]
+	parent_df = pd.read_csv(input_dataset, sep=',', header=None, names=columns).assign(count=1)
+	new_df = pd.read_csv(output_path, sep=',', header=None, names=columns).assign(count=-1)
+	counts = pd.concat([parent_df, new_df]).groupby(columns)["count"].sum()
+	removed = np.repeat(np.array(counts[counts > 0].index.tolist()).reshape(-1, 4), counts[counts > 0].to_numpy(), axis=0)
+	added = np.repeat(np.array(counts[counts < 0].index.tolist()).reshape(-1, 4), -counts[counts < 0].to_numpy(), axis=0)
+
+	rtree_idx = build_rtree_from_rsgrove(pd.DataFrame(rows))						# finestre delle partizioni di partenza
+	to_remove = {}																	# partizione --> box da rimuovere
+	for b in removed:
+		for pid in rtree_idx.intersection(tuple(b)):
+			to_remove.setdefault(pid, []).append(b)
+	to_add = {}																		# partizione --> box da aggiungere
+	orphans = []																	# box di cui nessuna partizione è proprietaria
+	for b in added:
+		targets = list(rtree_idx.intersection(tuple(b)))
+		owners = [pid for pid in targets if owned_coordinates(entries[pid], b.reshape(1, 4))[0]]
+		if owners:
+			for pid in (targets if copies else owners[:1]):
+				to_add.setdefault(pid, []).append(b)
+		else:
+			orphans.append(b)
+
+	new_rows = []
+	for pid, row in enumerate(rows):
+		if pid not in to_remove and pid not in to_add:								# partizione non interessata: viene riusata
+			new_rows.append(reference_partition(row, parentIndex, pathIndex))
+			continue
+		boxes = read_partition_boxes(parentIndex, row).to_numpy()
+		keep = np.ones(len(boxes), dtype=bool)
+		for b in to_remove.get(pid, []):											# rimozione di una copia per ciascuna box rimossa (a meno dell'arrotondamento della rilettura dei ".csv")
+			match = np.flatnonzero(keep & np.isclose(boxes, b, rtol=1e-12, atol=0).all(axis=1))
+			if len(match) > 0:
+				keep[match[0]] = False
+		boxes = np.concatenate([boxes[keep]] + [np.array(to_add.get(pid, [])).reshape(-1, 4)])
+		bounds = (row["xMin"], row["yMin"], row["xMax"], row["yMax"])				# la finestra della partizione resta invariata
+		replicated = entries[pid]["replicated"]										# regola del centroide (None) o nessuna replica mantenute
+		if replicated is not None and copies:										# box condivise con le partizioni adiacenti
+			replicated = border_geometries(boxes, bounds)
+		new_rows.append(write_partition_boxes(pathIndex, pid, boxes, row["Format"], bounds, replicated))
+	if orphans:																		# box salvate solo nella nuova partizione
+		new_rows.append(write_partition_boxes(pathIndex, len(rows), np.array(orphans), rows[0]["Format"] if rows else "csv"))
+	save_master_rows(pathIndex, new_rows, output_path, rows)
+	print(f"<System> Spatial index of '{new_dataset_name}' derived from '{dataset_name}' ({len(to_remove.keys() | to_add.keys())} partitions patched, {len(orphans)} orphan geometries).")
+# -----------------------------------------------------------------------------------------------------------------------------------------------------------
 
 
 
@@ -1283,9 +1533,9 @@ def main():
 							except FileNotFoundError:												# se il file non viene aperto correttamente, stampa messaggio di errore
 								print("File not found. Exiting.")
 							
-							df = pd.read_csv(file_path, sep=',')									# lettura della tabella ricapitolativa dell'indice spaziale
+							df = pd.DataFrame(load_master_rows(os.path.dirname(file_path)))			# lettura della tabella ricapitolativa dell'indice spaziale (colonne assenti completate)
 							coordinates_df = df[['xMin', 'yMin', 'xMax', 'yMax']]					# estrazione delle coordinate delle finestre di ciascuna partizione del dataset in questione
-							name_df = df[['NamePartition']]											# estrazione dei nomi di ciascuna partizione del dataset in questione														
+							name_df = df																# righe della Master Table (ID, nome e posizione del file) di ciascuna partizione del dataset in questione														
 							minX = selected_row['minX']												# estrazione di minX della finestra correlata alla range query scelta
 							minY = selected_row['minY']												# estrazione di minY della finestra correlata alla range query scelta
 							maxX = selected_row['maxX']												# estrazione di maxX della finestra correlata alla range query scelta
@@ -1490,6 +1740,8 @@ def main():
 								# aggiornamento dei file	
 								new_dataset_name = str(output_dataset).replace('.csv', '')											# nome nuovo dataset, senza estensione ".csv"
 								update_dataset_param(dataset_name, new_dataset_name, count_geom_tot, path_nameSummary, path_nameNewDatasets)
+								if DERIVE_INDEXES:																					# indice spaziale del nuovo dataset derivato da quello di partenza
+									derive_index_noise(dataset_name, new_dataset_name, input_dataset, output_path, pathIndexes)
 								if param_to_categorize == "cardinality":
 									update_range_query_param2(file_index, new_dataset_name, selected_cardinality, bin_label, path_nameRangeQueriesResult)
 								else:
@@ -1550,7 +1802,7 @@ def main():
 										dsNew_cardinality = rq1_features / dsNew_features															# nuova cardinalità
 										if lower_bound <= dsNew_cardinality <= upper_bound:															# se rientra nel bin selezionato, allora ho trovato i candidati giusti
 											print("<System> A query was found that met the required parameters. Saving the new combined dataset.")
-											dsNew_name = generate_dataset_merge(pathDatasets, dataset1, dataset2, folder_output)					# generazione del nuovo dataset
+											dsNew_name = generate_dataset_merge(pathDatasets, dataset1, dataset2, folder_output, pathIndexes)					# generazione del nuovo dataset
 											update_dataset_param(dataset1, dsNew_name, dsNew_features, path_nameSummary, path_nameNewDatasets)
 											update_rq_merge(rq1_row, dsNew_name, dsNew_cardinality, bin_label, path_nameRangeQueriesResult)
 											finish = True
@@ -1572,7 +1824,7 @@ def main():
 										dsNew_cardinality = rq2_features / dsNew_features															# nuova cardinalità
 										if lower_bound <= dsNew_cardinality <= upper_bound:															# se rientra nel bin selezionato, allora ho trovato i candidati giusti
 											print("<System> A query was found that met the required parameters. Saving the new combined dataset.")
-											dsNew_name = generate_dataset_merge(pathDatasets, dataset1, dataset2, folder_output)					# generazione del nuovo dataset
+											dsNew_name = generate_dataset_merge(pathDatasets, dataset1, dataset2, folder_output, pathIndexes)					# generazione del nuovo dataset
 											update_dataset_param(dataset2, dsNew_name, dsNew_features, path_nameSummary, path_nameNewDatasets)
 											update_rq_merge(rq2_row, dsNew_name, dsNew_cardinality, bin_label, path_nameRangeQueriesResult)
 											finish = True
@@ -1586,7 +1838,7 @@ def main():
 								rq_features = rq_cardinality * ds1_features																			# numero di geometrie nella range query selezionata
 								dsNew_cardinality = rq_features / dsNew_features																	# nuova cardinalità
 								print("<System> A query was found that met the required parameters. Saving the new combined dataset.")
-								dsNew_name = generate_dataset_merge(pathDatasets, dataset1, dataset2, folder_output)								# generazione del nuovo dataset
+								dsNew_name = generate_dataset_merge(pathDatasets, dataset1, dataset2, folder_output, pathIndexes)								# generazione del nuovo dataset
 								update_dataset_param(dataset1, dsNew_name, dsNew_features, path_nameSummary, path_nameNewDatasets)
 								update_rq_merge(rq_row, dsNew_name, dsNew_cardinality, bin_label, path_nameRangeQueriesResult)
 								finish = True
@@ -279,16 +279,14 @@ def fd2D (from_x, to_x, start_x, end_x, start_y, end_y, file_name, delim):
 	# Computing box counting for E2
 	x = np.zeros((DIM-1))							# Scala logaritmica della dimensione delle celle
 	y = np.zeros((DIM-1))							# Misura della frammentazione
+	blocks = hist									# Griglia corrente: a ogni passo le celle vengono raggruppate 2x2
 	for i in range(DIM-1):							# Analisi su varie dimensioni di box (i=0 celle originali, i=1 celle a coppie, i=2 celle a terzetti...)
-		sm = 0.0
 		step = pow(2,i)								# Quanto raggruppare le celle
 		print("<System>           i: ", i)
-		for j in range(0,pow(2,DIM),step):			# Scorrimento verticale della griglia
-			if (j % 1000 == 0):
-				print ("<System>           j: ", j)
-			for k in range(0,pow(2,DIM),step):		# Scorrimento orizzontale della griglia
-				h = hist[j:j+step,k:k+step]			# Prendo un gruppo di celle (estrazione di una sottomatrice di celle)
-				sm += pow(np.sum(h),2)				# Somma il numero di elementi nel blocco e lo eleva al quadrato
+		if (i > 0):									# Somma dei blocchi 2x2 della griglia precedente (= blocchi step x step di 'hist')
+			n = blocks.shape[0] // 2
+			blocks = blocks.reshape(n, 2, n, 2).sum(axis=(1,3))
+		sm = float(np.sum(blocks * blocks))			# Somma dei quadrati del numero di elementi in ciascun blocco (in un'unica operazione vettoriale)
 		print("<System>           sm: ", sm)
 
 		# Salvataggio dei valori logaritmici per ogni i analizzata
@@ -337,14 +335,9 @@ def fd (from_x, to_x, start, end, file_name, field_name, delim):
 	x = np.zeros((DIM-1))													# Scala logaritmica della dimensione delle celle
 	y = np.zeros((DIM-1))													# Misura della frammentazione
 	for i in range(DIM-1):													# Analisi su varie dimensioni di celle (i=0 celle originali, i=1 celle a coppie, i=2 celle a quartetti...)
-		sm = 0.0
 		step = pow(2,i)														# Quanto raggruppare le celle
-		for j in range(0,pow(2,DIM),step):									# Scorrimento delle celle dell'istogramma
-			h = hist[j:j+step]												# Prendo un gruppo di celle (estrazione di una sottomatrice di celle)
-			if (step == 1):													# h è una singola cella
-				sm += pow(h[0],2)											# Somma il numero di elementi nella singola cella e lo eleva al quadrato
-			else:															# h è una sequenza di celle
-				sm += pow(np.sum(h),2)										# Somma il numero di elementi nel blocco e lo eleva al quadrato
+		h = hist.reshape(-1, step).sum(axis=1)								# Gruppi consecutivi di 'step' celle (un valore per gruppo)
+		sm = float(np.sum(h * h))											# Somma dei quadrati del numero di elementi in ciascun gruppo
 		
 		# Salvataggio dei valori logaritmici per ogni i analizzata
 		x[i] = math.log(cell_width * step,2)								# Log in base 2 della dimensione della box
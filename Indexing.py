@@ -1,62 +1,149 @@
 import geopandas as gpd
+import hashlib
+import itertools
 import logging
 import math
+import numpy as np
 import os
 import pandas as pd
+import shapely
+import shutil
+import threading
 import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from multiprocessing import Pool, cpu_count
-from shapely import wkt
+from rtree import index
+from shapely import STRtree, wkt
 from shapely.geometry import box, Point
 
+PARTITION_ALGORITHMS = ["quadtree", "str", "hilbert", "workload"]					# Algoritmi di partizionamento selezionabili dall'utente
+PARTITION_FORMATS = ["csv", "binary"]												# Formati selezionabili per i file delle partizioni
+PARTITION_STORES = ["files", "packed"]												# Modalità selezionabili per la memorizzazione delle partizioni
+LOCAL_INDEXES = ["none", "rtree"]													# Indici locali selezionabili da salvare accanto a ciascuna partizione
+PARTITION_COMPRESSIONS = ["none", "zlib", "delta", "quantized"]						# Compressioni selezionabili per il contenuto delle partizioni
+COMPRESSION_LEVEL = 1																# Livello di compressione zlib (1 = il più veloce)
+QUANTIZATION_MAX = 2 ** 32 - 1														# Valore massimo delle coordinate quantizzate (uint32) con la compressione 'quantized'
+PACKED_FILE = "partitions.dat"														# Nome del file dati unico usato con la memorizzazione 'packed'
+MASTER_RTREE = "master_rtree"														# Nome (senza estensione) dell'RTree globale delle partizioni salvato accanto alla Master Table
+WRITER_QUEUE = 4																	# Partizioni in attesa di scrittura per ciascun thread di scrittura (oltre il limite il partizionamento attende)
+AGGREGATE_GRID = 4																	# Celle per lato della griglia dei conteggi salvata nella Master Table per ciascuna partizione
+HASH_CHUNK = 1024 * 1024															# Bytes letti per volta nel calcolo dell'impronta (hash) del file del dataset
+STREAM_GRID = 256																	# Celle per lato dell'istogramma dei centri usato per calcolare i confini in modalità streaming
+SMALL_DATASET = 64 * 1024 * 1024													# Dimensione (bytes) sotto la quale i dataset vengono raggruppati in un'unica task per processo
+PARTITION_LOAD_COST = 500															# Costo di caricamento di una partizione (espresso in numero di geometrie testate) usato dal partizionamento 'workload'
+OPTIONAL_COLUMNS = {																# Colonne facoltative del file 'indexParameters.csv' con il relativo valore di default
+	"algorithmPartition": "quadtree",												# Algoritmo di partizionamento da applicare al dataset
+	"pathRangeQueries": "",															# Cartella contenente il file delle range queries (carico di lavoro previsto)
+	"nameRangeQueries": "",															# Nome del file delle range queries (rqI_datasetDate_Time_UniqueCode.csv)
+	"formatPartition": "csv",														# Formato dei file delle partizioni ('csv' testuale o 'binary' a colonne)
+	"storePartition": "files",														# Memorizzazione delle partizioni ('files': un file per partizione, 'packed': unico file dati)
+	"localIndex": "none",															# Indice locale da salvare per ciascuna partizione ('none' o 'rtree')
+	"compressPartition": "none",													# Compressione del contenuto delle partizioni ('none', 'zlib', 'delta' o 'quantized')
+	"memoryBudget": 0,																# Budget di memoria in MB per l'indicizzazione in streaming (0 = dataset caricato interamente in memoria)
+	"sampleSize": 0,																# Geometrie del campione su cui calcolare i confini delle partizioni (0 = confini calcolati sull'intero dataset)
+	"writerThreads": 4																# Thread che scrivono le partizioni in background durante il partizionamento (0 = scrittura sincrona)
+}
+
 # -------------------------------------------------------------------------------------------------------------------------------
 # FUNZIONE 'analyze_csv':
 def analyze_csv(file_path):
 
 	"""
 	Funzione che passato in ingresso un file '.csv', restituisce liste corrispondenti alle colonne del file
-	in ingresso (le colonne sono 'pathDatasets', 'nameDatasets', 'pathIndexes', 'typePartitions', 'num'):
+	in ingresso (le colonne sono 'pathDatasets', 'nameDatasets', 'pathIndexes', 'typePartitions', 'num', seguite
+	eventualmente dalle colonne facoltative presenti in OPTIONAL_COLUMNS):
 	--> PARAMETRI IN INGRESSO: percorso del file (filePath);
-	--> PARAMETRI IN USCITA: DataFrame con ciascuna riga un dataset composta da (["pathDatasets", "nameDataset", "pathIndexes", "typePartition", "num"]).
+	--> PARAMETRI IN USCITA: DataFrame con ciascuna riga un dataset composta da (["pathDatasets", "nameDataset", "pathIndexes", "typePartition", "num"]
+							 + colonne facoltative, riempite con il valore di default se assenti).
 	"""
 
 	df = pd.read_csv(file_path, sep=';')
 	expected = ["pathDatasets", "nameDataset", "pathIndexes", "typePartition", "num"]
-	if df.columns.tolist() != expected:
-		raise ValueError(f"[Main] <System> ERROR: the CSV header expected is '{expected}'...")
+	columns = df.columns.tolist()
+	if columns[:len(expected)] != expected or not set(columns[len(expected):]).issubset(OPTIONAL_COLUMNS):
+		raise ValueError(f"[Main] <System> ERROR: the CSV header expected is '{expected}' (optional columns: '{list(OPTIONAL_COLUMNS)}')...")
+	for column, default in OPTIONAL_COLUMNS.items():								# Le colonne facoltative assenti (o con celle vuote) prendono il valore di default
+		if column not in df.columns:
+			df[column] = default
+		df[column] = df[column].fillna(default)
 	return df
 
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'index_batch_wrapper':
+def index_batch_wrapper(batch):
+	results = []
+	for args in batch:															# Dataset piccoli raggruppati in un'unica task --> un solo invio al processo
+		results.extend(index_dataset_wrapper(args))
+	return results
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'pack_tasks':
+def pack_tasks(tasks, workers):
+
+	"""
+	Funzione che raggruppa le tasks da inviare ai processi: ogni dataset grande resta una task a sé, mentre i dataset
+	piccoli (sotto 'SMALL_DATASET' bytes) vengono distribuiti in al più 'workers' gruppi di dimensione totale simile,
+	così da pagare i costi fissi di invio una volta per gruppo e non una volta per dataset.
+	--> PARAMETRI IN INGRESSO: tasks da eseguire (pathDatasets, nameDataset, configurations) (tasks);
+							   numero di processi disponibili (workers).
+	--> PARAMETRI IN USCITA: lista di gruppi di tasks, dal gruppo più pesante al più leggero.
+	"""
+
+	def task_size(task):
+		path = os.path.join(task[0], task[1])
+		return os.path.getsize(path) if os.path.isfile(path) else 0		# Dataset inesistente --> l'errore viene segnalato dal processo
+
+	sized = sorted(((task_size(task), task) for task in tasks), key=lambda item: -item[0])
+	batches = [(size, [task]) for size, task in sized if size >= SMALL_DATASET]		# Dataset grandi --> una task ciascuno
+	small = [(size, task) for size, task in sized if size < SMALL_DATASET]
+	bins = [[0, []] for _ in range(min(workers, len(small)))]						# Gruppi di dataset piccoli (dimensione totale, tasks)
+	for size, task in small:														# Assegnazione greedy al gruppo più leggero (dal dataset più grande)
+		lightest = min(bins, key=lambda b: b[0])
+		lightest[0] += size
+		lightest[1].append(task)
+	batches.extend((total, group) for total, group in bins)
+	batches.sort(key=lambda item: -item[0])											# Prima i gruppi più pesanti (meno attesa finale)
+	return [group for _, group in batches]
+
 # -------------------------------------------------------------------------------------------------------------------------------
 # FUNZIONE 'index_dataset_wrapper':
 def index_dataset_wrapper(args):
 	print("<System> WORKER STARTED:", args)
-	try:
-		pathDatasets, nameDataset, pathIndexes, typePartition, num = args				# Valori passati legati alla task da eseguire
-    
-		logging.info("")
-		logging.info(f"<System> Partitioning '{nameDataset}'!")
-		
-		start = time.perf_counter()
-		
-		index_dataset(
-			pathDatasets,
-			nameDataset,
-			pathIndexes,
-			typePartition,
-			int(num)
-		)
-		
-		end = time.perf_counter()
-		logging.info(f"<System> Time for partitioning '{nameDataset}': {end - start:.6f}")
+	pathDatasets, nameDataset, configurations = args							# Valori passati legati alla task da eseguire (un dataset e le sue configurazioni)
+	dataset = {}																# Dataset caricato una sola volta e condiviso tra le configurazioni
+	results = []																# Esito di ciascuna configurazione (pathIndexes, messaggio)
+	outcomes = {"built": "OK", "current": "UP TO DATE", "skipped": "SKIPPED"}
+	for pathIndexes, typePartition, num, options in configurations:
+		try:
+			logging.info("")
+			logging.info(f"<System> Partitioning '{nameDataset}' ('{typePartition}' = '{num}', indexes in '{pathIndexes}')!")
+			
+			start = time.perf_counter()
+			
+			status = index_dataset(
+				pathDatasets,
+				nameDataset,
+				pathIndexes,
+				typePartition,
+				int(num),
+				options,
+				dataset
+			)
+			
+			end = time.perf_counter()
+			logging.info(f"<System> Time for partitioning '{nameDataset}': {end - start:.6f}")
 
-		return f"OK - {nameDataset}"
+			results.append((pathIndexes, f"{outcomes[status]} - {nameDataset} ('{typePartition}' = '{num}', indexes in '{pathIndexes}')"))
 
-	except Exception as e:
-		print(f"<System> ERROR processing {args[1]} -> {e}")
-		return f"ERROR - {args[1]} -> {e}"
+		except Exception as e:
+			print(f"<System> ERROR processing {nameDataset} -> {e}")
+			results.append((pathIndexes, f"ERROR - {nameDataset} ('{typePartition}' = '{num}', indexes in '{pathIndexes}') -> {e}"))
+	return [(pathDatasets, nameDataset, pathIndexes, message) for pathIndexes, message in results]
 
 # -------------------------------------------------------------------------------------------------------------------------------
 # FUNZIONE 'index_dataset':
-def index_dataset(pathDatasets, nameDataset, pathIndex, typePartition, num):
+def index_dataset(pathDatasets, nameDataset, pathIndex, typePartition, num, options=None, dataset=None):
 
 	"""
 	Funzione che, passato in ingresso le informazioni sul dataset in questione,	effettua la partizione
@@ -65,28 +152,71 @@ def index_dataset(pathDatasets, nameDataset, pathIndex, typePartition, num):
  							   nome dataset (nameDataset);
 							   cartella in cui inserire l'indice spaziale (pathIndex);
  							   tipologia partizione (typePartition);
-							   numero associato al tipo di partizione (num).
+							   numero associato al tipo di partizione (num);
+							   parametri facoltativi letti da 'indexParameters.csv' (options);
+							   dataset già caricato da una configurazione precedente dello stesso dataset, aggiornato al primo
+							   caricamento ({'gdf', 'numGeom', 'typeGeom'}, None per non condividerlo) (dataset).
+	--> PARAMETRI IN USCITA: esito della configurazione ('built' indice costruito, 'current' indice già aggiornato,
+							 'skipped' parametri non validi o dataset inesistente).
 	"""
 
+	options = {**OPTIONAL_COLUMNS, **(options or {})}									# Parametri facoltativi non specificati --> valori di default
+	algorithmPartition = options["algorithmPartition"]									# Algoritmo di partizionamento scelto dall'utente
+	formatPartition = options["formatPartition"]										# Formato dei file delle partizioni scelto dall'utente
+	storePartition = options["storePartition"]											# Modalità di memorizzazione delle partizioni scelta dall'utente
+	localIndex = options["localIndex"]													# Indice locale delle partizioni scelto dall'utente
+	compressPartition = options["compressPartition"]									# Compressione delle partizioni scelta dall'utente
+	try:
+		memoryBudget = float(options["memoryBudget"])									# Budget di memoria (MB) per l'indicizzazione in streaming
+		sampleSize = int(options["sampleSize"])											# Dimensione del campione per il calcolo dei confini
+		writerThreads = int(options["writerThreads"])									# Thread di scrittura delle partizioni in background
+	except ValueError:
+		logging.info(f"<System> Partitioning skipped for this dataset. Error: the memory budget '{options['memoryBudget']}', the sample size '{options['sampleSize']}' or the writer threads '{options['writerThreads']}' are incorrect!")
+		return "skipped"
+	budget_bytes = int(memoryBudget * 1024 * 1024)
+
 	# 1. Costruzione percorsi utili ---------------------------------------------------------------------------------------------
 	pathDataset = os.path.join(pathDatasets, nameDataset)								# Costruzione del percorso contenente il dataset [datasets/datasetsData_Time_UniqueCode | datasetNumber.ext => datasets/datasetsData_Time_UniqueCode/datasetNumber.ext]
 	if not os.path.exists(pathDataset):													# Verifica dell'esistenza del dataset nella cartella
 		logging.info(f"<System> Dataset '{pathDataset}' does not exist!")
-		return
+		return "skipped"
 	
 	folderIndexes = os.path.join(pathIndex, os.path.basename(pathDatasets))				# Costruzione del percorso che conterrà l'indici spaziali dei dataset in questione [indexes | datasets/datasetsData_Time_UniqueCode => indexes/datasetsData_Time_UniqueCode]
 	nameD, extD = os.path.splitext(nameDataset)											# Nome del dataset e estensione di quest'ultimo [datasetNumber.ext => datasetNumber | .ext]
 	outputIndex = os.path.join(folderIndexes, f"{nameD}_spatialIndex")					# Costruzione del percorso che conterrà l'indice spaziale dell'iesimo dataset [indexes/datasetsData_Time_UniqueCode | datasetNumber => indexes/datasetsData_Time_UniqueCode/datasetNumber]
+	source_stat = os.stat(pathDataset)													# Dimensione e data di modifica del dataset al momento dell'indicizzazione
+	parameters = index_parameters(typePartition, num, options, memoryBudget, sampleSize)	# Parametri di partizionamento da cui dipende l'indice
+	status = index_status(outputIndex, pathDataset, source_stat, parameters)
+	if status == "current":																# Indice già aggiornato rispetto a dataset e parametri --> nessuna ricostruzione
+		logging.info(f"<System> Spatial index '{outputIndex}' is up to date, partitioning skipped!")
+		return "current"
+	if status == "stale":																# Indice non più corrispondente al dataset --> ricostruito da zero
+		logging.info(f"<System> Spatial index '{outputIndex}' is stale, it will be rebuilt!")
+		shutil.rmtree(outputIndex)
 	os.makedirs(outputIndex, exist_ok=True)												# Generazione del percorso contenente l'indice spaziale
 
 	# 2. Caricamento del dataset in questione in una struttura dati (GeoDataFrame) ----------------------------------------------
 	logging.info(f"<System> Generation DataFrame for dataset '{nameDataset}'.")
 	start_time_generationDataFrame = time.perf_counter()
 	try:
-		gdf, numGeom, typeGeom = load_dataset(pathDataset, extD)
+		if budget_bytes > 0:																			# Modalità streaming: il dataset viene solo scandito a blocchi (numero di geometrie, finestra, istogramma dei centri)
+			chunk_rows = stream_chunk_rows(pathDataset, budget_bytes)
+			numGeom, bounds, typeGeom, histogram, sample = scan_dataset(pathDataset, extD, chunk_rows, max(0, sampleSize))
+			logging.info(f"<System>      Streaming mode: memory budget '{memoryBudget}' MB, '{chunk_rows}' rows per chunk")
+		else:
+			if dataset:																					# Dataset già caricato per un'altra configurazione: nessuna nuova lettura
+				gdf, numGeom, typeGeom = dataset["gdf"], dataset["numGeom"], dataset["typeGeom"]
+				logging.info("<System>      Dataset already loaded, shared with the previous configurations")
+			else:
+				gdf, numGeom, typeGeom = load_dataset(pathDataset, extD)
+				if dataset is not None:																	# Condivisione con le configurazioni successive dello stesso dataset
+					dataset.update(gdf=gdf, numGeom=numGeom, typeGeom=typeGeom)
+			bounds = gdf.total_bounds
+			if sampleSize > 0:																			# Campione casuale uniforme (seme fisso) su cui calcolare i confini
+				sample = gdf.iloc[np.sort(np.random.default_rng(0).choice(numGeom, size=min(sampleSize, numGeom), replace=False))]
 	except ValueError as e:
 		logging.info(f"<System> Generation DataFrame skipped for this dataset. Error: {e}")
-		return
+		return "skipped"
 	total_time_generationDataFrame = float(time.perf_counter() - start_time_generationDataFrame)
 	logging.info(f"<System>      Time taken: {total_time_generationDataFrame:.6f} s")
 
@@ -94,13 +224,33 @@ def index_dataset(pathDatasets, nameDataset, pathIndex, typePartition, num):
 	logging.info(f"<System> Calculate the number of geometries for each partition and the number of partitions to perform for the dataset '{nameDataset}'.")
 	start_time_calculatePartition = time.perf_counter()
 	try:
+		if algorithmPartition not in PARTITION_ALGORITHMS:								# L'utente ha inserito un algoritmo di partizionamento non conforme a quelli possibili
+			raise ValueError(f"<System>      The partition algorithm '{algorithmPartition}' is incorrect!")
+		if formatPartition not in PARTITION_FORMATS:									# L'utente ha inserito un formato delle partizioni non conforme a quelli possibili
+			raise ValueError(f"<System>      The partition format '{formatPartition}' is incorrect!")
+		if storePartition not in PARTITION_STORES:										# L'utente ha inserito una modalità di memorizzazione non conforme a quelle possibili
+			raise ValueError(f"<System>      The partition store '{storePartition}' is incorrect!")
+		if localIndex not in LOCAL_INDEXES:												# L'utente ha inserito un indice locale non conforme a quelli possibili
+			raise ValueError(f"<System>      The local index '{localIndex}' is incorrect!")
+		if compressPartition not in PARTITION_COMPRESSIONS:								# L'utente ha inserito una compressione non conforme a quelle possibili
+			raise ValueError(f"<System>      The partition compression '{compressPartition}' is incorrect!")
+		if compressPartition in ["delta", "quantized"] and (formatPartition != "binary" or typeGeom == 3):	# Coordinate a colonne disponibili solo per POINT e BOX in formato binario
+			logging.info(f"<System>      The partition compression '{compressPartition}' requires 'binary' point or box partitions, 'zlib' will be applied!")
+			compressPartition = "zlib"
+			options = {**options, "compressPartition": compressPartition}				# Compressione effettiva delle partizioni (i parametri dell'indice restano quelli richiesti)
+		if budget_bytes < 0 or (budget_bytes > 0 and sampleSize <= 0 and algorithmPartition != "quadtree"):	# Senza campione la modalità streaming calcola i confini con le regole del QuadTree
+			raise ValueError(f"<System>      The memory budget '{memoryBudget}' is incorrect for the partition algorithm '{algorithmPartition}'!")
+		queries = query_ids = None
 		n_partitions, n_geometries = calculation_parameters_partitioning(pathDataset, typePartition, num, numGeom)
-		minx, miny, maxx, maxy = gdf.total_bounds							# Calcolo della dimensione della finestra di dataset
+		if algorithmPartition == "workload":											# Il partizionamento 'workload' ha bisogno delle range queries relative al dataset
+			queries, query_ids = load_workload(options["pathRangeQueries"], options["nameRangeQueries"], nameD)
+			logging.info(f"<System>      Number of range queries in the workload: '{len(queries)}'")
+		minx, miny, maxx, maxy = bounds										# Calcolo della dimensione della finestra di dataset
 		dataset_area = (maxx - minx) * (maxy - miny)						# Calcolo dell'area contenente il dataset in questione
 		min_area = dataset_area / (n_partitions * 4)						# Calcolo dell'area minima per ciascuna partizione
 	except ValueError as e:
 		logging.info(f"<System> Partitioning skipped for this dataset. Error: {e}")
-		return
+		return "skipped"
 	total_time_calculatePartition = float(time.perf_counter() - start_time_calculatePartition)
 	logging.info(f"<System>      Number of geometries requested by the user for each partition: '{n_geometries}'")
 	logging.info(f"<System>      Number of partitions requested by the user: '{n_partitions}'")
@@ -108,9 +258,36 @@ def index_dataset(pathDatasets, nameDataset, pathIndex, typePartition, num):
 	logging.info(f"<System>      Time taken: {total_time_calculatePartition:.6f} s")
 
 	# 4. Costruzione delle partizioni richieste per la realizzazione dell'indice spaziale -------------------------------------
-	logging.info(f"<System> Construction of partitions using quadtree algorithm on the dataset '{nameDataset}'.")
+	logging.info(f"<System> Construction of partitions using {algorithmPartition} algorithm on the dataset '{nameDataset}'.")
 	start_time_computeQuadtree = time.perf_counter()
-	time_saving, master_rows = compute_quadtree(gdf, n_geometries, min_area, outputIndex, typeGeom)
+	packed_path = os.path.join(outputIndex, PACKED_FILE)
+	if os.path.exists(packed_path):																		# Il file dati unico viene riscritto da zero ad ogni indicizzazione
+		os.remove(packed_path)
+	boundaries = None
+	if sampleSize > 0:																					# Confini delle partizioni calcolati sul solo campione
+		max_bytes = num if typePartition == "bytes" else None
+		boundaries = sample_boundaries(sample, typeGeom, algorithmPartition, n_geometries, max_bytes, min_area, bounds, numGeom, queries)
+	writer = start_writer(writerThreads)															# Le partizioni vengono scritte in background mentre si calcolano le successive
+	try:
+		if budget_bytes > 0:																			# Partizionamento in streaming (memoria limitata dal budget)
+			time_saving, master_rows = compute_streaming(pathDataset, extD, bounds, histogram, boundaries, n_geometries, min_area, outputIndex, typeGeom, budget_bytes, chunk_rows, options, writer)
+		elif boundaries is not None:																	# Assegnazione in un unico passaggio ai confini calcolati sul campione
+			time_saving, master_rows = compute_sampled(gdf, boundaries, n_geometries, min_area, outputIndex, typeGeom, options, writer)
+		elif algorithmPartition == "str":																# Partizionamento Sort-Tile-Recursive (partizioni bilanciate)
+			time_saving, master_rows = compute_str(gdf, n_geometries, outputIndex, typeGeom, options, writer)
+		elif algorithmPartition == "hilbert":															# Partizionamento lungo la curva di Hilbert (unico ordinamento)
+			max_bytes = num if typePartition == "bytes" else None										# Con 'bytes' le partizioni vengono tagliate in base al peso
+			time_saving, master_rows = compute_hilbert(gdf, n_geometries, max_bytes, outputIndex, typeGeom, options, writer)
+		elif algorithmPartition == "workload":															# Partizionamento guidato dalle range queries previste
+			time_saving, master_rows = compute_workload(gdf, n_geometries, min_area, outputIndex, typeGeom, queries, query_ids, options, writer)
+		else:																							# Partizionamento QuadTree (default)
+			time_saving, master_rows = compute_quadtree(gdf, n_geometries, min_area, outputIndex, typeGeom, options, writer)
+		start_time_wait = time.perf_counter()															# Attesa delle scritture ancora in corso (righe della Master Table complete)
+		wait_writer(writer)
+		time_saving += float(time.perf_counter() - start_time_wait)
+	finally:
+		if writer is not None:
+			writer["executor"].shutdown(wait=True)
 	total_time_computeQuadtree = float((time.perf_counter() - start_time_computeQuadtree) - time_saving)
 	logging.info(f"<System>      Time taken: {total_time_computeQuadtree:.6f} s")
 	logging.info(f"<System> Saving partitions to folder '{outputIndex}'.")
@@ -120,14 +297,19 @@ def index_dataset(pathDatasets, nameDataset, pathIndex, typePartition, num):
 	logging.info(f"<System> Creating and saving the summary 'MasterTable' containing the spatial index related to the dataset '{nameDataset}'.")
 	start_time_masterTable = time.perf_counter()
 	df_master = pd.DataFrame(master_rows)
+	df_master["SourceSize"] = source_stat.st_size										# Dataset da cui è stato costruito l'indice (per riconoscere gli indici non aggiornati)
+	df_master["SourceMtime"] = source_stat.st_mtime_ns
+	df_master["SourceHash"] = source_hash(pathDataset)
+	df_master["IndexParameters"] = parameters
 	out_path_table = os.path.join(outputIndex, f"master_table.csv")
 	df_master.to_csv(out_path_table, index=False)
+	saving_master_rtree(df_master, os.path.join(outputIndex, MASTER_RTREE))			# RTree globale già costruito (nessun inserimento riga per riga in fase di query)
 	total_time_masterTable = float(time.perf_counter() - start_time_masterTable)
 	logging.info(f"<System>      Time taken: {total_time_masterTable:.6f} s")
 
 	# 6. Identifico se ci sono state geometrie duplicate (e quante ce ne sono in più) o meno ----------------------------------
 	total_partition_geom = int(df_master["NumberGeometries"].sum())				# Numero totale di geometrie nelle partizioni generate
-	difference = total_partition_geom - len(gdf)								# Numero di geometrie in più rispetto al dataset iniziale
+	difference = total_partition_geom - numGeom								# Numero di geometrie in più rispetto al dataset iniziale
 	if difference < 0:															# C'è stata perdita di geometrie (difference < 0)
 		logging.info(f"<System> There were {-difference} lost geometries!")
 	elif difference == 0:														# Non ci sono state duplicazioni o perdite di geometrie (difference = 0)
@@ -135,6 +317,166 @@ def index_dataset(pathDatasets, nameDataset, pathIndex, typePartition, num):
 	else:																		# Ci sono state duplicazioni di geometrie (difference > 0)
 		logging.info(f"<System> There were {difference} duplicate geometries!")
 
+	# 7. Report di qualità dell'indice spaziale generato ----------------------------------------------------------------------
+	logging.info(f"<System> Creating and saving the quality report of the spatial index related to the dataset '{nameDataset}'.")
+	if queries is None and options["nameRangeQueries"]:						# Carico di lavoro indicato dall'utente ma non usato dal partizionamento
+		try:
+			queries, _ = load_workload(options["pathRangeQueries"], options["nameRangeQueries"], nameD)
+		except ValueError as e:
+			logging.info(f"<System>      Pruning ratio not estimated. Error: {e}")
+	report = quality_report(df_master, numGeom, bounds, queries)
+	pd.DataFrame([{
+		"datasetName": nameD,
+		"algorithmPartition": algorithmPartition,
+		"typePartition": typePartition,
+		"num": num,
+		**report
+	}]).to_csv(os.path.join(outputIndex, "quality_report.csv"), sep=';', index=False)
+	logging.info(f"<System>      Partitions: '{report['partitions']}', depth: '{report['minDepth']}'-'{report['maxDepth']}', replication factor: '{report['replicationFactor']:.3f}'")
+	logging.info(f"<System>      Overlap area: '{report['overlapArea']:.6f}', dead space: '{report['deadSpace']:.6f}', pruning ratio: '{report['pruningRatio']}'")
+	return "built"
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'index_parameters':
+def index_parameters(typePartition, num, options, memoryBudget, sampleSize):
+
+	"""
+	Funzione che riassume in una stringa i parametri di partizionamento da cui dipende il contenuto dell'indice spaziale
+	(il numero di thread di scrittura non cambia le partizioni generate e non viene quindi riportato).
+	--> PARAMETRI IN INGRESSO: tipologia partizione (typePartition);
+							   numero associato al tipo di partizione (num);
+							   parametri facoltativi letti da 'indexParameters.csv' (options);
+							   budget di memoria in MB (memoryBudget) e dimensione del campione (sampleSize) già convertiti.
+	--> PARAMETRI IN USCITA: stringa 'chiave=valore' separati da '|' (parameters).
+	"""
+
+	values = {
+		"typePartition": typePartition,
+		"num": int(num),
+		"algorithmPartition": options["algorithmPartition"],
+		"pathRangeQueries": options["pathRangeQueries"],
+		"nameRangeQueries": options["nameRangeQueries"],
+		"formatPartition": options["formatPartition"],
+		"storePartition": options["storePartition"],
+		"localIndex": options["localIndex"],
+		"compressPartition": options["compressPartition"],
+		"memoryBudget": memoryBudget,
+		"sampleSize": sampleSize
+	}
+	return "|".join(f"{key}={value}" for key, value in values.items())
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'source_hash':
+def source_hash(pathDataset):
+
+	"""
+	Funzione che calcola l'impronta (SHA-256) del contenuto del file del dataset, letto a blocchi di HASH_CHUNK bytes.
+	--> PARAMETRI IN INGRESSO: percorso del dataset (pathDataset).
+	--> PARAMETRI IN USCITA: impronta esadecimale del file.
+	"""
+
+	digest = hashlib.sha256()
+	with open(pathDataset, "rb") as f:
+		for block in iter(lambda: f.read(HASH_CHUNK), b""):
+			digest.update(block)
+	return digest.hexdigest()
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'index_status':
+def index_status(outputIndex, pathDataset, source_stat, parameters):
+
+	"""
+	Funzione che confronta l'indice spaziale già presente su disco con il dataset e i parametri di partizionamento attuali.
+	L'impronta del file viene ricalcolata solo se la data di modifica è cambiata ma la dimensione no.
+	--> PARAMETRI IN INGRESSO: cartella dell'indice spaziale (outputIndex);
+							   percorso del dataset (pathDataset);
+							   dimensione e data di modifica attuali del dataset (source_stat);
+							   parametri di partizionamento attuali (parameters).
+	--> PARAMETRI IN USCITA: 'missing' se l'indice non esiste, 'current' se è aggiornato, 'stale' se va ricostruito.
+	"""
+
+	path_table = os.path.join(outputIndex, "master_table.csv")
+	if not os.path.exists(path_table):												# Indice mai costruito (o costruzione interrotta)
+		return "missing"
+	df = pd.read_csv(path_table, dtype={"SourceHash": str, "IndexParameters": str})
+	columns = ["SourceSize", "SourceMtime", "SourceHash", "IndexParameters"]
+	if df.empty or not set(columns).issubset(df.columns):							# Indici generati senza i dati del dataset di origine --> non verificabili
+		return "stale"
+	row = df.iloc[0]
+	if row["IndexParameters"] != parameters or int(row["SourceSize"]) != source_stat.st_size:
+		return "stale"
+	if int(row["SourceMtime"]) == source_stat.st_mtime_ns:
+		return "current"
+	return "current" if row["SourceHash"] == source_hash(pathDataset) else "stale"	# File modificato (o copiato) ma con lo stesso contenuto
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'quality_report':
+def quality_report(df_master, numGeom, bounds, queries=None):
+
+	"""
+	Funzione che calcola le misure di qualità dell'indice spaziale a partire dalla sua master table:
+	- numero di partizioni e profondità (livello del QuadTree equivalente all'area di ciascuna partizione);
+	- geometrie e bytes per partizione (minimo, mediana, massimo);
+	- area di sovrapposizione tra le finestre delle partizioni (somma sulle coppie) e spazio morto (area delle
+	  partizioni non coperta dall'MBR delle geometrie contenute);
+	- fattore di replica (geometrie salvate / geometrie del dataset);
+	- rapporto di pruning stimato sul carico di lavoro (frazione di partizioni e di geometrie escluse in media da ogni query).
+	--> PARAMETRI IN INGRESSO: master table dell'indice (df_master);
+							   numero di geometrie del dataset (numGeom);
+							   finestra del dataset (bounds);
+							   array (numQuery x 4) con le finestre delle queries, None se non disponibile (queries).
+	--> PARAMETRI IN USCITA: dizionario con le misure di qualità (report).
+	"""
+
+	boxes = df_master[["xMin", "yMin", "xMax", "yMax"]].to_numpy(dtype=float)
+	data_boxes = df_master[["DataXMin", "DataYMin", "DataXMax", "DataYMax"]].to_numpy(dtype=float)
+	counts = df_master["NumberGeometries"].to_numpy(dtype=float)
+	sizes = df_master["FileSize"].to_numpy(dtype=float)
+	areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+	window_area = (bounds[2] - bounds[0]) * (bounds[3] - bounds[1])
+	valid = areas > 0
+	depths = np.log(window_area / areas[valid]) / np.log(4) if window_area > 0 and valid.any() else np.zeros(1)	# Area di una foglia di livello d = area / 4^d
+
+	overlap = 0.0
+	for i in range(len(boxes) - 1):																		# Intersezione di ciascuna partizione con le successive
+		w = np.minimum(boxes[i, 2], boxes[i + 1:, 2]) - np.maximum(boxes[i, 0], boxes[i + 1:, 0])
+		h = np.minimum(boxes[i, 3], boxes[i + 1:, 3]) - np.maximum(boxes[i, 1], boxes[i + 1:, 1])
+		overlap += float((np.clip(w, 0, None) * np.clip(h, 0, None)).sum())
+
+	cover_w = np.clip(np.minimum(boxes[:, 2], data_boxes[:, 2]) - np.maximum(boxes[:, 0], data_boxes[:, 0]), 0, None)
+	cover_h = np.clip(np.minimum(boxes[:, 3], data_boxes[:, 3]) - np.maximum(boxes[:, 1], data_boxes[:, 1]), 0, None)
+	dead_space = float(areas.sum() - (cover_w * cover_h)[counts > 0].sum())						# Le partizioni vuote sono interamente spazio morto
+
+	report = {
+		"partitions": len(df_master),
+		"minDepth": int(np.rint(depths.min())),
+		"maxDepth": int(np.rint(depths.max())),
+		"minGeometries": int(counts.min()),
+		"medianGeometries": float(np.median(counts)),
+		"maxGeometries": int(counts.max()),
+		"minBytes": int(sizes.min()),
+		"medianBytes": float(np.median(sizes)),
+		"maxBytes": int(sizes.max()),
+		"overlapArea": overlap,
+		"deadSpace": dead_space,
+		"deadSpaceRatio": dead_space / areas.sum() if areas.sum() > 0 else 0.0,
+		"replicationFactor": counts.sum() / numGeom if numGeom > 0 else 0.0,
+		"queries": 0,
+		"avgPartitionsPerQuery": None,
+		"avgGeometriesPerQuery": None,
+		"pruningRatio": None,
+		"geometriesPruningRatio": None
+	}
+	if queries is not None and len(queries) > 0:														# Stima del pruning sul carico di lavoro previsto
+		partitions, geometries = workload_statistics(boxes, counts, queries)
+		report["queries"] = len(queries)
+		report["avgPartitionsPerQuery"] = float(partitions.mean())
+		report["avgGeometriesPerQuery"] = float(geometries.mean())
+		report["pruningRatio"] = 1 - float(partitions.mean()) / len(boxes)
+		report["geometriesPruningRatio"] = 1 - float(geometries.mean()) / counts.sum() if counts.sum() > 0 else 0.0
+	return report
+
 # -------------------------------------------------------------------------------------------------------------------------------
 # FUNZIONE 'load_dataset':
 def load_dataset(pathDataset, extD):
@@ -212,7 +554,7 @@ def calculation_parameters_partitioning(pathDataset, typePartition, num, numGeom
 	
 # -------------------------------------------------------------------------------------------------------------------------------
 # FUNZIONE 'compute_quadtree':
-def compute_quadtree(gdf, n_geom_partition, min_area_partition, outputIndex, typeGeom):
+def compute_quadtree(gdf, n_geom_partition, min_area_partition, outputIndex, typeGeom, options=None, writer=None):
 
 	"""
 	Funzione che costruisce le partizioni tramite tecnica "QuadTree" in modo da avere partizioni con un numero di geometrie
@@ -221,7 +563,9 @@ def compute_quadtree(gdf, n_geom_partition, min_area_partition, outputIndex, typ
  							   numero di geometrie per partizione richiesto dall'utente (n_geom_partition);
 							   area minima per ciascuna partizione generata (min_area_partition);
 							   percorso in cui salvare le partizioni (outputIndex);
-							   tipo di geometria da salvare (typeGeom).
+							   tipo di geometria da salvare (typeGeom);
+							   parametri facoltativi di salvataggio delle partizioni (options);
+							   pool di scrittura in background delle partizioni, None per scrivere in modo sincrono (writer).
 	--> PARAMETRI IN USCITA: tempo impiegato per il salvataggio delle partizioni relative al dataset in questione (time_saving);
 							 righe da salvare nella Master Table del dataset in questione (master_table).
 	"""
@@ -267,7 +611,7 @@ def compute_quadtree(gdf, n_geom_partition, min_area_partition, outputIndex, typ
 			
 		if len(partitions) >= partitions_size:															# Se ho abbastanza partizioni pronte per essere salvate, procedo con il loro salvataggio:
 			start_partialTime_saving = time.perf_counter()
-			rows, partition_id = saving_partitions(partitions, outputIndex, typeGeom, partition_id)		# Salvataggio delle partizioni
+			rows, partition_id = saving_partitions(partitions, outputIndex, typeGeom, partition_id, options, writer)		# Salvataggio delle partizioni
 			master_rows += rows
 			end_partialTime_saving = float(time.perf_counter() - start_partialTime_saving)
 			time_saving += end_partialTime_saving
@@ -275,7 +619,7 @@ def compute_quadtree(gdf, n_geom_partition, min_area_partition, outputIndex, typ
 			
 	if partitions:																						# Se ho ancora partizioni da salvare:
 		start_partialTime_saving = time.perf_counter()
-		rows, partition_id = saving_partitions(partitions, outputIndex, typeGeom, partition_id)			# Salvataggio delle partizioni
+		rows, partition_id = saving_partitions(partitions, outputIndex, typeGeom, partition_id, options, writer)			# Salvataggio delle partizioni
 		master_rows += rows		
 		end_partialTime_saving = float(time.perf_counter() - start_partialTime_saving)
 		time_saving += end_partialTime_saving
@@ -283,17 +627,510 @@ def compute_quadtree(gdf, n_geom_partition, min_area_partition, outputIndex, typ
 
 	return time_saving, master_rows
 
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'geometry_centers':
+def geometry_centers(gdf, typeGeom):
+
+	"""
+	Funzione che restituisce, in forma vettoriale, le coordinate del centro di ciascuna geometria del dataset
+	(il punto stesso per i POINT, il centro della box per i BOX, il centroide per i POLYGON).
+	--> PARAMETRI IN INGRESSO: GeoDataFrame contenente le geometrie del dataset in questione (gdf);
+							   tipo di geometria contenuta nel dataset (typeGeom).
+	--> PARAMETRI IN USCITA: array delle coordinate x dei centri (cx);
+							 array delle coordinate y dei centri (cy).
+	"""
+
+	if typeGeom == 1:																	# POINT: il centro è il punto stesso
+		return gdf["x"].to_numpy(dtype=float), gdf["y"].to_numpy(dtype=float)
+	elif typeGeom == 2:																	# BOX: il centro è il punto medio della box
+		cx = (gdf["xmin"].to_numpy(dtype=float) + gdf["xmax"].to_numpy(dtype=float)) / 2
+		cy = (gdf["ymin"].to_numpy(dtype=float) + gdf["ymax"].to_numpy(dtype=float)) / 2
+		return cx, cy
+	else:																				# POLYGON: il centro è il centroide del poligono
+		centroids = gdf.geometry.centroid
+		return centroids.x.to_numpy(dtype=float), centroids.y.to_numpy(dtype=float)
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'compute_str':
+def compute_str(gdf, n_geom_partition, outputIndex, typeGeom, options=None, writer=None):
+
+	"""
+	Funzione che costruisce le partizioni tramite tecnica "Sort-Tile-Recursive" (STR): le geometrie vengono ordinate per x
+	e divise in fasce verticali, poi all'interno di ogni fascia vengono ordinate per y e divise in partizioni con lo stesso
+	numero di geometrie. Ogni partizione ha come finestra l'MBR effettivo delle proprie geometrie.
+	--> PARAMETRI IN INGRESSO: GeoDataFrame contenente le geometrie del dataset in questione (gdf);
+ 							   numero di geometrie per partizione richiesto dall'utente (n_geom_partition);
+							   percorso in cui salvare le partizioni (outputIndex);
+							   tipo di geometria da salvare (typeGeom);
+							   parametri facoltativi di salvataggio delle partizioni (options);
+							   pool di scrittura in background delle partizioni, None per scrivere in modo sincrono (writer).
+	--> PARAMETRI IN USCITA: tempo impiegato per il salvataggio delle partizioni relative al dataset in questione (time_saving);
+							 righe da salvare nella Master Table del dataset in questione (master_table).
+	"""
+
+	max_geom = int(math.ceil(n_geom_partition))															# Numero di geometrie per partizione: numGeomPartition
+	partitions = []																						# Lista contenente i DataFrame che corrispondono alle partizioni del dataset in questione da salvare
+	partition_id = 0																					# Contatore di partizioni
+	partitions_size = 8																					# Numero che identifica quante partizioni bisogna trovare prima di iniziare a salvarle
+	master_rows = []																					# Lista contenente le righe da salvare nella master table
+	time_saving = 0.0																					# Tempo impiegato per salvare le partizioni
+
+	cx, cy = geometry_centers(gdf, typeGeom)															# Centri delle geometrie usati come chiavi di ordinamento
+	n_partitions = max(1, math.ceil(len(gdf) / max_geom))												# Numero di partizioni da generare
+	n_slabs = max(1, math.ceil(math.sqrt(n_partitions)))												# Numero di fasce verticali
+	slab_size = n_slabs * max_geom																		# Numero di geometrie per ciascuna fascia verticale
+	logging.info(f"<System>      Number of vertical slabs: '{n_slabs}' ({slab_size} geometries each)")
+
+	order_x = np.argsort(cx, kind="stable")																# Ordinamento delle geometrie per x
+	for start_slab in range(0, len(order_x), slab_size):												# Per ogni fascia verticale...
+		slab = order_x[start_slab:start_slab + slab_size]												# ... geometrie appartenenti alla fascia
+		slab = slab[np.argsort(cy[slab], kind="stable")]												# ... ordinamento delle geometrie della fascia per y
+		for start_part in range(0, len(slab), max_geom):												# Ogni blocco di 'max_geom' geometrie consecutive è una partizione
+			sub_gdf = gdf.iloc[slab[start_part:start_part + max_geom]]
+			partitions.append({
+				"gdf": sub_gdf,																			# GeoDataFrame della partizione
+				"bbox": sub_gdf.total_bounds,															# BoundingBox effettiva delle geometrie della partizione
+				"replication": False																	# Ogni geometria è salvata in una sola partizione
+			})
+
+		if len(partitions) >= partitions_size:															# Se ho abbastanza partizioni pronte per essere salvate, procedo con il loro salvataggio:
+			start_partialTime_saving = time.perf_counter()
+			rows, partition_id = saving_partitions(partitions, outputIndex, typeGeom, partition_id, options, writer)		# Salvataggio delle partizioni
+			master_rows += rows
+			time_saving += float(time.perf_counter() - start_partialTime_saving)
+			partitions.clear()																			# Rimozione delle partizioni appena salvate
+
+	if partitions:																						# Se ho ancora partizioni da salvare:
+		start_partialTime_saving = time.perf_counter()
+		rows, partition_id = saving_partitions(partitions, outputIndex, typeGeom, partition_id, options, writer)			# Salvataggio delle partizioni
+		master_rows += rows
+		time_saving += float(time.perf_counter() - start_partialTime_saving)
+		partitions.clear()																				# Rimozione delle partizioni appena salvate
+
+	return time_saving, master_rows
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'hilbert_keys':
+def hilbert_keys(cx, cy, bbox, order=16):
+
+	"""
+	Funzione che calcola, in forma vettoriale, la posizione lungo la curva di Hilbert dei punti passati: la finestra (bbox)
+	viene divisa in una griglia di 2^order x 2^order celle e ogni punto prende la chiave della cella in cui cade.
+	--> PARAMETRI IN INGRESSO: array delle coordinate x dei punti (cx);
+							   array delle coordinate y dei punti (cy);
+							   finestra di riferimento su cui costruire la curva (bbox);
+							   ordine della curva di Hilbert (order).
+	--> PARAMETRI IN USCITA: array delle chiavi di Hilbert dei punti (keys).
+	"""
+
+	n = 1 << order																		# Numero di celle per lato della griglia
+	min_x, min_y, max_x, max_y = bbox
+	width = max(max_x - min_x, np.finfo(float).tiny)									# Dimensioni della finestra (protette da finestre degeneri)
+	height = max(max_y - min_y, np.finfo(float).tiny)
+	x = np.clip(((cx - min_x) / width * (n - 1)).astype(np.int64), 0, n - 1)			# Coordinate intere della cella lungo x
+	y = np.clip(((cy - min_y) / height * (n - 1)).astype(np.int64), 0, n - 1)			# Coordinate intere della cella lungo y
+
+	keys = np.zeros(len(x), dtype=np.int64)
+	s = n >> 1
+	while s > 0:																		# Un livello della curva per ogni bit delle coordinate
+		rx = ((x & s) > 0).astype(np.int64)												# Quadrante lungo x al livello corrente
+		ry = ((y & s) > 0).astype(np.int64)												# Quadrante lungo y al livello corrente
+		keys += s * s * ((3 * rx) ^ ry)													# Contributo del quadrante alla chiave
+		flip = (ry == 0) & (rx == 1)													# Rotazione del quadrante (riflessione + scambio degli assi)
+		x = np.where(flip, n - 1 - x, x)
+		y = np.where(flip, n - 1 - y, y)
+		swap = ry == 0
+		x, y = np.where(swap, y, x), np.where(swap, x, y)
+		s >>= 1
+
+	return keys
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'geometry_sizes':
+def geometry_sizes(gdf, typeGeom):
+
+	"""
+	Funzione che stima, in forma vettoriale, quanti bytes occupa ciascuna geometria una volta scritta nel file di partizione.
+	--> PARAMETRI IN INGRESSO: GeoDataFrame contenente le geometrie del dataset in questione (gdf);
+							   tipo di geometria contenuta nel dataset (typeGeom).
+	--> PARAMETRI IN USCITA: array con il numero di bytes di ciascuna geometria (sizes).
+	"""
+
+	if typeGeom == 1:																	# POINT: "x,y\n"
+		columns = ["x", "y"]
+	elif typeGeom == 2:																	# BOX: "xmin,ymin,xmax,ymax\n"
+		columns = ["xmin", "ymin", "xmax", "ymax"]
+	else:																				# POLYGON: "\"POLYGON((...))\"\n" (la stringa WKT contiene virgole e viene racchiusa tra apici)
+		return gdf.geometry.apply(lambda g: len(g.wkt) + 3).to_numpy(dtype=np.int64)
+	sizes = np.full(len(gdf), len(columns), dtype=np.int64)								# Separatori e fine riga
+	for col in columns:
+		sizes += gdf[col].astype(str).str.len().to_numpy(dtype=np.int64)				# Caratteri necessari per scrivere ciascuna coordinata
+	return sizes
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'compute_hilbert':
+def compute_hilbert(gdf, n_geom_partition, max_bytes_partition, outputIndex, typeGeom, options=None, writer=None):
+
+	"""
+	Funzione che costruisce le partizioni seguendo la curva di Hilbert: calcola la chiave di Hilbert del centro di ciascuna
+	geometria, ordina una sola volta il dataset e taglia l'array ordinato in partizioni consecutive (per numero di geometrie
+	oppure per peso in bytes). Le geometrie di ogni partizione vengono salvate nell'ordine della curva e la finestra di ogni
+	partizione è l'MBR effettivo delle sue geometrie.
+	--> PARAMETRI IN INGRESSO: GeoDataFrame contenente le geometrie del dataset in questione (gdf);
+ 							   numero di geometrie per partizione richiesto dall'utente (n_geom_partition);
+							   peso massimo in bytes di ciascuna partizione, None se si taglia per numero di geometrie (max_bytes_partition);
+							   percorso in cui salvare le partizioni (outputIndex);
+							   tipo di geometria da salvare (typeGeom);
+							   parametri facoltativi di salvataggio delle partizioni (options);
+							   pool di scrittura in background delle partizioni, None per scrivere in modo sincrono (writer).
+	--> PARAMETRI IN USCITA: tempo impiegato per il salvataggio delle partizioni relative al dataset in questione (time_saving);
+							 righe da salvare nella Master Table del dataset in questione (master_table).
+	"""
+
+	max_geom = int(math.ceil(n_geom_partition))															# Numero di geometrie per partizione: numGeomPartition
+	partitions = []																						# Lista contenente i DataFrame che corrispondono alle partizioni del dataset in questione da salvare
+	partition_id = 0																					# Contatore di partizioni
+	partitions_size = 8																					# Numero che identifica quante partizioni bisogna trovare prima di iniziare a salvarle
+	master_rows = []																					# Lista contenente le righe da salvare nella master table
+	time_saving = 0.0																					# Tempo impiegato per salvare le partizioni
+
+	cx, cy = geometry_centers(gdf, typeGeom)															# Centri delle geometrie
+	bbox = (cx.min(), cy.min(), cx.max(), cy.max())														# Finestra su cui costruire la curva
+	order = np.argsort(hilbert_keys(cx, cy, bbox), kind="stable")										# Unico ordinamento del dataset lungo la curva
+
+	# Calcolo dei punti di taglio dell'array ordinato
+	if max_bytes_partition is None:																		# Taglio per numero di geometrie
+		cuts = list(range(0, len(order), max_geom)) + [len(order)]
+	else:																								# Taglio per peso in bytes
+		cumulative = np.cumsum(geometry_sizes(gdf, typeGeom)[order])									# Peso cumulato delle geometrie ordinate
+		cuts = [0]
+		while cuts[-1] < len(order):
+			start = cuts[-1]
+			offset = cumulative[start - 1] if start > 0 else 0											# Bytes già assegnati alle partizioni precedenti
+			end = int(np.searchsorted(cumulative, offset + max_bytes_partition, side="right"))			# Ultima geometria che rientra nel peso massimo
+			cuts.append(max(end, start + 1))															# Almeno una geometria per partizione
+	logging.info(f"<System>      Number of partitions along the Hilbert curve: '{len(cuts) - 1}'")
+
+	for start, end in zip(cuts[:-1], cuts[1:]):															# Ogni intervallo della curva è una partizione
+		sub_gdf = gdf.iloc[order[start:end]]															# Geometrie della partizione nell'ordine della curva
+		partitions.append({
+			"gdf": sub_gdf,																				# GeoDataFrame della partizione
+			"bbox": sub_gdf.total_bounds,																# BoundingBox effettiva delle geometrie della partizione
+			"replication": False																		# Ogni geometria è salvata in una sola partizione
+		})
+
+		if len(partitions) >= partitions_size:															# Se ho abbastanza partizioni pronte per essere salvate, procedo con il loro salvataggio:
+			start_partialTime_saving = time.perf_counter()
+			rows, partition_id = saving_partitions(partitions, outputIndex, typeGeom, partition_id, options, writer)		# Salvataggio delle partizioni
+			master_rows += rows
+			time_saving += float(time.perf_counter() - start_partialTime_saving)
+			partitions.clear()																			# Rimozione delle partizioni appena salvate
+
+	if partitions:																						# Se ho ancora partizioni da salvare:
+		start_partialTime_saving = time.perf_counter()
+		rows, partition_id = saving_partitions(partitions, outputIndex, typeGeom, partition_id, options, writer)			# Salvataggio delle partizioni
+		master_rows += rows
+		time_saving += float(time.perf_counter() - start_partialTime_saving)
+		partitions.clear()																				# Rimozione delle partizioni appena salvate
+
+	return time_saving, master_rows
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'load_workload':
+def load_workload(pathRangeQueries, nameRangeQueries, dataset_name):
+
+	"""
+	Funzione che carica le finestre delle range queries previste per il dataset in questione (file 'rqI_*.csv').
+	--> PARAMETRI IN INGRESSO: cartella contenente il file delle range queries (pathRangeQueries);
+							   nome del file delle range queries (nameRangeQueries);
+							   nome del dataset in questione senza estensione (dataset_name).
+	--> PARAMETRI IN USCITA: array (numQuery x 4) con le finestre [minX, minY, maxX, maxY] delle queries (queries);
+							 array con il numero identificativo delle queries (numQuery).
+	"""
+
+	if not nameRangeQueries:																	# Il file delle range queries non è stato indicato dall'utente
+		raise ValueError("<System>      The 'workload' partition algorithm requires 'pathRangeQueries' and 'nameRangeQueries'!")
+	file_path = os.path.join(pathRangeQueries, nameRangeQueries)
+	if not os.path.isfile(file_path):															# Verifica dell'esistenza del file delle range queries
+		raise ValueError(f"<System>      The range queries file '{file_path}' does not exist!")
+
+	columns = ["datasetName", "numQuery", "minX", "minY", "maxX", "maxY"]						# Seleziono le sole colonne che mi interessano
+	chunks = pd.read_csv(file_path, sep=';', usecols=columns, chunksize=100_000)				# Leggo a chunk di 100000 righe il file
+	df = pd.concat(chunk[chunk["datasetName"] == dataset_name] for chunk in chunks)				# Unisco filtrando per nome del dataset
+	if df.empty:																				# Nessuna query relativa al dataset in questione
+		raise ValueError(f"<System>      No range queries found for '{dataset_name}' in '{nameRangeQueries}'!")
+	return df[["minX", "minY", "maxX", "maxY"]].to_numpy(dtype=float), df["numQuery"].to_numpy()
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'query_hits':
+def query_hits(bbox, queries):
+
+	"""
+	Funzione che restituisce, per ciascuna range query, se la sua finestra interseca la finestra passata.
+	--> PARAMETRI IN INGRESSO: finestra da analizzare [minX, minY, maxX, maxY] (bbox);
+							   array (numQuery x 4) con le finestre delle queries (queries).
+	--> PARAMETRI IN USCITA: array di boolean (True = la query interseca la finestra).
+	"""
+
+	min_x, min_y, max_x, max_y = bbox
+	return (queries[:, 0] <= max_x) & (queries[:, 2] >= min_x) & (queries[:, 1] <= max_y) & (queries[:, 3] >= min_y)
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'workload_cost':
+def workload_cost(nodes, queries, scale=1.0):
+
+	"""
+	Funzione che stima il costo del carico di lavoro sulle partizioni passate: ogni query paga il caricamento di ciascuna
+	partizione che interseca (PARTITION_LOAD_COST) più il test di tutte le geometrie contenute in quella partizione.
+	--> PARAMETRI IN INGRESSO: lista di nodi composti da GeoDataFrame e BoundingBox (nodes);
+							   array (numQuery x 4) con le finestre delle queries (queries);
+							   geometrie del dataset rappresentate da ciascuna geometria dei nodi, > 1 se i nodi contengono un campione (scale).
+	--> PARAMETRI IN USCITA: costo stimato (cost).
+	"""
+
+	cost = 0
+	for node in nodes:
+		hits = int(np.count_nonzero(query_hits(node["bbox"], queries)))					# Numero di queries che caricano la partizione
+		cost += hits * (PARTITION_LOAD_COST + len(node["gdf"]) * scale)
+	return cost
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'workload_leaves':
+def workload_leaves(node, queries, max_geom):
+
+	"""
+	Funzione che visita (in post-ordine) l'albero costruito dal partizionamento 'workload' e ne restituisce le foglie,
+	unendo tra loro le foglie sorelle che nessuna query tocca (se hanno un lato in comune e non superano 'max_geom').
+	--> PARAMETRI IN INGRESSO: nodo dell'albero da visitare (node);
+							   array (numQuery x 4) con le finestre delle queries (queries);
+							   numero massimo di geometrie per partizione (max_geom).
+	--> PARAMETRI IN USCITA: lista delle foglie (partizioni finali) del sottoalbero.
+	"""
+
+	if not node["children"]:																	# Il nodo è una foglia
+		return [node]
+
+	groups = [workload_leaves(child, queries, max_geom) for child in node["children"]]			# Foglie dei sottoalberi figli
+	leaves = [group[0] for group in groups if len(group) == 1]									# Figli ridotti ad una sola foglia: candidati all'unione
+	others = [leaf for group in groups if len(group) > 1 for leaf in group]						# Foglie che restano invariate
+
+	candidates = []
+	for leaf in leaves:
+		if query_hits(leaf["bbox"], queries).any():												# Foglia toccata da almeno una query: non può essere unita
+			others.append(leaf)
+		else:
+			candidates.append(leaf)
+
+	merged = True
+	while merged:																				# Unisco coppie di foglie non toccate finché è possibile
+		merged = False
+		for i in range(len(candidates)):
+			for j in range(i + 1, len(candidates)):
+				a_minX, a_minY, a_maxX, a_maxY = candidates[i]["bbox"]
+				b_minX, b_minY, b_maxX, b_maxY = candidates[j]["bbox"]
+				horizontal = a_minY == b_minY and a_maxY == b_maxY and (a_maxX == b_minX or b_maxX == a_minX)	# Lato verticale in comune
+				vertical = a_minX == b_minX and a_maxX == b_maxX and (a_maxY == b_minY or b_maxY == a_minY)		# Lato orizzontale in comune
+				if not (horizontal or vertical):
+					continue
+				bbox = (min(a_minX, b_minX), min(a_minY, b_minY), max(a_maxX, b_maxX), max(a_maxY, b_maxY))		# Finestra unione (ancora un rettangolo)
+				sub_gdf = pd.concat([candidates[i]["gdf"], candidates[j]["gdf"]])
+				sub_gdf = sub_gdf[~sub_gdf.index.duplicated()]									# Le geometrie presenti in entrambe le foglie vengono tenute una sola volta
+				if len(sub_gdf) > max_geom or query_hits(bbox, queries).any():
+					continue
+				candidates[i] = {"gdf": sub_gdf, "bbox": bbox, "children": []}					# Nuova foglia unione delle due
+				del candidates[j]
+				merged = True
+				break
+			if merged:
+				break
+
+	return others + candidates
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'quadtree_leaves':
+def quadtree_leaves(node):
+
+	"""
+	Funzione che restituisce le foglie che avrebbe generato il QuadTree classico (divisione solo per numero di geometrie)
+	partendo dall'albero costruito dal partizionamento 'workload'.
+	--> PARAMETRI IN INGRESSO: nodo dell'albero da visitare (node).
+	--> PARAMETRI IN USCITA: lista delle foglie del QuadTree classico.
+	"""
+
+	if node["children"] and node["split"] == "geometries":
+		return [leaf for child in node["children"] for leaf in quadtree_leaves(child)]
+	return [node]
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'workload_statistics':
+def workload_statistics(bounds, counts, queries):
+
+	"""
+	Funzione che calcola, per ciascuna query, il numero di partizioni caricate e di geometrie testate.
+	--> PARAMETRI IN INGRESSO: array (numPartition x 4) con le finestre delle partizioni (bounds);
+							   array con il numero di geometrie di ciascuna partizione (counts);
+							   array (numQuery x 4) con le finestre delle queries (queries).
+	--> PARAMETRI IN USCITA: array con le partizioni caricate da ciascuna query (partitions);
+							 array con le geometrie testate da ciascuna query (geometries).
+	"""
+
+	bounds = np.asarray(bounds, dtype=float).reshape(-1, 4)
+	counts = np.asarray(counts, dtype=float)
+	hits = (
+		(queries[:, None, 0] <= bounds[None, :, 2]) & (queries[:, None, 2] >= bounds[None, :, 0]) &
+		(queries[:, None, 1] <= bounds[None, :, 3]) & (queries[:, None, 3] >= bounds[None, :, 1])
+	)																							# Matrice (numQuery x numPartition) delle intersezioni
+	return hits.sum(axis=1), hits @ counts
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'workload_achieved':
+def workload_achieved(master_rows, queries):
+
+	"""
+	Funzione che calcola, per ciascuna query, il costo ottenuto sull'indice salvato seguendo la selezione di 'RangeQuery.py':
+	una partizione viene caricata se il suo MBR effettivo ('DataXMin', ..., 'DataYMax') interseca la query, salvo quando la
+	query contiene l'intero MBR effettivo di una partizione senza repliche (risultato ricavato dalla Master Table); per ogni
+	partizione caricata vengono testate tutte le sue geometrie.
+	--> PARAMETRI IN INGRESSO: righe della Master Table delle partizioni salvate (master_rows);
+							   array (numQuery x 4) con le finestre delle queries (queries).
+	--> PARAMETRI IN USCITA: array con le partizioni caricate da ciascuna query (partitions);
+							 array con le geometrie testate da ciascuna query (geometries).
+	"""
+
+	bounds = np.array([[row["DataXMin"], row["DataYMin"], row["DataXMax"], row["DataYMax"]] for row in master_rows], dtype=float).reshape(-1, 4)
+	counts = np.array([row["NumberGeometries"] for row in master_rows], dtype=float)
+	replicated = np.array([row["Replicated"] > 0 for row in master_rows], dtype=bool)
+	hits = (
+		(queries[:, None, 0] <= bounds[None, :, 2]) & (queries[:, None, 2] >= bounds[None, :, 0]) &
+		(queries[:, None, 1] <= bounds[None, :, 3]) & (queries[:, None, 3] >= bounds[None, :, 1])
+	)																							# Partizioni candidate (RTree globale sugli MBR effettivi)
+	covered = (
+		(queries[:, None, 0] <= bounds[None, :, 0]) & (queries[:, None, 1] <= bounds[None, :, 1]) &
+		(queries[:, None, 2] >= bounds[None, :, 2]) & (queries[:, None, 3] >= bounds[None, :, 3])
+	) & ~replicated[None, :]																	# Partizioni risolte senza aprirle
+	loaded = hits & ~covered
+	return loaded.sum(axis=1), loaded @ counts
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'workload_tree':
+def workload_tree(gdf, bbox, max_geom, min_area_partition, queries, scale=1.0, keep_empty=False):
+
+	"""
+	Funzione che costruisce l'albero del partizionamento 'workload': un nodo viene diviso in quadranti quando ha troppe
+	geometrie (come nel QuadTree) oppure quando la divisione abbassa il costo stimato delle queries che lo attraversano.
+	--> PARAMETRI IN INGRESSO: GeoDataFrame contenente le geometrie da partizionare (gdf);
+							   finestra della radice (bbox);
+							   numero massimo di geometrie per partizione (max_geom);
+							   area minima per ciascuna partizione generata (min_area_partition);
+							   array (numQuery x 4) con le finestre delle queries (queries);
+							   geometrie del dataset rappresentate da ciascuna geometria di 'gdf', > 1 se si parte da un campione (scale);
+							   True per mantenere anche i quadranti vuoti (keep_empty).
+	--> PARAMETRI IN USCITA: radice dell'albero (root).
+	"""
+
+	root = {"gdf": gdf, "bbox": bbox, "children": [], "split": None}
+	current_level = [root]
+	while current_level:																				# Ogni iterazione rappresenta un livello dell'albero
+		next_level = []
+		for node in current_level:
+			minX_node, minY_node, maxX_node, maxY_node = node["bbox"]
+			if (maxX_node - minX_node) * (maxY_node - minY_node) <= min_area_partition:				# Area troppo piccola per essere partizionata
+				continue
+			if len(node["gdf"]) <= max_geom and not query_hits(node["bbox"], queries).any():			# Nodo già abbastanza piccolo e mai toccato dalle queries
+				continue
+			children = partitioning_node(node, keep_empty)
+			if not children or all(len(child["gdf"]) == len(node["gdf"]) for child in children):		# Divisione inutile (nessun figlio o figli identici al padre)
+				continue
+			if len(node["gdf"]) > max_geom:																# Divisione obbligatoria: troppe geometrie nel nodo
+				node["split"] = "geometries"
+			elif workload_cost(children, queries, scale) < workload_cost([node], queries, scale):		# Divisione conveniente: le queries che attraversano il nodo costano meno sui figli
+				node["split"] = "workload"
+			else:
+				continue
+			for child in children:
+				child["children"] = []
+				child["split"] = None
+			node["children"] = children
+			next_level.extend(children)
+		logging.info(f"<System>      Length current level: '{len(current_level)}'")
+		current_level = next_level
+	return root
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'compute_workload':
+def compute_workload(gdf, n_geom_partition, min_area_partition, outputIndex, typeGeom, queries, query_ids, options=None, writer=None):
+
+	"""
+	Funzione che costruisce le partizioni tenendo conto del carico di lavoro previsto (range queries del dataset): parte dalla
+	divisione in quadranti del QuadTree, ma divide un nodo anche quando questo abbassa il costo stimato delle queries che lo
+	attraversano (partizioni caricate + geometrie testate) e unisce le foglie sorelle che nessuna query tocca. Al termine,
+	salva nell'indice il file 'workload_cost.csv' con il costo previsto e quello ottenuto per ciascuna query.
+	--> PARAMETRI IN INGRESSO: GeoDataFrame contenente le geometrie del dataset in questione (gdf);
+ 							   numero di geometrie per partizione richiesto dall'utente (n_geom_partition);
+							   area minima per ciascuna partizione generata (min_area_partition);
+							   percorso in cui salvare le partizioni (outputIndex);
+							   tipo di geometria da salvare (typeGeom);
+							   array (numQuery x 4) con le finestre delle queries (queries);
+							   array con il numero identificativo delle queries (query_ids);
+							   parametri facoltativi di salvataggio delle partizioni (options);
+							   pool di scrittura in background delle partizioni, None per scrivere in modo sincrono (writer).
+	--> PARAMETRI IN USCITA: tempo impiegato per il salvataggio delle partizioni relative al dataset in questione (time_saving);
+							 righe da salvare nella Master Table del dataset in questione (master_table).
+	"""
+
+	max_geom = int(math.ceil(n_geom_partition))															# Limite massimo di geometrie per partizione: numGeomPartition
+	partition_id = 0																					# Contatore di partizioni
+	partitions_size = 8																					# Numero che identifica quante partizioni bisogna trovare prima di iniziare a salvarle
+	master_rows = []																					# Lista contenente le righe da salvare nella master table
+	time_saving = 0.0																					# Tempo impiegato per salvare le partizioni
+
+	# 1. Costruzione dell'albero: divisione per numero di geometrie (come il QuadTree) o per riduzione del costo delle queries
+	root = workload_tree(gdf, tuple(gdf.total_bounds), max_geom, min_area_partition, queries)
+
+	# 2. Foglie finali (con unione delle foglie non toccate dalle queries) e costo previsto
+	leaves = workload_leaves(root, queries, max_geom)
+	baseline = quadtree_leaves(root)
+	base_partitions, base_geometries = workload_statistics([leaf["bbox"] for leaf in baseline], [len(leaf["gdf"]) for leaf in baseline], queries)
+	pred_partitions, pred_geometries = workload_statistics([leaf["bbox"] for leaf in leaves], [len(leaf["gdf"]) for leaf in leaves], queries)
+	logging.info(f"<System>      Number of partitions: '{len(leaves)}' (quadtree: '{len(baseline)}')")
+
+	# 3. Salvataggio delle partizioni
+	for start in range(0, len(leaves), partitions_size):
+		start_partialTime_saving = time.perf_counter()
+		rows, partition_id = saving_partitions(leaves[start:start + partitions_size], outputIndex, typeGeom, partition_id, options, writer)	# Salvataggio delle partizioni
+		master_rows += rows
+		time_saving += float(time.perf_counter() - start_partialTime_saving)
+
+	# 4. Confronto tra costo previsto e costo ottenuto sulle partizioni salvate (MBR effettivi, come in 'RangeQuery.py')
+	ach_partitions, ach_geometries = workload_achieved(master_rows, queries)
+	pd.DataFrame({
+		"numQuery": query_ids,
+		"quadtreePartitions": base_partitions,
+		"quadtreeGeometries": base_geometries,
+		"predictedPartitions": pred_partitions,
+		"predictedGeometries": pred_geometries,
+		"achievedPartitions": ach_partitions,
+		"achievedGeometries": ach_geometries
+	}).to_csv(os.path.join(outputIndex, "workload_cost.csv"), sep=';', index=False)
+	logging.info(f"<System>      Average partitions loaded per query: quadtree '{base_partitions.mean():.2f}', predicted '{pred_partitions.mean():.2f}', achieved '{ach_partitions.mean():.2f}'")
+	logging.info(f"<System>      Average geometries tested per query: quadtree '{base_geometries.mean():.2f}', predicted '{pred_geometries.mean():.2f}', achieved '{ach_geometries.mean():.2f}'")
+
+	return time_saving, master_rows
+
 # -------------------------------------------------------------------------------------------------------------------------------
 # FUNZIONE 'partitioning_node':
-def partitioning_node(node):
+def partitioning_node(node, keep_empty=False):
 
 	"""
-	Funzione che partiziona il nodo passato in quattro sottopartizioni.
-	--> PARAMETRI IN INGRESSO: Nodo composto da GeoDataFrame e BoundingBox (node).
+	Funzione che partiziona il nodo passato in quattro sottopartizioni: una geometria viene inserita in tutti i quadranti
+	intersecati dal suo MBR (bordi compresi), condizione necessaria alla tecnica del punto di riferimento in 'RangeQuery.py'.
+	--> PARAMETRI IN INGRESSO: Nodo composto da GeoDataFrame e BoundingBox (node);
+							   True per mantenere anche i quadranti vuoti (keep_empty).
 	--> PARAMETRI IN USCITA: Lista con le quattro sottopartizioni generate.
 	"""
 
 	gdf = node["gdf"]									# Estrazione del GeoDataFrame dal nodo
+	bounds = gdf.geometry.bounds.to_numpy()				# MBR delle geometrie del nodo
 	min_x, min_y, max_x, max_y = node["bbox"]			# Estrazione della BoundingBox dal nodo
 	mid_x = (min_x + max_x) / 2							# Calcolo del punto medio della BoundingBox asse X
 	mid_y = (min_y + max_y) / 2							# Calcolo del punto medio della BoundingBox asse Y
@@ -308,10 +1145,11 @@ def partitioning_node(node):
 	# Inserimento delle geometrie appartenenti ai vari quadranti
 	children = []										# Lista contenente le partizioni da far analizzare
 	for bbox_poly in bbox_list:							# Scorro la lista contenente i quattro quadranti in analisi
-		mask = gdf.geometry.intersects(bbox_poly)		# Maschera composta da boolean per ogni geometria (true = appartiene, false = non appartiene)
+		q_minx, q_miny, q_maxx, q_maxy = bbox_poly.bounds
+		mask = (bounds[:, 0] <= q_maxx) & (bounds[:, 2] >= q_minx) & (bounds[:, 1] <= q_maxy) & (bounds[:, 3] >= q_miny)	# Maschera composta da boolean per ogni geometria (true = il suo MBR interseca il quadrante)
 		sub_gdf = gdf[mask]								# Mantengo le sole geometrie che intersecano il quadrante sfruttando la maschera costruita
 
-		if not sub_gdf.empty:							# Se la lista di geometrie non è vuota...
+		if not sub_gdf.empty or keep_empty:				# Se la lista di geometrie non è vuota...
 			children.append({							# ... la salvo nelle partizioni da analizzare
 				"gdf": sub_gdf,
 				"bbox": bbox_poly.bounds
@@ -319,69 +1157,920 @@ def partitioning_node(node):
 
 	return children
 
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'stream_chunk_rows':
+def stream_chunk_rows(pathDataset, budget_bytes):
+
+	"""
+	Funzione che stima il numero di righe del dataset da leggere per ogni blocco in modalità streaming, in modo che
+	un blocco occupi circa un quarto del budget di memoria (il resto è riservato ai buffer delle partizioni).
+	--> PARAMETRI IN INGRESSO: percorso contenente il dataset in questione (pathDataset);
+							   budget di memoria espresso in byte (budget_bytes).
+	--> PARAMETRI IN USCITA: numero di righe per blocco.
+	"""
+
+	with open(pathDataset, "rb") as f:
+		head = f.read(1 << 20)																			# Il primo MB del file è sufficiente a stimare la lunghezza media di una riga
+	avg_line = len(head) / max(1, head.count(b"\n"))
+	return max(1000, int(budget_bytes / 4 / max(1.0, avg_line)))
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'read_chunks':
+def read_chunks(pathDataset, extD, chunk_rows):
+
+	"""
+	Funzione generatrice che legge il dataset a blocchi senza caricarlo interamente in memoria.
+	--> PARAMETRI IN INGRESSO: percorso contenente il dataset in questione (pathDataset);
+							   estensione del file contenente il dataset in questione (extD);
+							   numero di righe per blocco (chunk_rows).
+	--> PARAMETRI IN USCITA: per ogni blocco, righe lette (DataFrame per i '.csv', lista di stringhe WKT per i '.wkt'),
+							 MBR delle geometrie come array (n, 4) [xmin, ymin, xmax, ymax] e tipo di geometria (1, 2, 3).
+	"""
+
+	if extD.lower() == ".wkt":																			# POLYGON: le righe WKT vengono conservate come testo, servono solo i loro MBR
+		with open(pathDataset, "r", encoding="utf-8") as f:
+			while True:
+				lines = list(itertools.islice(f, chunk_rows))
+				if not lines:
+					break
+				lines = [line.strip() for line in lines if line.strip()]
+				if lines:
+					yield lines, gpd.GeoSeries.from_wkt(lines).bounds.to_numpy(), 3
+	else:																								# POINT || BOX
+		for chunk in pd.read_csv(pathDataset, header=None, chunksize=chunk_rows):
+			chunk = chunk.apply(pd.to_numeric, errors="coerce").dropna()								# Eliminazione dei valori non validi (come in 'load_dataset')
+			values = chunk.to_numpy(dtype=float)
+			if values.shape[1] == 2:																	# --> POINT: MBR degenere [x, y, x, y]
+				yield chunk, np.hstack([values, values]), 1
+			elif values.shape[1] == 4:																	# --> BOX
+				yield chunk, values, 2
+			else:
+				raise ValueError("<System>      Unsupported CSV format!")
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'cell_index':
+def cell_index(edges, values):
+
+	"""
+	Funzione che restituisce, per ogni coordinata, l'indice della cella della griglia (definita dai bordi 'edges') che la contiene.
+	"""
+
+	return np.clip(np.searchsorted(edges, values, side="right") - 1, 0, len(edges) - 2)
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'scan_dataset':
+def scan_dataset(pathDataset, extD, chunk_rows, sample_size=0):
+
+	"""
+	Funzione che scorre il dataset a blocchi e ne calcola numero di geometrie, finestra e istogramma dei centri
+	su una griglia STREAM_GRID x STREAM_GRID (due letture sequenziali del file, memoria costante). Durante la prima
+	lettura viene estratto, se richiesto, un campione casuale uniforme delle geometrie (reservoir sampling).
+	--> PARAMETRI IN INGRESSO: percorso contenente il dataset in questione (pathDataset);
+							   estensione del file contenente il dataset in questione (extD);
+							   numero di righe per blocco (chunk_rows);
+							   numero di geometrie del campione, 0 se non richiesto (sample_size).
+	--> PARAMETRI IN USCITA: numero di geometrie, finestra del dataset (bounds), tipo di geometria, istogramma dei centri
+							 e GeoDataFrame del campione (None se non richiesto).
+	"""
+
+	numGeom = 0
+	typeGeom = None
+	bounds = np.array([np.inf, np.inf, -np.inf, -np.inf])
+	reservoir = {"size": sample_size, "seen": 0, "items": []}
+	rng = np.random.default_rng(0)																		# Seme fisso: a parità di dataset il campione (e quindi l'indice) è lo stesso
+	for records, mbrs, typeGeom in read_chunks(pathDataset, extD, chunk_rows):						# 1° lettura: numero di geometrie, finestra del dataset e campione
+		numGeom += len(mbrs)
+		bounds = np.concatenate([np.minimum(bounds[:2], mbrs[:, :2].min(axis=0)), np.maximum(bounds[2:], mbrs[:, 2:].max(axis=0))])
+		if sample_size > 0:
+			reservoir_update(reservoir, records if typeGeom == 3 else records.to_numpy(dtype=float), rng)
+	if numGeom == 0:
+		raise ValueError("<System>      The dataset is empty!")
+	sample = records_gdf(reservoir["items"], typeGeom) if sample_size > 0 else None
+
+	edges_x = np.linspace(bounds[0], bounds[2], STREAM_GRID + 1)
+	edges_y = np.linspace(bounds[1], bounds[3], STREAM_GRID + 1)
+	histogram = np.zeros((STREAM_GRID, STREAM_GRID), dtype=np.int64)
+	for _, mbrs, _ in read_chunks(pathDataset, extD, chunk_rows):									# 2° lettura: istogramma dei centri delle geometrie
+		ix = cell_index(edges_x, (mbrs[:, 0] + mbrs[:, 2]) / 2)
+		iy = cell_index(edges_y, (mbrs[:, 1] + mbrs[:, 3]) / 2)
+		np.add.at(histogram, (ix, iy), 1)
+	return numGeom, bounds, typeGeom, histogram, sample
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'reservoir_update':
+def reservoir_update(reservoir, items, rng):
+
+	"""
+	Funzione che aggiorna il campione con gli elementi di un blocco appena letto (Algorithm R in forma vettoriale): l'i-esimo
+	elemento letto sostituisce un elemento casuale del campione con probabilità size / (i + 1).
+	--> PARAMETRI IN INGRESSO: campione da aggiornare, dizionario con 'size', 'seen' e 'items' (reservoir);
+							   elementi del blocco letto (items);
+							   generatore di numeri casuali (rng).
+	"""
+
+	size, seen = reservoir["size"], reservoir["seen"]
+	fill = max(0, min(size - seen, len(items)))															# Posti ancora liberi nel campione
+	reservoir["items"].extend(items[:fill])
+	if len(items) > fill:
+		slots = rng.integers(0, np.arange(seen + fill, seen + len(items)) + 1)							# Posizione estratta per ciascun elemento successivo
+		for position in np.flatnonzero(slots < size):													# Gli elementi estratti sostituiscono quelli presenti (in ordine di lettura)
+			reservoir["items"][slots[position]] = items[fill + position]
+	reservoir["seen"] += len(items)
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'records_gdf':
+def records_gdf(records, typeGeom):
+
+	"""
+	Funzione che costruisce il GeoDataFrame (con le stesse colonne di 'load_dataset') di righe lette a blocchi.
+	--> PARAMETRI IN INGRESSO: righe lette, stringhe WKT per i POLYGON oppure coordinate per POINT e BOX (records);
+							   tipo di geometria (typeGeom).
+	--> PARAMETRI IN USCITA: GeoDataFrame delle righe passate.
+	"""
+
+	if typeGeom == 3:																					# POLYGON
+		df = pd.DataFrame({"wkt": list(records)})
+		df["polygon"] = df["wkt"].apply(wkt.loads)
+		return gpd.GeoDataFrame(df, geometry="polygon")
+	columns = ["x", "y"] if typeGeom == 1 else ["xmin", "ymin", "xmax", "ymax"]
+	df = pd.DataFrame(np.asarray(records, dtype=float).reshape(-1, len(columns)), columns=columns)
+	if typeGeom == 1:																					# POINT
+		geom = gpd.points_from_xy(df["x"], df["y"])
+	else:																								# BOX
+		geom = shapely.box(df["xmin"], df["ymin"], df["xmax"], df["ymax"])
+	return gpd.GeoDataFrame(df, geometry=geom)
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'stream_leaves':
+def stream_leaves(histogram, bounds, max_geom, min_area_partition):
+
+	"""
+	Funzione che calcola i confini delle partizioni applicando le regole del QuadTree all'istogramma dei centri
+	(un nodo viene diviso finchè il numero stimato di geometrie supera 'max_geom' e l'area resta sopra la minima).
+	--> PARAMETRI IN INGRESSO: istogramma dei centri (histogram);
+							   finestra del dataset (bounds);
+							   numero massimo di geometrie per partizione (max_geom);
+							   area minima per ciascuna partizione (min_area_partition).
+	--> PARAMETRI IN USCITA: BoundingBox delle foglie, tabella cella --> foglia e bordi della griglia (edges_x, edges_y).
+	"""
+
+	grid = histogram.shape[0]
+	edges_x = np.linspace(bounds[0], bounds[2], grid + 1)
+	edges_y = np.linspace(bounds[1], bounds[3], grid + 1)
+	table = np.zeros((grid, grid), dtype=np.int64)
+	leaves = []
+	stack = [(0, grid, 0, grid)]																		# Nodi espressi come intervalli di celle [i0, i1) x [j0, j1)
+	while stack:
+		i0, i1, j0, j1 = stack.pop()
+		bbox = (edges_x[i0], edges_y[j0], edges_x[i1], edges_y[j1])
+		node_area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+		if histogram[i0:i1, j0:j1].sum() > max_geom and node_area > min_area_partition and i1 - i0 > 1:
+			mi, mj = (i0 + i1) // 2, (j0 + j1) // 2													# Divisione in quattro quadranti (la griglia è una potenza di 2)
+			stack += [(mi, i1, mj, j1), (i0, mi, mj, j1), (i0, mi, j0, mj), (mi, i1, j0, mj)]
+		else:
+			table[i0:i1, j0:j1] = len(leaves)
+			leaves.append(bbox)
+	return leaves, table, edges_x, edges_y
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'route_geometries':
+def route_geometries(mbrs, edges_x, edges_y, table):
+
+	"""
+	Funzione che assegna (in modo vettoriale) ogni geometria alle foglie intersecate dal suo MBR.
+	--> PARAMETRI IN INGRESSO: MBR delle geometrie (mbrs);
+							   bordi della griglia (edges_x, edges_y);
+							   tabella cella --> foglia (table).
+	--> PARAMETRI IN USCITA: indici delle righe e foglie di destinazione (una coppia per ogni copia della geometria).
+	"""
+
+	ix0, ix1 = cell_index(edges_x, mbrs[:, 0]), cell_index(edges_x, mbrs[:, 2])
+	iy0, iy1 = cell_index(edges_y, mbrs[:, 1]), cell_index(edges_y, mbrs[:, 3])
+	first = table[ix0, iy0]
+	rows = [np.arange(len(mbrs))]
+	leaves = [first]
+	for i in np.flatnonzero(first != table[ix1, iy1]):												# Le foglie sono rettangoli: se i due angoli opposti cadono nella stessa foglia, l'MBR è tutto al suo interno
+		others = np.unique(table[ix0[i]:ix1[i] + 1, iy0[i]:iy1[i] + 1])
+		others = others[others != first[i]]																# Geometria a cavallo di più foglie --> replicata
+		rows.append(np.full(len(others), i))
+		leaves.append(others)
+	return np.concatenate(rows), np.concatenate(leaves)
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'route_to_spills':
+def route_to_spills(pathDataset, extD, chunk_rows, router, n_leaves, spillPath, budget_bytes):
+
+	"""
+	Funzione che legge il file a blocchi, instrada le geometrie nei buffer delle foglie e scarica i buffer su disco
+	(un file di appoggio per foglia) quando superano metà del budget di memoria.
+	--> PARAMETRI IN INGRESSO: percorso e estensione del file da instradare (pathDataset, extD);
+							   numero di righe per blocco (chunk_rows);
+							   funzione (records, mbrs, typeGeom) --> (righe, foglie) che instrada un blocco (router);
+							   numero di foglie (n_leaves);
+							   prefisso dei file di appoggio (spillPath);
+							   budget di memoria espresso in byte (budget_bytes).
+	--> PARAMETRI IN USCITA: numero di geometrie instradate in ciascuna foglia (counts).
+	"""
+
+	counts = np.zeros(n_leaves, dtype=np.int64)
+	buffers = {}																						# Foglia --> lista di blocchi di testo in attesa di essere scaricati
+	buffered = 0
+	for records, mbrs, typeGeom in read_chunks(pathDataset, extD, chunk_rows):
+		rows, leaves = router(records, mbrs, typeGeom)
+		order = np.argsort(leaves, kind="stable")
+		rows, leaves = rows[order], leaves[order]
+		splits = np.flatnonzero(np.diff(leaves)) + 1
+		for leaf_rows, leaf in zip(np.split(rows, splits), leaves[np.r_[0, splits]] if len(leaves) else []):
+			if typeGeom == 3:
+				text = "\n".join(records[i] for i in leaf_rows) + "\n"
+			else:
+				text = records.iloc[leaf_rows].to_csv(index=False, header=False)
+			buffers.setdefault(int(leaf), []).append(text)
+			counts[leaf] += len(leaf_rows)
+			buffered += len(text)
+		if buffered > budget_bytes / 2:																# Buffer pieni --> scaricamento su disco
+			spill_buffers(buffers, spillPath, extD)
+			buffered = 0
+	spill_buffers(buffers, spillPath, extD)
+	return counts
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'spill_buffers':
+def spill_buffers(buffers, spillPath, extD):
+
+	"""
+	Funzione che accoda il contenuto dei buffer ai file di appoggio delle rispettive foglie e li svuota.
+	"""
+
+	for leaf, texts in buffers.items():
+		with open(f"{spillPath}_{leaf}{extD}", "a", encoding="utf-8") as f:
+			f.write("".join(texts))
+	buffers.clear()
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'compute_streaming':
+def compute_streaming(pathDataset, extD, bounds, histogram, boundaries, n_geom_partition, min_area_partition, outputIndex, typeGeom, budget_bytes, chunk_rows, options=None, writer=None):
+
+	"""
+	Funzione che costruisce le partizioni senza caricare il dataset in memoria: i confini vengono calcolati sull'istogramma
+	dei centri (QuadTree) oppure presi dal campione (boundaries), le geometrie vengono instradate a blocchi nei file di appoggio
+	delle foglie e le foglie rettangolari troppo popolose vengono divise in un secondo passaggio (in streaming se non entrano
+	nel budget, in memoria altrimenti).
+	--> PARAMETRI IN INGRESSO: percorso e estensione del dataset in questione (pathDataset, extD);
+							   finestra del dataset e istogramma dei centri (bounds, histogram);
+							   confini calcolati sul campione, None per usare l'istogramma (boundaries);
+ 							   numero di geometrie per partizione richiesto dall'utente (n_geom_partition);
+							   area minima per ciascuna partizione generata (min_area_partition);
+							   percorso in cui salvare le partizioni (outputIndex);
+							   tipo di geometria da salvare (typeGeom);
+							   budget di memoria espresso in byte (budget_bytes);
+							   numero di righe per blocco (chunk_rows);
+							   parametri facoltativi di salvataggio delle partizioni (options);
+							   pool di scrittura in background delle partizioni, None per scrivere in modo sincrono (writer).
+	--> PARAMETRI IN USCITA: tempo impiegato per il salvataggio delle partizioni relative al dataset in questione (time_saving);
+							 righe da salvare nella Master Table del dataset in questione (master_table).
+	"""
+
+	max_geom = int(math.ceil(n_geom_partition))															# Limite massimo di geometrie per partizione: numGeomPartition
+	spillFolder = os.path.join(outputIndex, "_spill")													# Cartella temporanea con i file di appoggio delle foglie
+	shutil.rmtree(spillFolder, ignore_errors=True)
+	os.makedirs(spillFolder)
+	partition_id = 0
+	master_rows = []
+	time_saving = 0.0
+
+	if boundaries is None:																				# Confini QuadTree calcolati sull'istogramma dei centri
+		leaves, table, edges_x, edges_y = stream_leaves(histogram, bounds, max_geom, min_area_partition)
+		router = lambda records, mbrs, typeGeom: route_geometries(mbrs, edges_x, edges_y, table)
+		logging.info(f"<System>      Number of leaves computed on the histogram: '{len(leaves)}'")
+	else:																								# Confini calcolati sul campione
+		leaves = partition_bboxes(boundaries)
+		router = lambda records, mbrs, typeGeom: assign_partitions(mbrs, *chunk_centers(records, mbrs, typeGeom), typeGeom, boundaries)
+	spillPath = os.path.join(spillFolder, "leaf")
+	counts = route_to_spills(pathDataset, extD, chunk_rows, router, len(leaves), spillPath, budget_bytes)
+	pending = [(f"{spillPath}_{leaf}{extD}", leaves[leaf], int(counts[leaf])) for leaf in range(len(leaves)) if counts[leaf] > 0]
+
+	while pending:																						# Secondo passaggio sulle foglie instradate
+		path, bbox, count = pending.pop()
+		if bbox is None:																				# Partizione senza finestra propria (STR, Hilbert) --> salvata così com'è
+			gdf, _, _ = load_dataset(path, extD)
+			os.remove(path)
+			start_partialTime_saving = time.perf_counter()
+			rows, partition_id = saving_partitions([{"gdf": gdf, "bbox": gdf.total_bounds, "replication": False}], outputIndex, typeGeom, partition_id, options, writer)
+			master_rows += rows
+			time_saving += float(time.perf_counter() - start_partialTime_saving)
+			continue
+		minX_node, minY_node, maxX_node, maxY_node = bbox
+		node_area = (maxX_node - minX_node) * (maxY_node - minY_node)
+		splittable = count > max_geom and node_area > min_area_partition
+		if splittable and os.path.getsize(path) > budget_bytes / 2:									# Foglia troppo popolosa e troppo pesante per il budget --> divisione in quattro quadranti in streaming
+			mid_x, mid_y = (minX_node + maxX_node) / 2, (minY_node + maxY_node) / 2
+			quadrants = [(minX_node, minY_node, mid_x, mid_y), (minX_node, mid_y, mid_x, maxY_node),
+						 (mid_x, minY_node, maxX_node, mid_y), (mid_x, mid_y, maxX_node, maxY_node)]
+			childPath = os.path.splitext(path)[0]
+			quadrant_x, quadrant_y = np.array([minX_node, mid_x, maxX_node]), np.array([minY_node, mid_y, maxY_node])
+			child_counts = route_to_spills(path, extD, chunk_rows, lambda records, mbrs, typeGeom: route_geometries(mbrs, quadrant_x, quadrant_y, np.arange(4).reshape(2, 2)), 4, childPath, budget_bytes)
+			if not all(child_count == count for child_count in child_counts if child_count > 0):		# Figli diversi dal padre --> vengono analizzati a loro volta
+				os.remove(path)
+				pending += [(f"{childPath}_{q}{extD}", quadrants[q], int(child_counts[q])) for q in range(4) if child_counts[q] > 0]
+				continue
+			for q in range(4):																			# Figli identici al padre --> la foglia viene salvata così com'è
+				if child_counts[q] > 0:
+					os.remove(f"{childPath}_{q}{extD}")
+			splittable = False
+
+		gdf, _, _ = load_dataset(path, extD)															# La foglia entra nel budget --> caricamento in memoria
+		os.remove(path)
+		node = {"gdf": gdf, "bbox": bbox}
+		partitions = quadtree_partitions(node, max_geom, min_area_partition) if splittable else [node]
+		start_partialTime_saving = time.perf_counter()
+		rows, partition_id = saving_partitions(partitions, outputIndex, typeGeom, partition_id, options, writer)	# Salvataggio delle partizioni
+		master_rows += rows
+		time_saving += float(time.perf_counter() - start_partialTime_saving)
+
+	shutil.rmtree(spillFolder, ignore_errors=True)
+	return time_saving, master_rows
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'quadtree_partitions':
+def quadtree_partitions(node, max_geom, min_area_partition, keep_empty=False):
+
+	"""
+	Funzione che divide in memoria un nodo con le stesse regole di 'compute_quadtree' e ne restituisce le foglie
+	(con 'keep_empty' anche quelle vuote, in modo che le foglie ricoprano l'intera finestra del nodo).
+	"""
+
+	partitions = []
+	current_level = [node]
+	while current_level:
+		next_level = []
+		for node in current_level:
+			minX_node, minY_node, maxX_node, maxY_node = node["bbox"]
+			node_area = (maxX_node - minX_node) * (maxY_node - minY_node)
+			if len(node["gdf"]) <= max_geom or node_area <= min_area_partition:
+				partitions.append(node)
+				continue
+			children = partitioning_node(node, keep_empty)
+			if not children or all(len(child["gdf"]) == len(node["gdf"]) for child in children):
+				partitions.append(node)
+			else:
+				next_level.extend(children)
+		current_level = next_level
+	return partitions
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'sample_boundaries':
+def sample_boundaries(sample, typeGeom, algorithmPartition, n_geom_partition, max_bytes_partition, min_area_partition, bounds, numGeom, queries=None):
+
+	"""
+	Funzione che calcola i confini delle partizioni applicando l'algoritmo scelto al solo campione del dataset (il numero di
+	geometrie per partizione viene riscalato sulla dimensione del campione):
+	- 'quadtree' e 'workload' --> regioni rettangolari (foglie dell'albero costruito sul campione);
+	- 'str' --> tagli lungo x delle fasce verticali e, per ogni fascia, tagli lungo y;
+	- 'hilbert' --> chiavi di Hilbert che separano partizioni consecutive lungo la curva.
+	--> PARAMETRI IN INGRESSO: GeoDataFrame del campione (sample);
+							   tipo di geometria (typeGeom);
+							   algoritmo di partizionamento (algorithmPartition);
+ 							   numero di geometrie per partizione richiesto dall'utente (n_geom_partition);
+							   peso massimo in bytes di ciascuna partizione, None se si taglia per numero di geometrie (max_bytes_partition);
+							   area minima per ciascuna partizione generata (min_area_partition);
+							   finestra del dataset (bounds);
+							   numero di geometrie del dataset (numGeom);
+							   array (numQuery x 4) con le finestre delle queries, per l'algoritmo 'workload' (queries).
+	--> PARAMETRI IN USCITA: dizionario con i confini delle partizioni (boundaries).
+	"""
+
+	scale = numGeom / len(sample)																		# Geometrie del dataset rappresentate da ciascuna geometria del campione
+	max_geom = max(1, int(math.ceil(n_geom_partition / scale)))										# Limite di geometrie per partizione riscalato sul campione
+	bbox = tuple(bounds)
+
+	if algorithmPartition in ["quadtree", "workload"]:													# Regioni rettangolari
+		if algorithmPartition == "quadtree":
+			leaves = quadtree_partitions({"gdf": sample, "bbox": bbox}, max_geom, min_area_partition, keep_empty=True)
+		else:
+			leaves = workload_leaves(workload_tree(sample, bbox, max_geom, min_area_partition, queries, scale, keep_empty=True), queries, max_geom)
+		boxes = np.array([leaf["bbox"] for leaf in leaves], dtype=float).reshape(-1, 4)					# Le regioni (quadranti vuoti compresi) ricoprono l'intera finestra del dataset
+		tree = STRtree(shapely.box(boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]))
+		return {"algorithm": "regions", "boxes": boxes, "tree": tree, "count": len(boxes)}
+
+	cx, cy = geometry_centers(sample, typeGeom)
+	if algorithmPartition == "str":																		# Tagli delle fasce verticali e delle partizioni di ogni fascia
+		n_partitions = max(1, math.ceil(len(sample) / max_geom))
+		slab_size = max(1, math.ceil(math.sqrt(n_partitions))) * max_geom
+		order_x = np.argsort(cx, kind="stable")
+		y_cuts = []
+		offsets = [0]
+		for start_slab in range(0, len(order_x), slab_size):
+			slab_cy = np.sort(cy[order_x[start_slab:start_slab + slab_size]])
+			y_cuts.append(slab_cy[max_geom::max_geom])
+			offsets.append(offsets[-1] + len(y_cuts[-1]) + 1)
+		return {"algorithm": "str", "x_cuts": cx[order_x[slab_size::slab_size]], "y_cuts": y_cuts, "offsets": np.array(offsets), "count": offsets[-1]}
+
+	keys = hilbert_keys(cx, cy, bbox)
+	order = np.argsort(keys, kind="stable")																# Campione ordinato lungo la curva
+	keys = keys[order]
+	if max_bytes_partition is None:																		# Taglio per numero di geometrie
+		positions = list(range(max_geom, len(keys), max_geom))
+	else:																								# Taglio per peso in bytes (peso del campione riscalato sul dataset)
+		cumulative = np.cumsum(geometry_sizes(sample, typeGeom)[order] * scale)
+		positions = []
+		start = 0
+		while True:
+			offset = cumulative[start - 1] if start > 0 else 0
+			start = max(int(np.searchsorted(cumulative, offset + max_bytes_partition, side="right")), start + 1)
+			if start >= len(keys):
+				break
+			positions.append(start)
+	return {"algorithm": "hilbert", "bbox": bbox, "key_cuts": keys[positions], "count": len(positions) + 1}
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'partition_bboxes':
+def partition_bboxes(boundaries):
+
+	"""
+	Funzione che restituisce la finestra di ciascuna partizione definita dai confini passati: la regione per 'quadtree' e
+	'workload', None (finestra = MBR effettivo delle geometrie assegnate) per 'str' e 'hilbert'.
+	"""
+
+	if boundaries["algorithm"] == "regions":
+		return [tuple(b) for b in boundaries["boxes"]]
+	return [None] * boundaries["count"]
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'chunk_centers':
+def chunk_centers(records, mbrs, typeGeom):
+
+	"""
+	Funzione che calcola i centri delle geometrie di un blocco letto (come 'geometry_centers': centroide per i POLYGON).
+	"""
+
+	if typeGeom == 3:
+		centroids = gpd.GeoSeries.from_wkt(records).centroid
+		return centroids.x.to_numpy(dtype=float), centroids.y.to_numpy(dtype=float)
+	return (mbrs[:, 0] + mbrs[:, 2]) / 2, (mbrs[:, 1] + mbrs[:, 3]) / 2
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'assign_partitions':
+def assign_partitions(mbrs, cx, cy, typeGeom, boundaries):
+
+	"""
+	Funzione che assegna, in un unico passaggio vettoriale, ogni geometria alle partizioni definite dai confini passati:
+	con le regioni una geometria va in tutte quelle intersecate dal suo MBR (come nel QuadTree); con 'str' e 'hilbert'
+	va nell'unica partizione del suo centro.
+	--> PARAMETRI IN INGRESSO: MBR delle geometrie (mbrs);
+							   centri delle geometrie (cx, cy);
+							   tipo di geometria (typeGeom);
+							   confini delle partizioni (boundaries).
+	--> PARAMETRI IN USCITA: indici delle righe e partizioni di destinazione (una coppia per ogni copia della geometria).
+	"""
+
+	if boundaries["algorithm"] == "regions":
+		geoms = shapely.points(cx, cy) if typeGeom == 1 else shapely.box(mbrs[:, 0], mbrs[:, 1], mbrs[:, 2], mbrs[:, 3])
+		return boundaries["tree"].query(geoms)															# Coppie (geometria, regione) con MBR che si intersecano
+
+	if boundaries["algorithm"] == "str":
+		slab = np.searchsorted(boundaries["x_cuts"], cx, side="right")									# Fascia verticale di ciascuna geometria
+		ids = np.empty(len(cx), dtype=np.int64)
+		for s, y_cuts in enumerate(boundaries["y_cuts"]):
+			in_slab = slab == s
+			ids[in_slab] = boundaries["offsets"][s] + np.searchsorted(y_cuts, cy[in_slab], side="right")
+		return np.arange(len(cx)), ids
+
+	keys = hilbert_keys(cx, cy, boundaries["bbox"])
+	rows = np.argsort(keys, kind="stable")																# Geometrie nell'ordine della curva
+	return rows, np.searchsorted(boundaries["key_cuts"], keys[rows], side="right")
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'compute_sampled':
+def compute_sampled(gdf, boundaries, n_geom_partition, min_area_partition, outputIndex, typeGeom, options=None, writer=None):
+
+	"""
+	Funzione che costruisce le partizioni a partire dai confini calcolati sul campione: tutte le geometrie vengono assegnate
+	alle partizioni in un unico passaggio vettoriale, senza filtrare il dataset ad ogni livello dell'albero. Le regioni
+	che, per errore di campionamento, superano il numero di geometrie richiesto vengono divise con le regole del QuadTree.
+	--> PARAMETRI IN INGRESSO: GeoDataFrame contenente le geometrie del dataset in questione (gdf);
+							   confini delle partizioni calcolati sul campione (boundaries);
+ 							   numero di geometrie per partizione richiesto dall'utente (n_geom_partition);
+							   area minima per ciascuna partizione generata (min_area_partition);
+							   percorso in cui salvare le partizioni (outputIndex);
+							   tipo di geometria da salvare (typeGeom);
+							   parametri facoltativi di salvataggio delle partizioni (options);
+							   pool di scrittura in background delle partizioni, None per scrivere in modo sincrono (writer).
+	--> PARAMETRI IN USCITA: tempo impiegato per il salvataggio delle partizioni relative al dataset in questione (time_saving);
+							 righe da salvare nella Master Table del dataset in questione (master_table).
+	"""
+
+	max_geom = int(math.ceil(n_geom_partition))															# Limite massimo di geometrie per partizione: numGeomPartition
+	partitions = []																						# Lista contenente i DataFrame che corrispondono alle partizioni del dataset in questione da salvare
+	partition_id = 0																					# Contatore di partizioni
+	partitions_size = 8																					# Numero che identifica quante partizioni bisogna trovare prima di iniziare a salvarle
+	master_rows = []																					# Lista contenente le righe da salvare nella master table
+	time_saving = 0.0																					# Tempo impiegato per salvare le partizioni
+
+	cx, cy = geometry_centers(gdf, typeGeom)
+	rows, ids = assign_partitions(gdf.geometry.bounds.to_numpy(), cx, cy, typeGeom, boundaries)		# Unico passaggio sull'intero dataset
+	order = np.argsort(ids, kind="stable")
+	rows, ids = rows[order], ids[order]
+	splits = np.flatnonzero(np.diff(ids)) + 1
+	bboxes = partition_bboxes(boundaries)
+	logging.info(f"<System>      Number of partitions computed on the sample: '{boundaries['count']}'")
+
+	for part_rows, part in zip(np.split(rows, splits), ids[np.r_[0, splits]] if len(ids) else []):
+		sub_gdf = gdf.iloc[part_rows]
+		if bboxes[part] is None:																		# Finestra = MBR effettivo delle geometrie assegnate (nessuna replica)
+			partitions.append({"gdf": sub_gdf, "bbox": sub_gdf.total_bounds, "replication": False})
+		else:																							# Regione: eventuale divisione se sovrappopolata
+			partitions += quadtree_partitions({"gdf": sub_gdf, "bbox": bboxes[part]}, max_geom, min_area_partition)
+
+		if len(partitions) >= partitions_size:															# Se ho abbastanza partizioni pronte per essere salvate, procedo con il loro salvataggio:
+			start_partialTime_saving = time.perf_counter()
+			rows_master, partition_id = saving_partitions(partitions, outputIndex, typeGeom, partition_id, options, writer)	# Salvataggio delle partizioni
+			master_rows += rows_master
+			time_saving += float(time.perf_counter() - start_partialTime_saving)
+			partitions.clear()																			# Rimozione delle partizioni appena salvate
+
+	if partitions:																						# Se ho ancora partizioni da salvare:
+		start_partialTime_saving = time.perf_counter()
+		rows_master, partition_id = saving_partitions(partitions, outputIndex, typeGeom, partition_id, options, writer)		# Salvataggio delle partizioni
+		master_rows += rows_master
+		time_saving += float(time.perf_counter() - start_partialTime_saving)
+		partitions.clear()																				# Rimozione delle partizioni appena salvate
+
+	return time_saving, master_rows
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'encode_partition':
+def encode_partition(gdf_subset, typeGeom):
+
+	"""
+	Funzione che codifica le geometrie di una partizione nel formato binario a colonne (little-endian), leggibile
+	con numpy.memmap senza parsing:
+	- POINT: colonna float64 delle x seguita dalla colonna float64 delle y;
+	- BOX: colonne float64 xmin, ymin, xmax, ymax (una dopo l'altra);
+	- POLYGON: numero di geometrie (int64), offsets (int64, numero di geometrie + 1 valori) e geometrie in WKB.
+	--> PARAMETRI IN INGRESSO: GeoDataFrame contenente le geometrie della partizione (gdf_subset);
+							   tipo di geometria da salvare (typeGeom).
+	--> PARAMETRI IN USCITA: contenuto binario della partizione (bytes).
+	"""
+
+	geometries = gdf_subset.geometry
+	if typeGeom == 3:																# POLYGON: offsets + WKB
+		blobs = [g.wkb for g in geometries]
+		offsets = np.zeros(len(blobs) + 1, dtype="<i8")
+		offsets[1:] = np.cumsum([len(b) for b in blobs])
+		return np.array([len(blobs)], dtype="<i8").tobytes() + offsets.tobytes() + b"".join(blobs)
+	if typeGeom == 1:																# POINT: colonne x, y
+		columns = [geometries.x.to_numpy(), geometries.y.to_numpy()]
+	else:																			# BOX: colonne xmin, ymin, xmax, ymax
+		columns = geometries.bounds.to_numpy().T
+	return np.ascontiguousarray(columns, dtype="<f8").tobytes()
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'compress_partition':
+def compress_partition(content, compression, n_columns, data_bounds):
+
+	"""
+	Funzione che comprime il contenuto di una partizione:
+	- 'zlib': compressione zlib dei bytes della partizione (qualsiasi formato, senza perdita);
+	- 'delta': solo colonne float64 (POINT e BOX binari), differenza tra i bit (int64) di ogni coordinata e la precedente
+	  della stessa colonna, bytes riordinati per posizione (byte shuffle) e compressi con zlib (senza perdita);
+	- 'quantized': solo colonne float64, coordinate quantizzate su uint32 rispetto all'MBR effettivo della partizione
+	  (i minimi delle box arrotondati per difetto e i massimi per eccesso), precedute da origine e passo di quantizzazione
+	  (4 float64) e compresse come 'delta' (con perdita: errore massimo pari al passo).
+	--> PARAMETRI IN INGRESSO: contenuto della partizione (content);
+							   compressione da applicare (compression);
+							   numero di colonne float64 per geometria, 2 per POINT e 4 per BOX (n_columns);
+							   MBR effettivo delle geometrie della partizione (data_bounds).
+	--> PARAMETRI IN USCITA: contenuto compresso della partizione (bytes).
+	"""
+
+	if compression == "zlib":
+		return zlib.compress(content, COMPRESSION_LEVEL)
+	columns = np.frombuffer(content, dtype="<f8").reshape(n_columns, -1)
+	header = b""
+	if compression == "delta":
+		payload = np.diff(columns.view("<i8"), axis=1, prepend=np.zeros((n_columns, 1), dtype="<i8"))
+	else:
+		axes = [0, 1, 0, 1][:n_columns]												# Asse (x o y) di ciascuna colonna
+		origin = np.array(data_bounds[:2], dtype=float)
+		extent = np.array(data_bounds[2:], dtype=float) - origin
+		step = np.where(extent > 0, extent / QUANTIZATION_MAX, 1.0)
+		scaled = (columns - origin[axes][:, None]) / step[axes][:, None]
+		if n_columns == 4:															# BOX: MBR quantizzato che contiene quello originale
+			scaled = np.concatenate([np.floor(scaled[:2]), np.ceil(scaled[2:])])
+		payload = np.clip(np.rint(scaled), 0, QUANTIZATION_MAX).astype("<u4")
+		header = np.concatenate([origin, step]).astype("<f8").tobytes()
+	shuffled = np.ascontiguousarray(payload).view(np.uint8).reshape(-1, payload.dtype.itemsize).T.tobytes()
+	return header + zlib.compress(shuffled, COMPRESSION_LEVEL)
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'decompress_partition':
+def decompress_partition(stored, compression, n_columns):
+
+	"""
+	Funzione che decodifica il contenuto di una partizione compressa con 'compress_partition' (la stessa decodifica
+	è applicata da 'RangeQuery.py' in lettura).
+	--> PARAMETRI IN INGRESSO: contenuto compresso della partizione (stored);
+							   compressione applicata (compression);
+							   numero di colonne float64 per geometria (n_columns).
+	--> PARAMETRI IN USCITA: contenuto decodificato della partizione (bytes).
+	"""
+
+	if compression == "zlib":
+		return zlib.decompress(stored)
+	header = 32 if compression == "quantized" else 0
+	itemsize = 4 if compression == "quantized" else 8
+	shuffled = np.frombuffer(zlib.decompress(stored[header:]), dtype=np.uint8)
+	payload = shuffled.reshape(itemsize, -1).T.copy().view("<u4" if compression == "quantized" else "<i8").reshape(n_columns, -1)
+	if compression == "delta":
+		return np.cumsum(payload, axis=1, dtype="<i8").view("<f8").tobytes()
+	origin_x, origin_y, step_x, step_y = np.frombuffer(stored[:header], dtype="<f8")
+	axes = [0, 1, 0, 1][:n_columns]
+	origin, step = np.array([origin_x, origin_y])[axes], np.array([step_x, step_y])[axes]
+	return (origin[:, None] + payload * step[:, None]).astype("<f8").tobytes()
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'start_writer':
+def start_writer(writerThreads):
+
+	"""
+	Funzione che avvia il pool di thread che scrivono su disco le partizioni in background, in modo che il partizionamento
+	dei livelli successivi si sovrapponga alle scritture. Il numero di partizioni in attesa di scrittura è limitato
+	(WRITER_QUEUE volte il numero di thread), così da non trattenere in memoria troppe partizioni.
+	--> PARAMETRI IN INGRESSO: numero di thread di scrittura, 0 per scrivere le partizioni in modo sincrono (writerThreads).
+	--> PARAMETRI IN USCITA: pool di scrittura (writer), None se le scritture sono sincrone.
+	"""
+
+	if writerThreads <= 0:
+		return None
+	return {
+		"executor": ThreadPoolExecutor(max_workers=writerThreads),										# Thread di scrittura
+		"slots": threading.BoundedSemaphore(writerThreads * WRITER_QUEUE),								# Posti liberi nella coda di scrittura
+		"lock": threading.Lock(),																		# Accesso esclusivo al file dati unico ('packed')
+		"futures": []																					# Scritture inviate al pool
+	}
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'wait_writer':
+def wait_writer(writer):
+
+	"""
+	Funzione che attende il completamento di tutte le scritture inviate al pool (le righe della Master Table vengono
+	completate da ciascuna scrittura) e rilancia l'eventuale errore di scrittura.
+	"""
+
+	if writer is None:
+		return
+	for future in writer["futures"]:
+		future.result()
+	writer["futures"].clear()
+
 # -------------------------------------------------------------------------------------------------------------------------------
 # FUNZIONE 'saving_partitions':
-def saving_partitions(partitions, outputIndex, typeGeom, start_id):
+def saving_partitions(partitions, outputIndex, typeGeom, start_id, options=None, writer=None):
 
 	"""
-	Funzione che salva le partizioni generate.
+	Funzione che salva le partizioni generate. Con il pool di scrittura (writer) le partizioni vengono solo accodate:
+	le righe della Master Table restituite vengono completate (FileSize, Offset, Length, LocalIndex) al termine di ciascuna
+	scrittura, che va attesa con 'wait_writer' prima di usarle.
 	--> PARAMETRI IN INGRESSO: lista contenente le partizioni (nodi con GeoDataFrame all'interno) da salvare (partitions);
 							   percorso in cui salvare le partizioni (outputIndex);
 							   tipo di geometria da salvare (typeGeom);
-							   ID corrente delle partizioni utile per il salvataggio delle nuove (start_id).
+							   ID corrente delle partizioni utile per il salvataggio delle nuove (start_id);
+							   parametri facoltativi letti da 'indexParameters.csv': formato ('csv' o 'binary'), modalità
+							   di memorizzazione ('files' o 'packed') e indice locale ('none' o 'rtree') delle partizioni (options);
+							   pool di scrittura in background, None per scrivere in modo sincrono (writer).
 	--> PARAMETRI IN USCITA: lista contenente le righe da salvare nella Master Table (master_rows);
 							 ID nuovo per i prossimi salvataggi di partizioni (current_id).
 	"""
 
+	options = {**OPTIONAL_COLUMNS, **(options or {})}							# Parametri facoltativi non specificati --> valori di default
+	formatPartition = options["formatPartition"]
+	packed = options["storePartition"] == "packed"								# Partizioni accodate nell'unico file dati del dataset
 	master_rows = []
 	current_id = start_id
 	for part in partitions:
 		gdf_subset = part["gdf"]											# Estraggo dal DataFrame originale solo le geometrie appartenenti alla partizione in analisi
-		geom_col = gdf_subset.geometry.name
-		file_name = f"partition_{current_id}"
-		out_path = os.path.join(outputIndex, file_name)						# Costruisco il percorso di salvataggio
-
-		if typeGeom == 3:													# POLYGON, salvo in WKT
-			GeometryType = "POLYGON"
-			file_name += ".wkt"
-			out_path += ".wkt"
-			gdf_subset[geom_col].apply(lambda g: g.wkt).to_csv(out_path, index=False, header=False)
+		if formatPartition == "binary":										# Formato binario a colonne, salvo in BIN
+			file_name = f"partition_{current_id}.bin"
+		elif typeGeom == 3:													# POLYGON, salvo in WKT
+			file_name = f"partition_{current_id}.wkt"
+		else:																# POINT o BOX, salvo in CSV
+			file_name = f"partition_{current_id}.csv"
 
-		else:
-			file_name += ".csv"
-			out_path += ".csv"
-
-			if typeGeom == 1:												# POINT, salvo in CSV
-				GeometryType = "POINT"
-				df_out = pd.DataFrame({
-					"x": gdf_subset.geometry.x,
-					"y": gdf_subset.geometry.y
-				})
-			else:															# BOX, salvo in CSV
-				GeometryType = "BOX"
-				df_out = pd.DataFrame([
-					list(g.bounds) for g in gdf_subset.geometry
-				], columns=["xmin", "ymin", "xmax", "ymax"])
-
-			df_out.to_csv(out_path, index=False, header=False)
-		
-		# Costruzione della Master Table
+		# Costruzione della Master Table (i campi legati al file vengono completati dalla scrittura)
 		min_x, min_y, max_x, max_y = part["bbox"]
-		master_rows.append({
+		bounds = gdf_subset.geometry.bounds.to_numpy().reshape(-1, 4)		# MBR delle singole geometrie della partizione
+		replicated = 0														# Geometrie della partizione presenti anche in altre partizioni
+		if part.get("replication", True):									# Partizioni che replicano le geometrie in tutte quelle intersecate dal loro MBR
+			replicated = border_geometries(bounds, part["bbox"])
+		row = {
 			"ID": current_id,
 			"NamePartition": file_name,
 			"NumberGeometries": len(part["gdf"]),
-			"FileSize": os.path.getsize(out_path),
-			"GeometryType": GeometryType,
+			"FileSize": 0,
+			"GeometryType": {1: "POINT", 2: "BOX", 3: "POLYGON"}[typeGeom],	# Tipo di geometria da riportare nella Master Table
+			"Format": formatPartition,
+			"PackedFile": PACKED_FILE if packed else "",
+			"Offset": 0,
+			"Length": 0,
+			"LocalIndex": "",
+			"Compression": options["compressPartition"],
+			"CompressionRatio": 1.0,
+			"DecodeMBps": 0.0,
+			"Replicated": replicated,
 			"xMin": min_x,
 			"yMin": min_y,
 			"xMax": max_x,
-			"yMax": max_y
-		})
+			"yMax": max_y,
+			**partition_aggregates(bounds, part["bbox"], gdf_subset.geometry.area.to_numpy())
+		}
+		master_rows.append(row)
+
+		if writer is None:													# Scrittura sincrona
+			write_partition(gdf_subset, row, outputIndex, typeGeom, options)
+		else:																# Scrittura in background (attesa solo se la coda è piena)
+			writer["slots"].acquire()
+			future = writer["executor"].submit(write_partition, gdf_subset, row, outputIndex, typeGeom, options, writer["lock"])
+			future.add_done_callback(lambda _: writer["slots"].release())
+			writer["futures"].append(future)
 		current_id += 1
 	
 	return master_rows, current_id
 
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'partition_aggregates':
+def partition_aggregates(bounds, bbox, areas=None):
+
+	"""
+	Funzione che calcola le statistiche aggregate di una partizione riportate nella Master Table, utili per stimare e
+	filtrare senza aprire il file della partizione: MBR effettivo delle geometrie, area totale e media delle geometrie,
+	lati medi degli MBR e griglia AGGREGATE_GRID x AGGREGATE_GRID con il numero di geometrie il cui centro (dell'MBR) cade
+	in ciascuna cella della partizione (centri esterni assegnati alla cella di bordo più vicina). Usata anche da
+	'Augmentation.py' e 'Sampling.py' per le partizioni degli indici derivati.
+	--> PARAMETRI IN INGRESSO: array (numero geometrie x 4) con gli MBR delle geometrie (bounds);
+							   finestra della partizione [minX, minY, maxX, maxY] (bbox);
+							   array con l'area di ciascuna geometria, None per punti e box (area dell'MBR) (areas).
+	--> PARAMETRI IN USCITA: dizionario con le colonne 'DataXMin', 'DataYMin', 'DataXMax', 'DataYMax' (finestra della partizione
+							 se vuota), 'TotalArea', 'AvgArea', 'AvgWidth', 'AvgHeight' e 'CountGrid' (conteggi separati da spazi,
+							 righe dal basso verso l'alto e celle da sinistra verso destra).
+	"""
+
+	grid = np.zeros((AGGREGATE_GRID, AGGREGATE_GRID), dtype=np.int64)
+	min_x, min_y, max_x, max_y = bbox
+	if len(bounds) == 0:																# Partizione vuota
+		return {"DataXMin": min_x, "DataYMin": min_y, "DataXMax": max_x, "DataYMax": max_y,
+				"TotalArea": 0.0, "AvgArea": 0.0, "AvgWidth": 0.0, "AvgHeight": 0.0, "CountGrid": " ".join(map(str, grid.ravel()))}
+	cells = []
+	for low, high, centers in ((min_x, max_x, (bounds[:, 0] + bounds[:, 2]) / 2), (min_y, max_y, (bounds[:, 1] + bounds[:, 3]) / 2)):
+		if high > low:
+			cells.append(np.clip(((centers - low) / (high - low) * AGGREGATE_GRID).astype(np.int64), 0, AGGREGATE_GRID - 1))
+		else:																			# Partizione degenere lungo l'asse
+			cells.append(np.zeros(len(centers), dtype=np.int64))
+	np.add.at(grid, (cells[1], cells[0]), 1)
+	widths, heights = bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1]
+	if areas is None:																	# Punti (area nulla) e box
+		areas = widths * heights
+	return {
+		"DataXMin": float(bounds[:, 0].min()),
+		"DataYMin": float(bounds[:, 1].min()),
+		"DataXMax": float(bounds[:, 2].max()),
+		"DataYMax": float(bounds[:, 3].max()),
+		"TotalArea": float(areas.sum()),
+		"AvgArea": float(areas.mean()),
+		"AvgWidth": float(widths.mean()),
+		"AvgHeight": float(heights.mean()),
+		"CountGrid": " ".join(map(str, grid.ravel()))
+	}
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'border_geometries':
+def border_geometries(bounds, bbox):
+
+	"""
+	Funzione che conta le geometrie di una partizione che toccano o attraversano il bordo della sua finestra, ovvero quelle
+	salvate anche nelle partizioni adiacenti quando ogni geometria va in tutte le partizioni intersecate dal suo MBR (colonna
+	'Replicated' della Master Table: zero --> nessuna geometria condivisa con altre partizioni).
+	--> PARAMETRI IN INGRESSO: array (numero geometrie x 4) con gli MBR delle geometrie (bounds);
+							   finestra della partizione [minX, minY, maxX, maxY] (bbox).
+	--> PARAMETRI IN USCITA: numero di geometrie sul bordo della partizione.
+	"""
+
+	min_x, min_y, max_x, max_y = bbox
+	return int(((bounds[:, 0] <= min_x) | (bounds[:, 1] <= min_y) | (bounds[:, 2] >= max_x) | (bounds[:, 3] >= max_y)).sum())
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'write_partition':
+def write_partition(gdf_subset, row, outputIndex, typeGeom, options, lock=None):
+
+	"""
+	Funzione che codifica e scrive su disco una partizione (con il suo eventuale RTree locale) e completa la sua riga
+	della Master Table con dimensione, posizione nel file dati unico e nome dell'RTree locale.
+	--> PARAMETRI IN INGRESSO: GeoDataFrame della partizione (gdf_subset);
+							   riga della Master Table della partizione (row);
+							   percorso in cui salvare le partizioni (outputIndex);
+							   tipo di geometria da salvare (typeGeom);
+							   parametri facoltativi di salvataggio delle partizioni (options);
+							   lock del file dati unico, necessario con più thread di scrittura (lock).
+	"""
+
+	geom_col = gdf_subset.geometry.name
+	if row["Format"] == "binary":											# Formato binario a colonne
+		content = encode_partition(gdf_subset, typeGeom)
+
+	elif typeGeom == 3:														# POLYGON, salvo in WKT
+		content = gdf_subset[geom_col].apply(lambda g: g.wkt).to_csv(index=False, header=False).encode()
+
+	else:
+		if typeGeom == 1:													# POINT, salvo in CSV
+			df_out = pd.DataFrame({
+				"x": gdf_subset.geometry.x,
+				"y": gdf_subset.geometry.y
+			})
+		else:																# BOX, salvo in CSV
+			df_out = pd.DataFrame([
+				list(g.bounds) for g in gdf_subset.geometry
+			], columns=["xmin", "ymin", "xmax", "ymax"])
+
+		content = df_out.to_csv(index=False, header=False).encode()
+
+	if row["Compression"] != "none" and len(content) > 0:					# Compressione del contenuto, con rapporto di compressione e velocità di decodifica
+		n_columns = 2 if typeGeom == 1 else 4
+		data_bounds = (row["DataXMin"], row["DataYMin"], row["DataXMax"], row["DataYMax"])
+		stored = compress_partition(content, row["Compression"], n_columns, data_bounds)
+		start_decode = time.perf_counter()
+		decoded = decompress_partition(stored, row["Compression"], n_columns)
+		elapsed = time.perf_counter() - start_decode
+		if row["Compression"] != "quantized" and decoded != content:		# Compressione senza perdita: la decodifica deve restituire esattamente il contenuto
+			raise ValueError(f"<System> Lossless compression of partition '{row['ID']}' does not round-trip!")
+		row["CompressionRatio"] = len(content) / len(stored)
+		row["DecodeMBps"] = len(content) / (1024 * 1024) / max(elapsed, 1e-9)
+		content = stored
+	elif row["Compression"] != "none":										# Partizione vuota: nessun contenuto da comprimere
+		row["Compression"] = "none"
+
+	if row["PackedFile"]:													# Accodo la partizione al file dati unico, annotandone offset e lunghezza
+		with lock or threading.Lock():
+			with open(os.path.join(outputIndex, PACKED_FILE), "ab") as f:
+				row["Offset"] = f.tell()
+				f.write(content)
+	else:																	# Salvo la partizione nel proprio file
+		with open(os.path.join(outputIndex, row["NamePartition"]), "wb") as f:
+			f.write(content)
+	row["FileSize"] = len(content)
+	row["Length"] = len(content)
+
+	if options["localIndex"] == "rtree" and len(gdf_subset) > 0:			# Salvo accanto alla partizione il suo RTree locale
+		row["LocalIndex"] = f"partition_{row['ID']}_rtree"
+		saving_local_rtree(gdf_subset, os.path.join(outputIndex, row["LocalIndex"]))
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'saving_local_rtree':
+def saving_local_rtree(gdf_subset, basePath):
+
+	"""
+	Funzione che costruisce tramite bulk loading (STR) l'RTree locale di una partizione e lo salva su disco
+	('basePath.idx' e 'basePath.dat'). L'identificativo di ogni geometria è la sua posizione (riga) nel file della partizione.
+	--> PARAMETRI IN INGRESSO: GeoDataFrame contenente le geometrie della partizione (gdf_subset);
+							   percorso (senza estensione) dei file dell'RTree (basePath).
+	"""
+
+	for ext in [".idx", ".dat"]:													# Eventuale RTree di una indicizzazione precedente viene eliminato
+		if os.path.exists(basePath + ext):											# (con il bulk loading 'overwrite' non svuota i file esistenti)
+			os.remove(basePath + ext)
+	properties = index.Property()
+	properties.overwrite = True
+	bounds = gdf_subset.geometry.bounds.to_numpy()
+	local_rtree = index.Index(basePath, ((i, tuple(b), None) for i, b in enumerate(bounds)), properties=properties)
+	local_rtree.close()
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'saving_master_rtree':
+def saving_master_rtree(df_master, basePath):
+
+	"""
+	Funzione che costruisce tramite bulk loading (STR) l'RTree globale delle partizioni e lo salva su disco ('basePath.idx' e
+	'basePath.dat'), così che l'apertura dell'indice non richieda di leggere l'intera Master Table né di ricostruire l'albero.
+	Ogni partizione è indicizzata con l'MBR effettivo delle sue geometrie e riporta come oggetto la propria riga della Master
+	Table, completata con i bordi superiori della finestra coperta dall'indice (WindowXMax, WindowYMax).
+	--> PARAMETRI IN INGRESSO: Master Table dell'indice spaziale (df_master);
+							   percorso (senza estensione) dei file dell'RTree (basePath).
+	"""
+
+	for ext in [".idx", ".dat"]:													# Eventuale RTree di una indicizzazione precedente viene eliminato
+		if os.path.exists(basePath + ext):
+			os.remove(basePath + ext)
+	if df_master.empty:															# Nessuna partizione da indicizzare
+		return
+	properties = index.Property()
+	properties.overwrite = True
+	window = {"WindowXMax": float(df_master["xMax"].max()), "WindowYMax": float(df_master["yMax"].max())}
+	rows = df_master.drop(columns=["SourceSize", "SourceMtime", "SourceHash", "IndexParameters"], errors="ignore").to_dict("records")
+	bounds = df_master[["DataXMin", "DataYMin", "DataXMax", "DataYMax"]].to_numpy(dtype=float)
+	master_rtree = index.Index(basePath, ((i, tuple(b), {**row, **window}) for i, (b, row) in enumerate(zip(bounds, rows))), properties=properties)
+	master_rtree.close()
+
+# -------------------------------------------------------------------------------------------------------------------------------
 # Logging usato per stampa corretta in fase di multiprocessing
 def init_worker():
 	logging.basicConfig(
@@ -408,22 +2097,44 @@ def main():
 	print(f"[Main] <System>      Time taken: {total_time_analysisInputFile:.6f} s")
 
 	print("[Main] <System> Starting the dataset partitioning process!")
-	tasks = [														# Preparazione di una lista di task da eseguire (una per ogni dataset da partizionare)
-		(
-			row.pathDatasets,										# Path completo in cui è contenuto l'i-esimo dataset
-			row.nameDataset,										# Nome completo con estensione dell'i-esimo dataset
+	groups = {}														# Configurazioni raggruppate per dataset (un solo caricamento per dataset)
+	summary = {}													# Esito di ogni riga di 'indexParameters.csv' (posizione --> messaggio)
+	positions = {}													# Configurazione inviata ai processi --> posizione della riga
+	for position, row in enumerate(df.itertuples(index=False)):
+		configurations = groups.setdefault((row.pathDatasets, row.nameDataset), [])
+		if any(pathIndexes == row.pathIndexes for pathIndexes, *_ in configurations):	# Stessa cartella dell'indice --> gli indici si sovrascriverebbero
+			print(f"[Main] <System> Configuration '{row.typePartition}' = '{row.num}' for '{row.nameDataset}' skipped: the index folder '{row.pathIndexes}' is already used by another row of the same dataset!")
+			summary[position] = f"SKIPPED - {row.nameDataset} ('{row.typePartition}' = '{row.num}', indexes in '{row.pathIndexes}') -> index folder already used by another row"
+			continue
+		positions[(row.pathDatasets, row.nameDataset, row.pathIndexes)] = position
+		configurations.append((
 			row.pathIndexes,										# Cartella dove verranno salvati gli indici spaziali
 			row.typePartition,										# Tipo di partizione richiesta dall'utente (partitions || geometries || bytes) relativa all'i-esimo dataset
-			row.num													# Numero correlato al tipo di partizione richiesta dall'utente
+			row.num,												# Numero correlato al tipo di partizione richiesta dall'utente
+			{column: getattr(row, column) for column in OPTIONAL_COLUMNS}	# Parametri facoltativi (algoritmo di partizionamento, ...)
+		))
+	tasks = [														# Preparazione di una lista di task da eseguire (una per ogni dataset da partizionare, con tutte le sue configurazioni)
+		(
+			pathDatasets,											# Path completo in cui è contenuto l'i-esimo dataset
+			nameDataset,											# Nome completo con estensione dell'i-esimo dataset
+			configurations											# Configurazioni (cartella degli indici, tipo di partizione, numero e parametri facoltativi)
 		)
-		for row in df.itertuples(index=False)						# Generazione di un task per ciascun dataset
+		for (pathDatasets, nameDataset), configurations in groups.items()
 	]
-	print(f"[Main] <System> Number of tasks generated: {len(tasks)}")
+	workers = max(1, cpu_count() - 1)															# Processi disponibili
+	batches = pack_tasks(tasks, workers)														# Dataset piccoli raggruppati in poche task
+	print(f"[Main] <System> Number of tasks generated: {len(tasks)} (sent as {len(batches)} batches)")
 
-	with Pool(max(1, cpu_count() - 1), initializer=init_worker) as pool:						# Invio dei tasks in parallelo (carico di lavoro distribuito)
-		pool.map(index_dataset_wrapper, tasks)
+	with Pool(workers, initializer=init_worker) as pool:										# Invio dei tasks in parallelo (carico di lavoro distribuito)
+		for results in pool.map(index_batch_wrapper, batches, chunksize=1):
+			for pathDatasets, nameDataset, pathIndexes, message in results:
+				summary[positions[(pathDatasets, nameDataset, pathIndexes)]] = message
 
 	print()
+	print(f"[Main] <System> Results for {len(summary)} configurations:")					# Esito di ogni riga, nell'ordine di 'indexParameters.csv'
+	for position in sorted(summary):
+		print(f"[Main] <System>      {summary[position]}")
+	print()
 	print("[Main] <System> Program finished.\n")
 
 
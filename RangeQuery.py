@@ -1,11 +1,39 @@
+import hashlib
+import io
+import numpy as np
 import os
 import time
+import zlib
 import pandas as pd
+import shutil
+import shapely
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from multiprocessing import cpu_count
+from multiprocessing import Pool, cpu_count
 from rtree import index
+from types import SimpleNamespace
 from shapely.geometry import box
 from shapely.wkt import loads
+from shapely import wkb
+
+MASTER_RTREE = "master_rtree"													# Nome (senza estensione) dell'RTree globale delle partizioni salvato da 'Indexing.py'
+SUMMARY_CACHE = {}																# Sommari già letti in questa esecuzione (percorso --> DataFrame indicizzato per dataset)
+PARTITION_CACHE = True															# MODIFICA con False per tempi a cache fredda (ogni query ricarica le partizioni candidate)
+BATCH_QUERIES = False															# MODIFICA con True per eseguire le queries di un dataset in blocco (ogni partizione caricata una sola volta)
+QUERY_PROCESSES = 0																# MODIFICA con il numero di processi (es. cpu_count()) per distribuire le queries su più processi (0 --> esecuzione nel processo principale)
+PARALLEL_DATASETS = 0															# MODIFICA con il numero di processi per elaborare più dataset in parallelo (0 --> un dataset alla volta)
+QUERY_CHUNK = 16																# Queries consecutive inviate insieme allo stesso processo (partizioni già caricate riusate)
+WORKER_INDEXES = {}																# Indici globali aperti dal processo worker in questione (cartella dell'indice --> indice globale di open_master_index)
+PARTITION_CACHE_MB = 512														# Memoria massima (MB, stimata) delle partizioni caricate mantenute tra una query e l'altra
+GEOMETRY_BYTES = 300															# Memoria stimata di una geometria shapely e della sua voce nell'RTree locale (escluse le coordinate)
+PARTITION_CACHE_ENTRIES = OrderedDict()											# Partizioni caricate, dalla meno alla più recentemente usata (chiave --> {loaded, size, users, evicted})
+PARTITION_CACHE_LOCK = threading.Lock()											# Accesso condiviso alla cache da parte dei thread delle queries
+PARTITION_CACHE_STATS = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0}		# Contatori della cache delle partizioni
+PHASES = ("io", "parse", "index", "filter", "refine", "queue", "cpu")			# Fasi misurate per ogni query (ms): lettura, parsing, RTree locale, filtro sugli MBR, test esatti, attesa in coda e tempo CPU
+PHASE_TIMES = threading.local()													# Tempi per fase del thread in questione (attivi durante l'analisi di una query o di una partizione)
+PAGE_BYTES = 4096																# Dimensione di una pagina di memoria (lettura effettiva delle partizioni mappate)
 
 # -------------------------------------------------------------------------------------------------------------------------------
 # FUNZIONE 'analyze_csv':
@@ -41,34 +69,35 @@ def get_geometry(dataset_name, folder_summaries, name_summaries):
 	if not os.path.isfile(path_summaries):																# Se il file non esiste...
 		raise FileNotFoundError(f"<System> The file '{name_summaries}' does not exist!")				# ... mando un messaggio di errore!
 
-	df = pd.read_csv(path_summaries, sep=';')															# Apertura del file e relativo salvataggio
+	df = read_summary(path_summaries)																	# Sommario letto una sola volta per esecuzione (cache)
 
-	required_cols = {"datasetName", "geometry"}															# Colonne necessarie per la ricerca della geometria
-	if not required_cols.issubset(df.columns):															# Verifica dell'esistenza delle colonne richieste
-		raise ValueError(f"<System> Columns '{required_cols}' not found in '{name_summaries}'.")
+	if "geometry" not in df.columns:																	# Verifica dell'esistenza della colonna richiesta
+		raise ValueError(f"<System> Columns '{{'datasetName', 'geometry'}}' not found in '{name_summaries}'.")
 	
-	row = df.loc[df["datasetName"] == dataset_name]														# Filtro la riga relativa al datset in questione
-
-	if row.empty:																						# Verifico dell'effettiva esistenza del dataset in questione
+	if dataset_name not in df.index:																	# Verifico dell'effettiva esistenza del dataset in questione
 		raise ValueError(f"<System> The dataset '{dataset_name}' not found in '{name_summaries}'.")
 	
-	return row.iloc[0]["geometry"]
+	return df.at[dataset_name, "geometry"]
 
 # -------------------------------------------------------------------------------------------------------------------------------
 # FUNZIONE 'analysis_output_file':
-def analysis_output_file(output_filePath, dataset_name):
+def analysis_output_file(output_filePath, dataset_names):
 	
 	"""
-	Funzione che analizza il file di output lasciando solo le righe diverse dal dataset in analisi.
+	Funzione che analizza il file di output lasciando solo le righe diverse dai dataset in analisi: il file viene riscritto
+	una sola volta per tutti i dataset dell'esecuzione che vi salvano i risultati, non una volta per dataset.
 	Se il file non esiste, viene generato con l'header richiesto.
 	--> PARAMETRI IN INGRESSO: percorso in cui salvare gli esiti delle range queries (output_filePath);
-							   nome del dataset in questione (dataste_name).
+							   nomi dei dataset in questione (dataset_names).
 	"""
 	
-	header_cols = ["datasetName", "numQuery", "queryArea",	"minX", "minY", "maxX", "maxY",	"areaint", "cardinality", "mbrTests", "averageExecutionTime", "numberParallelThreads", "totalExecutionTime"]
+	header_cols = ["datasetName", "numQuery", "queryArea",	"minX", "minY", "maxX", "maxY",	"areaint", "cardinality", "mbrTests", "averageExecutionTime", "numberParallelThreads", "totalExecutionTime"] + [f"{name}Time" for name in PHASES]
 	if os.path.isfile(output_filePath):
 		df_out = pd.read_csv(output_filePath, sep=';')					# Leggo il CSV esistente
-		df_out = df_out[df_out["datasetName"] != dataset_name]			# Filtro tutte le righe che NON iniziano con il nome del dataset in questione
+		df_out = df_out[~df_out["datasetName"].isin(dataset_names)]		# Filtro tutte le righe che NON appartengono ai dataset in questione
+		for column in header_cols:										# File precedenti senza i tempi per fase: colonne aggiunte vuote
+			if column not in df_out.columns:
+				df_out[column] = np.nan
 	else:
 		df_out = pd.DataFrame(columns=header_cols)						# Creazione di un DataFrame vuoto con solo l'header
 	df_out.to_csv(output_filePath, sep=';', index=False)				# Riscrivo il file con il contenuto filtrato o con l’header se nuovo
@@ -76,23 +105,43 @@ def analysis_output_file(output_filePath, dataset_name):
 
 # -------------------------------------------------------------------------------------------------------------------------------
 # FUNZIONE 'analyze_rangeQueries':
-def analyze_rangeQueries(file_path, dataset_name):
+def analyze_rangeQueries(file_path, dataset_names):
 
 	"""
-	Funzione che passato in ingresso un file '.csv' contenente le range queries, restituisca quelle relative al dataset in analisi
-	(colonne del file: "datasetName", "numQuery", "queryArea", "minX", "minY", "maxX", "maxY", "areaint").
+	Funzione che passato in ingresso un file '.csv' contenente le range queries, restituisca quelle relative ai dataset in analisi
+	(colonne del file: "datasetName", "numQuery", "queryArea", "minX", "minY", "maxX", "maxY", "areaint"). Il file viene letto
+	una sola volta per tutti i dataset dell'esecuzione che lo usano e le queries vengono raggruppate per dataset.
 	--> PARAMETRI IN INGRESSO: percorso del file (file_path);
-							   nome del dataset in analisi (dataset_name).
-	--> PARAMETRI IN USCITA: DataFrame con ciascuna riga una query legata al dataset in analisi (["datasetName", "numQuery", "queryArea",
-							 "minX", "minY", "maxX", "maxY", "areaint"]).
+							   nomi dei dataset in analisi (dataset_names).
+	--> PARAMETRI IN USCITA: dizionario nome dataset --> DataFrame con ciascuna riga una query legata al dataset (["datasetName",
+							 "numQuery", "minX", "minY", "maxX", "maxY"]).
 	"""
 
 	expected = ["datasetName", "numQuery", "minX", "minY", "maxX", "maxY"]						# Seleziono le sole colonne che mi interessano
 	chunks = pd.read_csv(file_path, sep=';', usecols=expected, chunksize=100_000)				# Leggo a chunk di 100000 righe il file
-	df = pd.concat(chunk[chunk["datasetName"] == dataset_name] for chunk in chunks)				# Unisco filtrando per nome del dataset
+	df = pd.concat(chunk[chunk["datasetName"].isin(dataset_names)] for chunk in chunks)			# Unisco filtrando per nome dei dataset
 	if df.columns.tolist() != expected:															# Se l'header è sbagliato, mando un errore!
 		raise ValueError(f"<System> ERROR: the CSV header expected is '{expected}'...")
-	return df																					# Restituisco il DataFrame
+	df = df.astype({"minX": float, "minY": float, "maxX": float, "maxY": float})				# Tipizzazione dei valori trovati
+	groups = {name: group for name, group in df.groupby("datasetName", sort=False)}			# Raggruppo le queries per dataset
+	return {name: groups.get(name, df.iloc[0:0]) for name in dataset_names}					# Restituisco un DataFrame (anche vuoto) per ogni dataset
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'read_summary':
+def read_summary(summary_filePath):
+
+	"""
+	Funzione che legge il sommario dei dataset una sola volta per esecuzione: le letture successive dello stesso
+	file (una per dataset e per funzione) riusano il DataFrame già indicizzato per nome del dataset.
+	--> PARAMETRI IN INGRESSO: percorso del file contenente il sommario dei dataset (summary_filePath).
+	--> PARAMETRI IN USCITA: DataFrame del sommario con indice "datasetName".
+	"""
+
+	if summary_filePath not in SUMMARY_CACHE:
+		df = pd.read_csv(summary_filePath, sep=';')										# Leggo il sommario
+		df = df.drop_duplicates("datasetName").set_index("datasetName", drop=False)		# Indicizzo per nome del dataset (prima occorrenza, come nel filtro originale)
+		SUMMARY_CACHE[summary_filePath] = df
+	return SUMMARY_CACHE[summary_filePath]
 
 # -------------------------------------------------------------------------------------------------------------------------------
 # FUNZIONE 'MBR_values':
@@ -106,16 +155,16 @@ def MBR_values(summary_filePath, dataset_name):
 	--> PARAMETRI IN USCITA: valori della finestra di dataset e numero totali di geometrie nel dataset.
 	"""
 
-	df = pd.read_csv(summary_filePath, sep=';')							# Leggo il sommario
-	dataset = df.loc[df["datasetName"] == dataset_name]					# Filtro la riga con il solo nome del dataset in questione
-	if dataset.empty:													# Se non ho trovato il dataset, mando un messaggio di errore
+	df = read_summary(summary_filePath)									# Leggo il sommario (una sola volta per esecuzione)
+	if dataset_name not in df.index:									# Se non ho trovato il dataset, mando un messaggio di errore
 		raise ValueError(f"<System> Dataset '{dataset_name}' not found in summary file.")
+	dataset = df.loc[dataset_name]										# Riga con il solo nome del dataset in questione
 	return (
-		float(dataset.iloc[0]["x1"]),
-		float(dataset.iloc[0]["y1"]),
-		float(dataset.iloc[0]["x2"]),
-		float(dataset.iloc[0]["y2"]),
-		int(dataset.iloc[0]["num_features"])
+		float(dataset["x1"]),
+		float(dataset["y1"]),
+		float(dataset["x2"]),
+		float(dataset["y2"]),
+		int(dataset["num_features"])
 	)
 
 # -------------------------------------------------------------------------------------------------------------------------------
@@ -126,22 +175,160 @@ def load_master_table(folder):
 	Funzione che costruisce una lista contenente le informazioni principali sulle partizioni
 	del dataset in questione, partendo dalla master_table associata all'indice spaziale.
 	--> PARAMETRI IN INGRESSO: path della cartella contenente partizioni e master_table (folder).
-	--> PARAMETRI IN USCITA: lista di partizioni con le seguenti informazioni {path_partition, bound_partition};
+	--> PARAMETRI IN USCITA: lista di partizioni con le seguenti informazioni {path_partition, bound_partition, format_partition,
+							 packed_partition, offset_partition, length_partition, local_index_partition, compression_partition,
+							 replicated_partition, closed_partition, count_partition, data_bounds_partition};
 	"""
 
-	df = pd.read_csv(os.path.join(folder, "master_table.csv"))					# DataFrame contenente la master_table
+	return partition_entries(folder, load_master_rows(folder))
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'load_master_rows':
+def load_master_rows(folder):
+
+	"""
+	Funzione che legge le righe della master_table associata all'indice spaziale, completando le colonne assenti negli indici
+	meno recenti (o derivati) con i valori che ne riproducono il comportamento. Usata anche da 'Augmentation.py' e 'Sampling.py'.
+	--> PARAMETRI IN INGRESSO: path della cartella contenente partizioni e master_table (folder).
+	--> PARAMETRI IN USCITA: lista delle righe della master_table (dizionari).
+	"""
+
+	df = pd.read_csv(os.path.join(folder, "master_table.csv"), dtype={"SourceHash": str, "IndexParameters": str})	# DataFrame contenente la master_table
 	required_cols = {"NamePartition", "xMin", "yMin", "xMax", "yMax"}			# Colonne necessarie per la costruzione della lista in questione
 	if not required_cols.issubset(df.columns):									# Se le colonne non sono presenti, mando un messaggio di errore
 		raise ValueError("<System> Master table missing required columns")
+	if "Format" not in df.columns:												# Indici generati senza la colonna 'Format' --> partizioni in CSV/WKT
+		df["Format"] = "csv"
+	if "PackedFile" not in df.columns:											# Indici generati senza file dati unico --> un file per partizione
+		df["PackedFile"] = ""
+		df["Offset"] = 0
+		df["Length"] = 0
+	df["PackedFile"] = df["PackedFile"].fillna("")
+	if "LocalIndex" not in df.columns:											# Indici generati senza RTree locali salvati su disco
+		df["LocalIndex"] = ""
+	df["LocalIndex"] = df["LocalIndex"].fillna("")
+	if "Compression" not in df.columns:											# Indici generati senza compressione delle partizioni
+		df["Compression"] = "none"
+	df["Compression"] = df["Compression"].fillna("none")
+	if "Replicated" not in df.columns:											# Indici generati senza metadati di replica --> regola del centroide
+		df["Replicated"] = None
+	df["Replicated"] = df["Replicated"].astype(object).where(df["Replicated"].notna(), None)
+	data_columns = ["DataXMin", "DataYMin", "DataXMax", "DataYMax"]
+	if not set(data_columns).issubset(df.columns):								# Indici generati senza l'MBR effettivo delle geometrie
+		df[data_columns] = np.nan
+	if "NumberGeometries" not in df.columns:
+		df["NumberGeometries"] = np.nan
+	return df.to_dict("records")
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'partition_entries':
+def partition_entries(folder, rows):
+
+	"""
+	Funzione che costruisce le informazioni su tutte le partizioni di un indice a partire dalle righe della sua master_table.
+	--> PARAMETRI IN INGRESSO: path della cartella contenente partizioni e master_table (folder);
+							   righe della master_table, come restituite da load_master_rows (rows).
+	--> PARAMETRI IN USCITA: lista di partizioni (partition_entry), nello stesso ordine delle righe.
+	"""
+
+	if not rows:
+		return []
+	max_x = max(row["xMax"] for row in rows)									# Bordi superiori della finestra coperta dalle partizioni
+	max_y = max(row["yMax"] for row in rows)
+	return [partition_entry(folder, row, max_x, max_y) for row in rows]
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'partition_entry':
+def partition_entry(folder, row, max_x, max_y):
+
+	"""
+	Funzione che costruisce le informazioni su una partizione a partire dalla sua riga della master_table.
+	--> PARAMETRI IN INGRESSO: path della cartella contenente partizioni e master_table (folder);
+							   riga della master_table della partizione, con le colonne assenti già completate (row);
+							   bordi superiori della finestra coperta dalle partizioni (max_x, max_y).
+	--> PARAMETRI IN USCITA: partizione {path_partition, bound_partition, format_partition, packed_partition, offset_partition,
+							 length_partition, local_index_partition, compression_partition, replicated_partition, closed_partition, count_partition,
+							 data_bounds_partition}.
+	"""
+
+	packed = row["PackedFile"] != ""											# La partizione si trova nel file dati unico del dataset
+	return {
+		"path": os.path.join(folder, row["PackedFile"] if packed else row["NamePartition"]),	# Percorso del file in cui si trova la partizione
+		"bounds": (row["xMin"], row["yMin"], row["xMax"], row["yMax"]),			# Bounding Box della partizione
+		"format": row["Format"],												# Formato della partizione ('csv' o 'binary')
+		"packed": packed,														# La partizione è una porzione del file dati unico
+		"offset": int(row["Offset"]),											# Posizione (in bytes) della partizione nel file dati unico
+		"length": int(row["Length"]),											# Dimensione (in bytes) della partizione nel file dati unico
+		"local_index": os.path.join(folder, row["LocalIndex"]) if row["LocalIndex"] != "" else None,	# RTree locale salvato su disco (None se da ricostruire)
+		"compression": row["Compression"],										# Compressione del contenuto della partizione ('none', 'zlib', 'delta' o 'quantized')
+		"replicated": None if pd.isna(row["Replicated"]) else int(row["Replicated"]),	# Geometrie replicate in altre partizioni (None se non noto)
+		"closed": (row["xMax"] >= max_x, row["yMax"] >= max_y),					# Bordi superiori compresi nella partizione (solo sul bordo della finestra)
+		"count": None if pd.isna(row["NumberGeometries"]) else int(row["NumberGeometries"]),	# Geometrie salvate nella partizione (None se non noto)
+		"data_bounds": None if pd.isna(row["DataXMin"]) else (row["DataXMin"], row["DataYMin"], row["DataXMax"], row["DataYMax"])	# MBR effettivo delle geometrie (None se non noto)
+	}
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'open_master_index':
+def open_master_index(folder):
+
+	"""
+	Funzione che apre l'indice globale delle partizioni del dataset in questione. Se 'Indexing.py' ha salvato l'RTree globale
+	(non più vecchio della master_table) questo viene aperto direttamente da disco, senza leggere la master_table né inserire
+	le partizioni una alla volta: le informazioni sulle partizioni candidate vengono lette dall'RTree solo durante le queries.
+	Altrimenti (indici precedenti o derivati) la master_table viene letta e l'RTree globale costruito in memoria. In entrambi
+	i casi l'indice viene restituito nella stessa forma e interrogato solo tramite candidate_partitions.
+	--> PARAMETRI IN INGRESSO: path della cartella contenente partizioni e master_table (folder).
+	--> PARAMETRI IN USCITA: indice globale {folder_index, rtree_index, stored_index (RTree salvato su disco), partitions_index
+							 (lista delle partizioni, None se lette dall'RTree durante le queries)} (master_index).
+	"""
+
+	base_path = os.path.join(folder, MASTER_RTREE)
+	if os.path.exists(base_path + ".idx") and os.path.getmtime(base_path + ".idx") >= os.path.getmtime(os.path.join(folder, "master_table.csv")):
+		return {"folder": folder, "rtree": index.Index(base_path), "stored": True, "partitions": None}
+	partition_files = load_master_table(folder)
+	return {"folder": folder, "rtree": build_partition_index(partition_files), "stored": False, "partitions": partition_files}
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'candidate_partitions':
+def candidate_partitions(query_bounds, master_index):
+
+	"""
+	Funzione che restituisce le partizioni potenzialmente rilevanti per la query in questione.
+	--> PARAMETRI IN INGRESSO: finestra della query in questione (query_bounds);
+							   indice globale del dataset in questione, come restituito da open_master_index (master_index).
+	--> PARAMETRI IN USCITA: lista delle partizioni candidate.
+	"""
+
+	if master_index["stored"]:													# RTree globale salvato su disco: ogni partizione riporta la propria riga della master_table
+		return [partition_entry(master_index["folder"], row, row["WindowXMax"], row["WindowYMax"]) for row in master_index["rtree"].intersection(query_bounds, objects="raw")]
+	return [master_index["partitions"][pid] for pid in master_index["rtree"].intersection(query_bounds)]
 
-	partition_files = []														# Lista che conterrà le partizioni come {path_partition, bound_partition}
-	for row in df.itertuples(index=False):										# Scorro le singole partizioni presenti nella master_table e...
-		partition_files.append({												# ... per ciascuna salvo nella lista:
-			"path": os.path.join(folder, row.NamePartition),					# Percorso in cui si trova la partizione
-			"bounds": (row.xMin, row.yMin, row.xMax, row.yMax)					# Bounding Box della partizione
-		})
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'index_is_stale':
+def index_is_stale(folder, dataset_path):
+
+	"""
+	Funzione che verifica se l'indice spaziale corrisponde ancora al dataset da cui è stato costruito, confrontando
+	dimensione, data di modifica e (solo se la data è cambiata) impronta SHA-256 riportate nella master_table.
+	--> PARAMETRI IN INGRESSO: path della cartella contenente partizioni e master_table (folder);
+							   path del file del dataset (dataset_path).
+	--> PARAMETRI IN USCITA: True se l'indice non è aggiornato, False se è aggiornato o non verificabile (indici
+							 generati senza i dati del dataset di origine o dataset non indicato).
+	"""
 
-	return partition_files
+	df = pd.read_csv(os.path.join(folder, "master_table.csv"), nrows=1, dtype={"SourceHash": str})
+	if df.empty or not {"SourceSize", "SourceMtime", "SourceHash"}.issubset(df.columns) or not os.path.isfile(dataset_path):
+		return False
+	source_stat = os.stat(dataset_path)
+	if int(df["SourceSize"].iloc[0]) != source_stat.st_size:					# Dimensione diversa --> dataset modificato
+		return True
+	if int(df["SourceMtime"].iloc[0]) == source_stat.st_mtime_ns:				# Stessa dimensione e data di modifica --> dataset invariato
+		return False
+	digest = hashlib.sha256()													# Data di modifica diversa --> confronto del contenuto
+	with open(dataset_path, "rb") as f:
+		for block in iter(lambda: f.read(1024 * 1024), b""):
+			digest.update(block)
+	return digest.hexdigest() != df["SourceHash"].iloc[0]
 
 # -------------------------------------------------------------------------------------------------------------------------------
 # FUNZIONE 'build_partition_index':
@@ -149,98 +336,599 @@ def build_partition_index(partition_files):
 
 	"""
 	Funzione che costruisce un R-tree globale usato per individuare velocemente quali partizioni
-	sono potenzialmente rilevanti per una query selezionata.
-	--> PARAMETRI IN INGRESSO: lista dei file partizione del dataset con le loro Bounding Box, composta da 'path' e 'bounds' (partition_files).
+	sono potenzialmente rilevanti per una query selezionata. Se noto viene indicizzato l'MBR effettivo delle geometrie
+	(più stretto della finestra della partizione), così da scartare anche le partizioni intersecate solo nelle zone vuote.
+	--> PARAMETRI IN INGRESSO: lista dei file partizione del dataset con le loro Bounding Box, composta da 'path', 'bounds' e 'data_bounds' (partition_files).
 	--> PARAMETRI IN USCITA: R-Tree costruito (partition_index).
 	"""
 
 	partition_index = index.Index()						# RTree_globale
 	for pid, part in enumerate(partition_files):		# Ciclo su ciascuna partizione
-		partition_index.insert(pid, part["bounds"])		# Inserimento della partizione in questione nell'RTree globale (codice della partizione e relativa Bounding Box)
+		partition_index.insert(pid, part.get("data_bounds") or part["bounds"])		# Inserimento della partizione in questione nell'RTree globale (codice della partizione e relativa Bounding Box)
 	return partition_index
 
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'partition_buffer':
+def partition_buffer(partition):
+
+	"""
+	Funzione che mappa in memoria (numpy.memmap) i bytes di una partizione: l'intero file della partizione oppure,
+	con la memorizzazione 'packed', la sola porzione [offset, offset + length) del file dati unico.
+	--> PARAMETRI IN INGRESSO: file partizione, composto da 'path', 'packed', 'offset' e 'length' (partition).
+	--> PARAMETRI IN USCITA: array (uint8) con i bytes della partizione (buffer).
+	"""
+
+	if partition.get("packed", False):
+		offset, length = partition["offset"], partition["length"]
+	else:
+		offset, length = 0, os.path.getsize(partition["path"])
+	if length == 0:																	# Partizione vuota (non mappabile)
+		return np.empty(0, dtype=np.uint8)
+	return np.memmap(partition["path"], dtype=np.uint8, mode="r", offset=offset, shape=(length,))
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'read_partition':
+def read_partition(partition, geometry_type):
+
+	"""
+	Funzione che legge una partizione nel formato indicato nella master_table, sia da un file dedicato sia dal file
+	dati unico ('packed'). Le partizioni binarie vengono lette con numpy.memmap (nessun parsing, pagine condivise tra
+	processi tramite la page cache); le partizioni compresse vengono prima decodificate (decompress_partition).
+	--> PARAMETRI IN INGRESSO: file partizione, composto da 'path', 'format', 'packed', 'offset', 'length' e 'compression' (partition);
+							   tipo di geometria contenuta nella partizione (Point, Box, Polygon).
+	--> PARAMETRI IN USCITA: per POINT e BOX, array (numero geometrie x 2 o 4) con le coordinate;
+							 per POLYGON, lista dei poligoni della partizione (records).
+	"""
+
+	geometry_type = geometry_type.lower()											# Tipo di geometria scritto tutto in minuscolo
+	n_columns = {"point": 2, "box": 4, "polygon": 1}.get(geometry_type)			# Numero di colonne per geometria
+	if n_columns is None:															# Se la geometria non è riconosciuta...
+		raise ValueError(f"<System> Unknown geometry type '{geometry_type}'.")		# ... viene lanciato un messaggio di errore!
+	empty = [] if geometry_type == "polygon" else np.empty((0, n_columns))		# Contenuto di una partizione vuota
+	compression = partition.get("compression", "none")
+
+	if partition.get("format", "csv") != "binary":									# Partizione testuale (CSV o WKT, senza intestazione)
+		with phase("io"):															# Lettura dei bytes della partizione
+			if compression != "none" or partition.get("packed", False):			# Partizione compressa o porzione del file dati unico
+				raw = np.array(partition_buffer(partition))
+			else:
+				with open(partition["path"], "rb") as file:
+					raw = file.read()
+		with phase("parse"):
+			if compression != "none":												# Partizione compressa
+				raw = decompress_partition(raw, compression, n_columns)
+			try:
+				df = pd.read_csv(io.BytesIO(raw if isinstance(raw, bytes) else raw.tobytes()), header=None)
+			except pd.errors.EmptyDataError:
+				return empty
+			if geometry_type == "polygon":
+				return [loads(text) for text in df[0]]								# Parsing da WKT a poligono delle geometrie
+			return df.to_numpy(dtype=float)
+
+	with phase("io"):																# Partizione binaria
+		raw = partition_buffer(partition)
+		if len(raw) > 0:															# Lettura effettiva delle pagine mappate (un byte per pagina), altrimenti l'I/O ricadrebbe nelle fasi successive
+			int(raw[::PAGE_BYTES].max())
+	with phase("parse"):
+		if compression != "none" and len(raw) > 0:									# Partizione compressa
+			raw = decompress_partition(raw, compression, n_columns)
+		if len(raw) == 0:
+			return empty
+		if geometry_type == "polygon":												# POLYGON: numero geometrie, offsets e WKB
+			n = int(raw[:8].view("<i8")[0])
+			offsets = raw[8:8 * (n + 2)].view("<i8")
+			blob = raw[8 * (n + 2):]
+			return [wkb.loads(blob[offsets[i]:offsets[i + 1]].tobytes()) for i in range(n)]
+		return raw.view("<f8").reshape(n_columns, -1).T							# POINT/BOX: colonne float64 consecutive
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'decompress_partition':
+def decompress_partition(buffer, compression, n_columns):
+
+	"""
+	Funzione che decodifica i bytes di una partizione compressa da 'Indexing.py': 'zlib' (bytes della partizione compressi),
+	'delta' (differenze tra i bit int64 delle coordinate di ogni colonna, bytes riordinati per posizione e compressi) e
+	'quantized' (origine e passo di quantizzazione seguiti dalle coordinate uint32, compresse come 'delta').
+	--> PARAMETRI IN INGRESSO: bytes della partizione compressa (buffer);
+							   compressione applicata alla partizione (compression);
+							   numero di colonne per geometria, 2 per POINT e 4 per BOX (n_columns).
+	--> PARAMETRI IN USCITA: array (uint8) con i bytes decodificati della partizione.
+	"""
+
+	stored = buffer.tobytes() if isinstance(buffer, np.ndarray) else buffer
+	if compression == "zlib":
+		return np.frombuffer(zlib.decompress(stored), dtype=np.uint8)
+	header = 32 if compression == "quantized" else 0
+	itemsize = 4 if compression == "quantized" else 8
+	shuffled = np.frombuffer(zlib.decompress(stored[header:]), dtype=np.uint8)
+	payload = shuffled.reshape(itemsize, -1).T.copy().view("<u4" if compression == "quantized" else "<i8").reshape(n_columns, -1)
+	if compression == "delta":														# Somma cumulativa delle differenze (bit delle coordinate originali)
+		return np.cumsum(payload, axis=1, dtype="<i8").view(np.uint8).ravel()
+	origin_x, origin_y, step_x, step_y = np.frombuffer(stored[:header], dtype="<f8")
+	axes = [0, 1, 0, 1][:n_columns]													# Asse (x o y) di ciascuna colonna
+	origin, step = np.array([origin_x, origin_y])[axes], np.array([step_x, step_y])[axes]
+	return np.ascontiguousarray(origin[:, None] + payload * step[:, None], dtype="<f8").view(np.uint8).ravel()
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'build_geometry':
+def build_geometry(record, geometry_type):
+
+	"""
+	Funzione che genera la geometria corrispondente a una riga letta dalla partizione.
+	--> PARAMETRI IN INGRESSO: riga della partizione (record);
+							   tipo di geometria contenuta nella partizione (Point, Box, Polygon).
+	--> PARAMETRI IN USCITA: geometria (box 'degenerata' per i punti, box per i rettangoli, poligono).
+	"""
+
+	geometry_type = geometry_type.lower()
+	if geometry_type == "point":
+		x, y = record
+		return box(x, y, x, y)
+	if geometry_type == "box":
+		return box(*record)
+	return record																	# POLYGON: già generato in lettura
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'owns_geometry':
+def owns_geometry(partition_box, geom, geometry_type):
+
+	"""
+	Funzione che stabilisce se una geometria appartiene alla partizione (le geometrie a cavallo di più partizioni
+	vengono contate una sola volta): un punto appartiene alle partizioni che lo coprono (bordi compresi), una box o
+	un poligono alla partizione che lo contiene interamente o che copre il suo centroide.
+	--> PARAMETRI IN INGRESSO: box che rappresenta i bordi della partizione (partition_box);
+							   geometria da analizzare (geom);
+							   tipo di geometria contenuta nella partizione (Point, Box, Polygon).
+	--> PARAMETRI IN USCITA: True se la geometria appartiene alla partizione, altrimenti False.
+	"""
+
+	if geometry_type.lower() == "point":
+		return partition_box.covers(geom)
+	return partition_box.contains(geom) or partition_box.covers(geom.centroid)
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'owns_reference_point':
+def owns_reference_point(partition, geom_bounds, query_bounds):
+
+	"""
+	Funzione che applica la tecnica del punto di riferimento: una coppia (geometria, query) viene contata solo dalla partizione
+	che contiene l'angolo in basso a sinistra dell'intersezione tra l'MBR della geometria e la finestra di query. Le partizioni
+	sono considerate semiaperte [min, max), tranne che sui bordi superiori della finestra coperta dall'indice, in modo che il
+	punto cada in una sola partizione. Richiede che la geometria sia salvata in tutte le partizioni intersecate dal suo MBR.
+	--> PARAMETRI IN INGRESSO: partizione, composta da 'bounds' e 'closed' (partition);
+							   MBR della geometria (geom_bounds);
+							   finestra della query (query_bounds).
+	--> PARAMETRI IN USCITA: True se la coppia va contata in questa partizione, altrimenti False.
+	"""
+
+	x = max(geom_bounds[0], query_bounds[0])										# Punto di riferimento: angolo in basso a sinistra dell'intersezione
+	y = max(geom_bounds[1], query_bounds[1])
+	min_x, min_y, max_x, max_y = partition["bounds"]
+	closed_x, closed_y = partition["closed"]
+	inside_x = min_x <= x and (x < max_x or (closed_x and x <= max_x))
+	inside_y = min_y <= y and (y < max_y or (closed_y and y <= max_y))
+	return inside_x and inside_y
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'owns_reference_points':
+def owns_reference_points(partition, bounds, query_bounds):
+
+	"""
+	Versione vettoriale di 'owns_reference_point': applica la tecnica del punto di riferimento a tutte le geometrie di una
+	partizione in una sola volta.
+	--> PARAMETRI IN INGRESSO: partizione, composta da 'bounds' e 'closed' (partition);
+							   array (numero geometrie x 4) con gli MBR delle geometrie (bounds);
+							   finestra della query (query_bounds).
+	--> PARAMETRI IN USCITA: array di booleani, True per le coppie da contare in questa partizione.
+	"""
+
+	x = np.maximum(bounds[:, 0], query_bounds[0])									# Punto di riferimento: angolo in basso a sinistra dell'intersezione
+	y = np.maximum(bounds[:, 1], query_bounds[1])
+	min_x, min_y, max_x, max_y = partition["bounds"]
+	closed_x, closed_y = partition["closed"]
+	inside_x = (min_x <= x) & ((x < max_x) | (closed_x & (x <= max_x)))
+	inside_y = (min_y <= y) & ((y < max_y) | (closed_y & (y <= max_y)))
+	return inside_x & inside_y
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'owned_coordinates':
+def owned_coordinates(partition, bounds):
+
+	"""
+	Funzione che individua, indipendentemente dalla query, le geometrie (punti o box) di cui la partizione è proprietaria,
+	con le stesse regole usate per contarle: nessuna replica --> tutte; geometrie replicate --> punto di riferimento
+	dell'intero MBR (angolo in basso a sinistra); metadati assenti --> regola del centroide (bordi compresi). Ogni geometria
+	replicata ha così una sola partizione proprietaria; usata anche da 'Augmentation.py' e 'Sampling.py'.
+	--> PARAMETRI IN INGRESSO: partizione, composta da 'bounds', 'closed' e 'replicated' (partition);
+							   array (numero geometrie x 4) con gli MBR delle geometrie (bounds).
+	--> PARAMETRI IN USCITA: array di booleani, True per le geometrie di cui la partizione è proprietaria.
+	"""
+
+	replicated = partition.get("replicated")
+	if replicated == 0:
+		return np.ones(len(bounds), dtype=bool)
+	if replicated is None:															# Regola del centroide (bordi compresi)
+		min_x, min_y, max_x, max_y = partition["bounds"]
+		cx = (bounds[:, 0] + bounds[:, 2]) / 2
+		cy = (bounds[:, 1] + bounds[:, 3]) / 2
+		return (cx >= min_x) & (cx <= max_x) & (cy >= min_y) & (cy <= max_y)
+	return owns_reference_points(partition, bounds, (-np.inf, -np.inf, np.inf, np.inf))	# Finestra illimitata: punto di riferimento = angolo dell'MBR
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'counts_match':
+def counts_match(partition, partition_box, geom, geometry_type, query_box):
+
+	"""
+	Funzione che stabilisce se una geometria che interseca la query va contata nella partizione in questione, in base ai
+	metadati di replica della master_table: nessuna replica --> sempre; geometrie replicate --> punto di riferimento;
+	metadati assenti (indici precedenti o derivati) --> regola del centroide (owns_geometry).
+	--> PARAMETRI IN INGRESSO: partizione, composta da 'bounds', 'closed' e 'replicated' (partition);
+							   box che rappresenta i bordi della partizione (partition_box);
+							   geometria da analizzare (geom);
+							   tipo di geometria contenuta nella partizione (Point, Box, Polygon);
+							   Bounding Box della query in questione (query_box).
+	--> PARAMETRI IN USCITA: True se la geometria va contata, altrimenti False.
+	"""
+
+	replicated = partition.get("replicated")
+	if replicated is None:
+		return owns_geometry(partition_box, geom, geometry_type)
+	if replicated == 0:
+		return True
+	return owns_reference_point(partition, geom.bounds, query_box.bounds)
+
 # -------------------------------------------------------------------------------------------------------------------------------
 # FUNZIONE 'load_partition':
 def load_partition(partition, geometry_type):
 
 	"""
 	Funzione che carica le partizioni di un dataset e genera un RTree locale per ciascuna partizione
-	(per velocizzare le query sulle geometrie all'interno della partizione).
-	--> PARAMETRI IN INGRESSO: file partizione con sua Bounding Box, composta da 'path' e 'bounds' (partition);
+	(per velocizzare le query sulle geometrie all'interno della partizione). La regola del centroide viene applicata
+	in caricamento solo se la master_table non riporta i metadati di replica.
+	--> PARAMETRI IN INGRESSO: file partizione con sua Bounding Box, composta da 'path', 'bounds', 'format', 'packed', 'offset' e 'length' (partition);
 							   tipo di geometria contenuta nella partizione (Point, Box, Polygon).
 	--> PARAMETRI IN USCITA: lista contenente le geometrie della partizione in questione (geometries);
 							 RTree locale delle geometrie della partizione contenente le rispettive BoundingBox (idx);
 							 numero totale di geometrie appartenenti alla partizione in questione (count_geom).
 	"""
 
-	df = pd.read_csv(partition["path"])												# Caricamento effettivo della singola partizione in questione
+	records = read_partition(partition, geometry_type)								# Caricamento effettivo della singola partizione in questione
 	partition_box = box(*partition["bounds"])										# Box che rappresenta i bordi della partizione in questione
+	legacy = partition.get("replicated") is None									# Metadati di replica assenti --> regola del centroide
 	geometries = []																	# Lista che conterrà le singole geometrie della partizione in questione
 	count_geom = 0																	# Variabile che conta il numero di geometrie totali della partizione in questione
-	geometry_type = geometry_type.lower()											# Tipo di geometria scritto tutto in minuscolo
-	if geometry_type == "point":													# Le geometrie della partizione in questione sono POINT:
-		for (x, y) in df.itertuples(index=False, name=None):						# Scorro le singole geometrie della partizione in questione
-			count_geom += 1															# Incremento del contatore delle geometrie della partizione
-			geom = box(x, y, x, y)													# Genero una box 'degenerata' per rappresentare il punto
-			if partition_box.covers(geom):											# Se la geometria è interamente all'interno della partizione (bordi compresi)...
-				geometries.append(geom)												# ... la inserisco nelle geometrie della partizione in questione
-	elif geometry_type == "box":													# Le geometrie della partizione in questione sono BOX:
-		for (x1, y1, x2, y2) in df.itertuples(index=False, name=None):				# Scorro le singole geometrie della partizione in questione
-			count_geom += 1															# Incremento del contatore delle geometrie della partizione
-			geom = box(x1, y1, x2, y2)												# Genero la box correlata alla geometria in questione
-			if partition_box.contains(geom) or partition_box.covers(geom.centroid):	# Se la geometria è interamente all'interno della partizione o lo è il suo centroide...
-				geometries.append(geom)												# ... la inserisco nelle geometrie della partizione in questione
-	elif geometry_type == "polygon":												# Le geometrie della partizione in questione sono POLYGON:
-		for (wkt,) in df.itertuples(index=False, name=None):						# Scorro le singole geometrie della partizione in questione
+	with phase("parse"):
+		for record in records:														# Scorro le singole geometrie della partizione in questione
 			count_geom += 1															# Incremento del contatore delle geometrie della partizione
-			geom = loads(wkt)														# Parsing da WKT a poligono della geometria in questione
-			if partition_box.contains(geom) or partition_box.covers(geom.centroid):	# Se la geometria è interamente all'interno della partizione o lo è il suo centroide...
+			geom = build_geometry(record, geometry_type)							# Genero la geometria (box 'degenerata' per i punti)
+			if not legacy or owns_geometry(partition_box, geom, geometry_type):		# Se la geometria appartiene alla partizione in questione...
 				geometries.append(geom)												# ... la inserisco nelle geometrie della partizione in questione
-	else:																			# Se la geometria non è riconosciuta...
-		raise ValueError(f"<System> Unknown geometry type '{geometry_type}'.")		# ... viene lanciato un messaggio di errore!
 
 	# Costruzione di un RTree locale (permette di fare "intersection queries" più veloci sulla partizione senza scansionare tutte le geometrie)
-	idx = index.Index()
-	for i, geom in enumerate(geometries):											# Ciclo su tutte le geometrie appartenenti alla partizione in qiestione
-		idx.insert(i, geom.bounds)													# Inserimento nell'RTree della Bounding Box della geometria selezionata
+	with phase("index"):
+		idx = index.Index()
+		for i, geom in enumerate(geometries):										# Ciclo su tutte le geometrie appartenenti alla partizione in qiestione
+			idx.insert(i, geom.bounds)												# Inserimento nell'RTree della Bounding Box della geometria selezionata
 
 	return geometries, idx, count_geom
 
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'load_coordinates':
+def load_coordinates(partition, geometry_type):
+
+	"""
+	Funzione che carica una partizione di punti o di box come array di MBR, senza generare geometrie shapely né RTree
+	locale: per geometrie allineate agli assi il test di intersezione con la finestra di query si riduce a quattro
+	confronti tra array. La regola del centroide viene applicata in caricamento, come in load_partition, solo se la
+	master_table non riporta i metadati di replica (il centroide di un punto è il punto stesso, quello di una box il suo centro).
+	--> PARAMETRI IN INGRESSO: file partizione, composto da 'path', 'bounds', 'format', 'packed', 'offset' e 'length' (partition);
+							   tipo di geometria contenuta nella partizione (Point, Box).
+	--> PARAMETRI IN USCITA: array (numero geometrie x 4) con gli MBR delle geometrie appartenenti alla partizione (bounds);
+							 numero totale di geometrie appartenenti alla partizione in questione (count_geom).
+	"""
+
+	records = read_partition(partition, geometry_type)
+	with phase("parse"):
+		if geometry_type.lower() == "point":										# Box 'degenerate' per i punti
+			bounds = np.column_stack([records[:, 0], records[:, 1], records[:, 0], records[:, 1]])
+		else:
+			bounds = np.array(records, dtype=float)								# Copia in memoria (le partizioni binarie sono mappate da disco)
+		if partition.get("replicated") is None:									# Metadati di replica assenti --> regola del centroide (bordi compresi)
+			bounds = bounds[owned_coordinates(partition, bounds)]
+	return bounds, len(records)
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'coordinates_matches':
+def coordinates_matches(partition, bounds, query_bounds):
+
+	"""
+	Funzione che individua le geometrie (punti o box) di una partizione che soddisfano la query in questione: intersezione
+	tra MBR (bordi compresi, come 'intersects' di shapely) ed eventuale punto di riferimento per le geometrie replicate.
+	--> PARAMETRI IN INGRESSO: partizione, composta da 'bounds', 'closed' e 'replicated' (partition);
+							   array (numero geometrie x 4) con gli MBR delle geometrie appartenenti alla partizione (bounds);
+							   finestra della query (query_bounds).
+	--> PARAMETRI IN USCITA: array di booleani, True per le geometrie che soddisfano la query.
+	"""
+
+	q_min_x, q_min_y, q_max_x, q_max_y = query_bounds
+	with phase("filter"):
+		hit = (bounds[:, 0] <= q_max_x) & (bounds[:, 2] >= q_min_x) & (bounds[:, 1] <= q_max_y) & (bounds[:, 3] >= q_min_y)
+	if (partition.get("replicated") or 0) > 0:										# Geometrie replicate --> punto di riferimento
+		with phase("refine"):
+			hit &= owns_reference_points(partition, bounds, query_bounds)
+	return hit
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'query_partition':
+def query_partition(partition, geometry_type, query_box):
+
+	"""
+	Funzione che applica la query in questione alla singola partizione. Se la finestra di query contiene l'MBR effettivo di una
+	partizione senza geometrie replicate, il risultato viene ricavato dalla master_table senza aprire la partizione. Punti e box
+	vengono confrontati con la finestra di query direttamente sugli array delle coordinate (load_coordinates). Per i poligoni,
+	se l'RTree locale della partizione è stato salvato in fase di indicizzazione viene aperto da disco (la regola di appartenenza
+	viene verificata solo sulle geometrie candidate), altrimenti viene ricostruito caricando la partizione (load_partition).
+	--> PARAMETRI IN INGRESSO: file partizione con sua Bounding Box e il suo eventuale RTree locale (partition);
+							   tipo di geometria contenuta nella partizione (Point, Box, Polygon);
+							   Bounding Box della query in questione (query_box).
+	--> PARAMETRI IN USCITA: numero di geometrie della partizione che soddisfano la query in questione (matches);
+							 numero totale di geometrie appartenenti alla partizione in questione (count_geom).
+	"""
+
+	data_bounds = partition.get("data_bounds")
+	if data_bounds is not None and partition.get("replicated") == 0 and partition.get("count") is not None:
+		q_min_x, q_min_y, q_max_x, q_max_y = query_box.bounds
+		if q_min_x <= data_bounds[0] and q_min_y <= data_bounds[1] and q_max_x >= data_bounds[2] and q_max_y >= data_bounds[3]:
+			return partition["count"], 0											# Tutte le geometrie della partizione soddisfano la query (nessun test)
+
+	if geometry_type.lower() in ("point", "box"):									# Punti e box: confronti vettoriali sugli MBR (nessuna geometria shapely né RTree locale)
+		with cached_partition(partition, geometry_type, load_coordinates) as (bounds, count_geom):
+			return int(coordinates_matches(partition, bounds, query_box.bounds).sum()), count_geom
+
+	matches = 0																		# Numero di geometrie della partizione che soddisfano la query in questione
+	if partition.get("local_index") is None:										# RTree locale da ricostruire (o già ricostruito da una query precedente)
+		with cached_partition(partition, geometry_type, load_partition) as (geometries, local_index, count_geom):
+			reference = (partition.get("replicated") or 0) > 0						# Geometrie replicate --> punto di riferimento (la regola del centroide è già stata applicata in caricamento)
+			with phase("filter"):
+				candidates = list(local_index.intersection(query_box.bounds))		# Sole geometrie con MBR compatibili alla finestra di query in questione
+			with phase("refine"):
+				for cid in candidates:
+					if geometries[cid].intersects(query_box):						# Vedo se effettivamente la geometria interseca la finestra di query in questione
+						if not reference or owns_reference_point(partition, geometries[cid].bounds, query_box.bounds):
+							matches += 1
+		return matches, count_geom
+
+	partition_box = box(*partition["bounds"])
+	with cached_partition(partition, geometry_type, open_partition) as (records, local_index):	# Partizione e RTree locale salvato su disco (gli identificativi dell'RTree sono le righe)
+		with phase("filter"):
+			candidates = list(local_index.intersection(query_box.bounds))			# Sole geometrie con MBR compatibili alla finestra di query in questione
+		with phase("refine"):
+			for cid in candidates:
+				geom = build_geometry(records[cid], geometry_type)
+				if geom.intersects(query_box) and counts_match(partition, partition_box, geom, geometry_type, query_box):
+					matches += 1
+	return matches, len(records)
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'open_partition':
+def open_partition(partition, geometry_type):
+
+	"""
+	Funzione che carica una partizione il cui RTree locale è stato salvato in fase di indicizzazione e apre l'RTree da disco.
+	--> PARAMETRI IN INGRESSO: file partizione con il suo RTree locale (partition);
+							   tipo di geometria contenuta nella partizione (Point, Box, Polygon).
+	--> PARAMETRI IN USCITA: righe della partizione (records);
+							 RTree locale aperto da disco (local_index).
+	"""
+
+	records = read_partition(partition, geometry_type)
+	with phase("index"):															# Apertura dell'RTree locale salvato su disco
+		local_index = index.Index(partition["local_index"])
+	return records, local_index
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'cached_partition':
+@contextmanager
+def cached_partition(partition, geometry_type, loader):
+
+	"""
+	Funzione (context manager) che restituisce una partizione caricata (geometrie e RTree locale) riusandola tra una query e
+	l'altra: le queries consecutive sullo stesso dataset interessano in gran parte le stesse partizioni. La cache è condivisa
+	dai thread delle queries e limitata a PARTITION_CACHE_MB (memoria stimata): oltre il limite vengono scartate le partizioni
+	usate meno di recente (LRU). Il caricamento avviene fuori dal lock, così che i thread carichino partizioni diverse in
+	parallelo. Ogni partizione conta i thread che la stanno usando: gli RTree locali di una partizione scartata (o non
+	mantenuta, perché più grande della cache o già caricata da un altro thread) vengono chiusi dall'ultimo thread che la
+	usa (close_partition). Con PARTITION_CACHE pari a False la partizione viene sempre ricaricata e chiusa dopo l'uso.
+	--> PARAMETRI IN INGRESSO: file partizione (partition);
+							   tipo di geometria contenuta nella partizione (Point, Box, Polygon);
+							   funzione di caricamento della partizione, load_coordinates, load_partition o open_partition (loader).
+	--> PARAMETRI IN USCITA: partizione caricata, come restituita da 'loader' (valida fino all'uscita dal blocco 'with').
+	"""
+
+	if not PARTITION_CACHE:
+		loaded = loader(partition, geometry_type)
+		try:
+			yield loaded
+		finally:
+			close_partition(loaded)
+		return
+	key = (loader.__name__, partition["path"], partition.get("offset", 0), tuple(partition["bounds"]))
+	with PARTITION_CACHE_LOCK:
+		entry = PARTITION_CACHE_ENTRIES.get(key)
+		if entry is not None:														# Partizione già caricata --> diventa la più recente
+			PARTITION_CACHE_ENTRIES.move_to_end(key)
+			PARTITION_CACHE_STATS["hits"] += 1
+			entry["users"] += 1
+		else:
+			PARTITION_CACHE_STATS["misses"] += 1
+
+	if entry is None:
+		loaded = loader(partition, geometry_type)
+		entry = {"loaded": loaded, "size": partition_memory(loaded[0]), "users": 1, "evicted": False}
+		budget = PARTITION_CACHE_MB * 1024 * 1024
+		closing = []																# Partizioni scartate non più in uso (chiuse fuori dal lock)
+		with PARTITION_CACHE_LOCK:
+			if entry["size"] <= budget and key not in PARTITION_CACHE_ENTRIES:		# Le partizioni più grandi dell'intera cache non vengono mantenute
+				PARTITION_CACHE_ENTRIES[key] = entry
+				PARTITION_CACHE_STATS["bytes"] += entry["size"]
+				while PARTITION_CACHE_STATS["bytes"] > budget:						# Eliminazione delle partizioni usate meno di recente
+					_, evicted = PARTITION_CACHE_ENTRIES.popitem(last=False)
+					PARTITION_CACHE_STATS["bytes"] -= evicted["size"]
+					PARTITION_CACHE_STATS["evictions"] += 1
+					evicted["evicted"] = True
+					if evicted["users"] == 0:
+						closing.append(evicted["loaded"])
+			else:																	# Partizione non mantenuta --> chiusa dopo l'uso
+				entry["evicted"] = True
+		for loaded in closing:
+			close_partition(loaded)
+
+	try:
+		yield entry["loaded"]
+	finally:
+		with PARTITION_CACHE_LOCK:
+			entry["users"] -= 1
+			last_user = entry["evicted"] and entry["users"] == 0
+		if last_user:																# Partizione scartata mentre era in uso --> chiusa dall'ultimo thread
+			close_partition(entry["loaded"])
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'close_partition':
+def close_partition(loaded):
+
+	"""
+	Funzione che chiude gli RTree locali di una partizione caricata non più in uso, liberando i file aperti da disco
+	(open_partition) e la memoria degli RTree ricostruiti (load_partition).
+	--> PARAMETRI IN INGRESSO: partizione caricata, come restituita da load_coordinates, load_partition o open_partition (loaded).
+	"""
+
+	for item in loaded:
+		if isinstance(item, index.Index):
+			item.close()
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'partition_memory':
+def partition_memory(items):
+
+	"""
+	Funzione che stima la memoria occupata da una partizione caricata: coordinate (array numpy) oppure geometrie shapely,
+	stimate con GEOMETRY_BYTES per geometria (oggetto e voce dell'RTree locale) più 16 bytes per coordinata.
+	--> PARAMETRI IN INGRESSO: coordinate o geometrie della partizione (items).
+	--> PARAMETRI IN USCITA: memoria stimata in bytes.
+	"""
+
+	if isinstance(items, np.ndarray):
+		return items.nbytes
+	if len(items) == 0:
+		return 0
+	return len(items) * GEOMETRY_BYTES + 16 * int(shapely.get_num_coordinates(items).sum())
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'partition_cache_stats':
+def partition_cache_stats(reset=False):
+
+	"""
+	Funzione che restituisce i contatori della cache delle partizioni (hits, misses, evictions e memoria stimata occupata),
+	azzerando se richiesto hits, misses ed evictions (ad esempio all'inizio di ogni dataset).
+	--> PARAMETRI IN INGRESSO: True per azzerare i contatori dopo la lettura (reset).
+	--> PARAMETRI IN USCITA: copia dei contatori.
+	"""
+
+	with PARTITION_CACHE_LOCK:
+		stats = dict(PARTITION_CACHE_STATS)
+		if reset:
+			PARTITION_CACHE_STATS.update(hits=0, misses=0, evictions=0)
+	return stats
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'phase':
+@contextmanager
+def phase(name):
+
+	"""
+	Funzione (context manager) che aggiunge la durata del blocco alla fase indicata, se nel thread in questione è attiva la
+	misura dei tempi per fase (start_phases); altrimenti il blocco viene eseguito senza alcuna misura.
+	--> PARAMETRI IN INGRESSO: nome della fase ('io', 'parse', 'index', 'filter', 'refine' o 'queue').
+	"""
+
+	times = getattr(PHASE_TIMES, "times", None)
+	start = time.perf_counter()
+	try:
+		yield
+	finally:
+		if times is not None:
+			times[name] += (time.perf_counter() - start) * 1000
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'start_phases':
+def start_phases():
+
+	"""
+	Funzione che attiva nel thread in questione la misura dei tempi per fase: tutti i tempi partono da zero e il tempo CPU
+	viene misurato con il cronometro del thread (time.thread_time).
+	"""
+
+	PHASE_TIMES.times = dict.fromkeys(PHASES, 0.0)
+	PHASE_TIMES.cpu_start = time.thread_time()
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'current_phases':
+def current_phases():
+
+	"""
+	Funzione che restituisce i tempi per fase accumulati finora nel thread in questione.
+	--> PARAMETRI IN USCITA: copia dei tempi per fase (ms), con il tempo CPU del thread dall'attivazione della misura.
+	"""
+
+	times = dict(PHASE_TIMES.times)
+	times["cpu"] = (time.thread_time() - PHASE_TIMES.cpu_start) * 1000
+	return times
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'stop_phases':
+def stop_phases():
+
+	"""
+	Funzione che termina nel thread in questione la misura dei tempi per fase.
+	--> PARAMETRI IN USCITA: tempi per fase (ms) accumulati dall'attivazione della misura.
+	"""
+
+	times = current_phases()
+	PHASE_TIMES.times = None
+	return times
+
 # -------------------------------------------------------------------------------------------------------------------------------
 # FUNZIONE 'application_query':
-def application_query(range_bounds, partitions, partition_index, geometry_type, total_geometries):
+def application_query(range_bounds, master_index, geometry_type, total_geometries):
 
 	"""
 	Funzione che effettua la query in questione sul dataset in questione, sfruttandone le partizioni del dataset.
 	--> PARAMETRI IN INGRESSO: dimensioni della finestra di query in questione (range_bounds);
-							   partizioni appartenenti al dataset in questione (partitions);
-							   RTree globale relativo alle partizioni del dataset in questione (partition_index);
+							   indice globale delle partizioni del dataset in questione, come restituito da open_master_index (master_index);
 							   numero totale di geometrie appartenenti al dataset in questione (tot_geom).
 	--> PARAMETRI IN USCITA: numero di geometrie presenti nella finestra di query rapportate al numero totale di geometrie nel dataset (cardinality);
 							 test svolti sulle geometrie del dataset per analizzare la query in questione (mbr_tests);
 							 tempo medio di lavorazione di ciascun thread (avarage_execution_time);
 							 numero di thread eseguiti per l'analisi della query in questione (number_parallel_threads);
-							 tempo di esecuzione totale della query in questione (total_execution_time).
+							 tempo di esecuzione totale della query in questione (total_execution_time);
+							 tempi per fase della query in questione, sommati su tutti i thread (phases).
 	"""
 
 	query_box = box(*range_bounds)														# Creo la box corrispondente alla finestra di query in questione
 	start_time = time.perf_counter()													# Avvio del cronometro
+	start_phases()																		# Tempi per fase del thread principale (filtro globale, query sequenziale)
 	mbr_tests = 0																		# Variabile contatore che servirà a tenere conto degli MBR tests (partizioni + geometrie)
 	matches = 0																			# Numero di geometrie che soddisfano la query in questione
-	candidate_partition_ids = list(partition_index.intersection(query_box.bounds))		# Filtro le sole partizioni che intersecano la finestra di query in questione
+	with phase("filter"):
+		candidates = candidate_partitions(query_box.bounds, master_index)	# Filtro le sole partizioni che intersecano la finestra di query in questione
 	
 	# Se ci sono meno di 4 partizioni da analizzare si procede con l'algoritmo sequenziale:
-	if len(candidate_partition_ids) < 4:
-		print(f"<System>           Number of partitions to analyze: {len(candidate_partition_ids)}. Algorithm used: SEQUENTIAL!")
-		for pid in candidate_partition_ids:
-			part = partitions[pid]															# Raccolgo i dati della partizione in questione (Bounding Box, Geometrie della partizione, RTree interno alla partizione)
-			geometries, local_index, geom_partition = load_partition(part, geometry_type)	# Caricamento delle geometrie correlate alla partizione in questione (e RTree)
+	if len(candidates) < 4:
+		print(f"<System>           Number of partitions to analyze: {len(candidates)}. Algorithm used: SEQUENTIAL!")
+		for part in candidates:																# Dati della partizione in questione (Bounding Box, file della partizione, RTree locale)
+			m, geom_partition = query_partition(part, geometry_type, query_box)				# Applicazione della query alla partizione in questione
+			matches += m																	# Aggiorno "matches"
 			mbr_tests += geom_partition														# Aggiorno il contatore degli MBR tests aggiungendo il numero totale di geometrie interne alla partizione in questione
-
-			local_candidates = list(local_index.intersection(query_box.bounds))				# Isolo le sole geometrie che hanno MBR compatibili alla finestra di query in questione
-			for cid in local_candidates:													# Ciclo sulle sole geometrie che appartengono alla finestra di query in questione
-				if geometries[cid].intersects(query_box):									# Vedo se effettivamente la geometria interseca la finestra di query in questione
-					matches += 1															# Se si, incremento la variabile contatrice
 	
 		cardinality = matches / total_geometries if total_geometries > 0 else 0				# Calcolo la cardinalità effettiva
 		number_parallel_threads = 1															# Numero di threads paralleli eseguiti (1 nel caso sequenziale)
@@ -251,11 +939,12 @@ def application_query(range_bounds, partitions, partition_index, geometry_type,
 
 	# Altrimenti, se ci sono almeno 4 partizioni da analizzare, si procede con l'algoritmo parallelo:
 	else:
-		print(f"<System>           Number of partitions to analyze: {len(candidate_partition_ids)}. Algorithm used: PARALLEL!")
+		print(f"<System>           Number of partitions to analyze: {len(candidates)}. Algorithm used: PARALLEL!")
 		thread_times = []																	# Tempi di esecuzione dei singoli thread
+		thread_phases = []																	# Tempi per fase dei singoli thread
 		max_workers = (																		# Definizione del numero di Worker da far lavorare
-			min(cpu_count(), len(candidate_partition_ids))
-			if len(candidate_partition_ids) != 0 else 1
+			min(cpu_count(), len(candidates))
+			if len(candidates) != 0 else 1
 		)
 
 		# Applicazione della query in questione su ciascuna partizione interessata
@@ -263,21 +952,23 @@ def application_query(range_bounds, partitions, partition_index, geometry_type,
 			futures = [
 				executor.submit(
 					process_partition,														# Nome della funzione da eseguire in parallelo
-					partitions[pid],														# Bounding Box, Geometrie e RTree interno della partizione in questione
+					part,																	# Bounding Box, Geometrie e RTree interno della partizione in questione
 					geometry_type,															# Tipo di geometria della partizione in questione
-					query_box																# Bounding Box della query in questione
+					query_box,																# Bounding Box della query in questione
+					time.perf_counter()														# Istante di invio (attesa in coda del thread)
 				)
-				for pid in candidate_partition_ids
+				for part in candidates
 			]
 
 			for future in as_completed(futures):											# Per ogni risultato ritornato...
-				m, mbr, t = future.result()													# ... carico il ritorno effettivo delle funzioni
+				m, mbr, t, p = future.result()												# ... carico il ritorno effettivo delle funzioni
 				matches += m																# Aggiorno "matches"
 				mbr_tests += mbr															# Aggiorno "mbr_tests"
 				thread_times.append(t)														# Aggiorno la lista di tempi di esecuzione dei vari thread
+				thread_phases.append(p)														# Aggiorno la lista di tempi per fase dei vari thread
 	
 		number_parallel_threads = len(thread_times)											# Numero di threads paralleli eseguiti (che dovrebbero essere pari al numero di partizioni analizzate)
-		total_time_threads = sum(thread_times)												# Tempo totale di esecuzione della range query in questione
+		total_time_threads = int(sum(thread_times))											# Tempo totale di esecuzione della range query in questione
 		average_execution_time = int(														# Calcolo del tempo medio dei singoli thread
 			sum(thread_times) / number_parallel_threads
 			if number_parallel_threads > 0 else 0
@@ -286,33 +977,348 @@ def application_query(range_bounds, partitions, partition_index, geometry_type,
 		total_execution_time = int((time.perf_counter() - start_time) * 1000)				# Calcolo il tempo impiegato in ms
 		print(f"<System>           Time taken: {total_execution_time} ms")
 
-	return cardinality, mbr_tests, average_execution_time, number_parallel_threads, total_time_threads
+	phases = stop_phases()																	# Tempi per fase: thread principale più i thread delle partizioni
+	if len(candidates) >= 4:
+		for p in thread_phases:
+			for name in PHASES:
+				phases[name] += p[name]
+	return cardinality, mbr_tests, average_execution_time, number_parallel_threads, total_time_threads, phases
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'application_queries_batch':
+def application_queries_batch(query_bounds, master_index, geometry_type, total_geometries):
+
+	"""
+	Funzione che esegue in blocco tutte le queries di un dataset (join queries-partizioni): le finestre di query vengono prima
+	associate alle partizioni candidate tramite l'RTree globale, poi ogni partizione viene caricata una sola volta e valutata
+	su tutte le sue queries con test sugli MBR vettoriali (join_partition, in parallelo sulle partizioni). I risultati vengono
+	aggregati per query; 'mbrTests' riporta, come nell'esecuzione singola, le geometrie delle partizioni analizzate e i tempi
+	di ciascuna query sono la somma dei tempi di valutazione sulle sue partizioni più la quota (divisa tra le queries che la
+	usano) del tempo di caricamento di ciascuna partizione; lo stesso vale per i tempi per fase.
+	--> PARAMETRI IN INGRESSO: array (numero queries x 4) con le finestre delle queries (query_bounds);
+							   indice globale delle partizioni del dataset in questione, come restituito da open_master_index (master_index);
+							   tipo di geometria contenuta nel dataset (Point, Box, Polygon);
+							   numero totale di geometrie appartenenti al dataset in questione (total_geometries).
+	--> PARAMETRI IN USCITA: lista, nell'ordine delle queries, di (cardinality, mbr_tests, average_execution_time,
+							 number_parallel_threads, total_execution_time, phases) come restituiti da application_query.
+	"""
+
+	n_queries = len(query_bounds)
+	jobs = {}																				# Partizione --> [informazioni sulla partizione, queries che la interessano]
+	candidates = np.zeros(n_queries, dtype=np.int64)										# Partizioni candidate di ciascuna query
+	phases = np.zeros((n_queries, len(PHASES)))												# Tempi per fase (ms) attribuiti a ciascuna query
+	for q, bounds in enumerate(query_bounds):
+		start_query, start_cpu = time.perf_counter(), time.thread_time()
+		for part in candidate_partitions(tuple(bounds), master_index):
+			key = (part["path"], part.get("offset", 0), tuple(part["bounds"]))
+			jobs.setdefault(key, [part, []])[1].append(q)
+			candidates[q] += 1
+		phases[q, PHASES.index("filter")] = (time.perf_counter() - start_query) * 1000		# Filtro sull'RTree globale
+		phases[q, PHASES.index("cpu")] = (time.thread_time() - start_cpu) * 1000
+	print(f"<System>      Batch execution: {n_queries} queries, {int(candidates.sum())} query-partition pairs, {len(jobs)} partitions loaded once.")
+
+	matches = np.zeros(n_queries, dtype=np.int64)											# Geometrie che soddisfano ciascuna query
+	mbr_tests = np.zeros(n_queries, dtype=np.int64)											# MBR tests attribuiti a ciascuna query
+	times = np.zeros(n_queries)																# Tempo (ms) attribuito a ciascuna query
+	with ThreadPoolExecutor(max_workers=max(1, min(cpu_count(), len(jobs)))) as executor:
+		futures = {
+			executor.submit(join_partition, part, geometry_type, query_bounds[ids], time.perf_counter()): np.array(ids)
+			for part, ids in jobs.values()
+		}
+		for future in as_completed(futures):
+			ids = futures[future]															# Ogni query compare una sola volta per partizione
+			m, tests, t, p = future.result()
+			matches[ids] += m
+			mbr_tests[ids] += tests
+			times[ids] += t
+			phases[ids] += p
+
+	results = []
+	for q in range(n_queries):
+		number_parallel_threads = int(candidates[q]) if candidates[q] >= 4 else 1			# Come nell'esecuzione singola: un thread per partizione da 4 partizioni in su
+		total_execution_time = int(times[q])
+		results.append((
+			matches[q] / total_geometries if total_geometries > 0 else 0,					# Cardinalità
+			int(mbr_tests[q]),
+			int(total_execution_time / number_parallel_threads),
+			number_parallel_threads,
+			total_execution_time,
+			dict(zip(PHASES, phases[q]))
+		))
+	return results
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'join_partition':
+def join_partition(partition, geometry_type, query_bounds, submitted=None):
+
+	"""
+	Funzione che valuta su una partizione tutte le queries che la interessano: la partizione viene letta una sola volta e, per
+	ciascuna query, le geometrie vengono filtrate con un test vettoriale sugli MBR (esatto per punti e box, seguito dal test
+	di intersezione shapely per i poligoni), applicando le stesse regole di appartenenza dell'esecuzione singola (nessuna
+	replica, punto di riferimento o regola del centroide) e la stessa scorciatoia sull'MBR effettivo della partizione.
+	--> PARAMETRI IN INGRESSO: file partizione (partition);
+							   tipo di geometria contenuta nella partizione (Point, Box, Polygon);
+							   array (numero queries x 4) con le finestre delle queries che interessano la partizione (query_bounds);
+							   istante di invio della partizione al pool di thread (submitted).
+	--> PARAMETRI IN USCITA: array con le geometrie che soddisfano ciascuna query (matches);
+							 array con gli MBR tests di ciascuna query (mbr_tests);
+							 array con il tempo (ms) attribuito a ciascuna query (times);
+							 array (numero queries x fasi) con i tempi per fase (ms) attribuiti a ciascuna query (phases).
+	"""
+
+	start = time.perf_counter()
+	start_phases()
+	wait = (start - submitted) * 1000 if submitted is not None else 0.0					# Attesa in coda della partizione
+	n = len(query_bounds)
+	matches = np.zeros(n, dtype=np.int64)
+	mbr_tests = np.zeros(n, dtype=np.int64)
+	times = np.zeros(n)
+	phases = np.zeros((n, len(PHASES)))
+	todo = np.ones(n, dtype=bool)															# Queries da valutare leggendo la partizione
+
+	data_bounds = partition.get("data_bounds")
+	if data_bounds is not None and partition.get("replicated") == 0 and partition.get("count") is not None:
+		contained = (query_bounds[:, 0] <= data_bounds[0]) & (query_bounds[:, 1] <= data_bounds[1]) & (query_bounds[:, 2] >= data_bounds[2]) & (query_bounds[:, 3] >= data_bounds[3])
+		matches[contained] = partition["count"]												# Tutte le geometrie della partizione soddisfano la query (nessun test)
+		todo &= ~contained
+	if not todo.any():
+		times[:] = (time.perf_counter() - start) * 1000 / n
+		phases[:, PHASES.index("queue")] = wait / n
+		phases[:, PHASES.index("cpu")] = stop_phases()["cpu"] / n
+		return matches, mbr_tests, times, phases
+
+	geometry_type = geometry_type.lower()
+	if geometry_type == "polygon":															# MBR e centroidi dei poligoni (vettoriali)
+		geoms = np.array(read_partition(partition, geometry_type), dtype=object)
+		count_geom = len(geoms)
+		with phase("parse"):
+			if partition.get("replicated") is None and count_geom > 0:						# Regola del centroide (owns_geometry)
+				min_x, min_y, max_x, max_y = partition["bounds"]
+				centroids = shapely.centroid(geoms)
+				cx, cy = shapely.get_x(centroids), shapely.get_y(centroids)
+				geoms = geoms[(cx >= min_x) & (cx <= max_x) & (cy >= min_y) & (cy <= max_y)]
+			bounds = shapely.bounds(geoms) if len(geoms) > 0 else np.empty((0, 4))
+	else:																					# Punti e box: coordinate già filtrate in caricamento
+		bounds, count_geom = load_coordinates(partition, geometry_type)
+	load_time = (time.perf_counter() - start) * 1000
+	load_phases = np.array([current_phases()[name] for name in PHASES])
+
+	pending = np.flatnonzero(todo)
+	for q in pending:
+		start_query = time.perf_counter()
+		before = current_phases()
+		hit = coordinates_matches(partition, bounds, query_bounds[q])					# Intersezione tra MBR ed eventuale punto di riferimento
+		if geometry_type == "polygon" and hit.any():										# Test esatto solo sulle geometrie con MBR compatibile
+			with phase("refine"):
+				hit[hit] = shapely.intersects(geoms[hit], box(*query_bounds[q]))
+		matches[q] = int(hit.sum())
+		mbr_tests[q] = count_geom
+		times[q] = (time.perf_counter() - start_query) * 1000
+		after = current_phases()
+		phases[q] = [after[name] - before[name] for name in PHASES]
+	stop_phases()
+	times[pending] += load_time / len(pending)												# Caricamento diviso tra le queries che hanno letto la partizione
+	phases[pending] += load_phases / len(pending)
+	phases[pending, PHASES.index("queue")] += wait / len(pending)
+	return matches, mbr_tests, times, phases
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'process_queries':
+def process_queries(task):
+
+	"""
+	Funzione eseguita dai processi worker: applica un gruppo di queries consecutive allo stesso dataset. Ogni processo apre
+	l'indice globale di un dataset una sola volta (WORKER_INDEXES) e mantiene la propria cache delle partizioni tra un gruppo
+	e l'altro, così che le partizioni caricate restino disponibili per le queries successive inviate allo stesso processo.
+	--> PARAMETRI IN INGRESSO: task composta da cartella dell'indice, tipo di geometria, numero totale di geometrie del dataset
+							   e finestre delle queries del gruppo (task).
+	--> PARAMETRI IN USCITA: lista, nell'ordine delle queries, di (cardinality, mbr_tests, average_execution_time,
+							 number_parallel_threads, total_execution_time, phases) come restituiti da application_query;
+							 contatori della cache delle partizioni del processo relativi al gruppo (stats).
+	"""
+
+	path_indexes, geometry_type, total_geometries, query_bounds = task
+	if path_indexes not in WORKER_INDEXES:											# Prima query del dataset inviata a questo processo
+		WORKER_INDEXES[path_indexes] = open_master_index(path_indexes)
+	master_index = WORKER_INDEXES[path_indexes]
+	partition_cache_stats(reset=True)
+	if BATCH_QUERIES:																# Gruppo di queries valutato partizione per partizione
+		results = application_queries_batch(np.asarray(query_bounds, dtype=float), master_index, geometry_type, total_geometries)
+	else:
+		results = [application_query(bounds, master_index, geometry_type, total_geometries) for bounds in query_bounds]
+	return results, partition_cache_stats()
 
 # -------------------------------------------------------------------------------------------------------------------------------
 # FUNZIONE 'process_partition':
-def process_partition(part, geometry_type, query_box):
+def process_partition(part, geometry_type, query_box, submitted=None):
 	
 	"""
 	Funzione che restituisce l'effettivo calcolo della query sulla singola partizione in questione
 	--> PARAMETRI IN INGRESSO: Bounding Box, Geometrie e RTree interno della partizione in questione (part);
 							   tipo di geometria della partizione in questione (geometry_type);
-							   Bounding Box della query in questione (query_box).
+							   Bounding Box della query in questione (query_box);
+							   istante di invio della partizione al pool di thread (submitted).
 	--> PARAMETRI IN USCITA: numero di geometrie appartenenti alla partizione in questione che soddisfano la query in questione (matches);
 							 test svolti sulle geometrie della partizione in questione per analizzare la query in questione (mbr_tests);
-							 tempo di esecuzione del thread (total_time_processPartition).
+							 tempo di esecuzione del thread (total_time_processPartition);
+							 tempi per fase del thread (phases).
 	"""
 	
 	start_processPartition = time.perf_counter()
-	geometries, local_index, mbr_tests = load_partition(part, geometry_type)					# Caricamento delle geometrie correlate alla partizione in questione (e RTree )
-	matches = 0																					# Numero di geometrie appartenenti alla partizione in questione che soddisfano la query in questione
-	local_candidates = list(local_index.intersection(query_box.bounds))							# Isolo le sole geometrie che hanno MBR compatibili alla finestra di query in questione
-	for cid in local_candidates:																# Ciclo sulle sole geometrie che appartengono alla finestra di query in questione
-		if geometries[cid].intersects(query_box):												# Vedo se effettivamente la geometria interseca la finestra di query in questione
-			matches += 1																		# Se si, incremento la variabile contatrice
-	total_time_processPartition = int((time.perf_counter() - start_processPartition)) * 1000
+	start_phases()
+	if submitted is not None:																	# Attesa in coda prima che un thread fosse libero
+		PHASE_TIMES.times["queue"] = (start_processPartition - submitted) * 1000
+	matches, mbr_tests = query_partition(part, geometry_type, query_box)						# Applicazione della query alla partizione in questione (RTree locale aperto da disco o ricostruito)
+	total_time_processPartition = (time.perf_counter() - start_processPartition) * 1000		# Tempo in ms, arrotondato solo sul totale della query (i singoli thread durano spesso meno di 1 ms)
 
-	return matches, mbr_tests, total_time_processPartition
+	return matches, mbr_tests, total_time_processPartition, stop_phases()
 
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'range_queries_dataset':
+def range_queries_dataset(row, rangeQueries_df, pool=None):
+
+	"""
+	Funzione che esegue tutte le range queries di un dataset (una riga di 'rangeParameters.csv') e ne restituisce i risultati
+	uno alla volta, nell'ordine delle queries: il salvataggio è lasciato al chiamante (buffer del file di output oppure
+	segmento del dataset). Se l'indice non è valido o il tipo di geometria non è noto, non viene restituito alcun risultato.
+	--> PARAMETRI IN INGRESSO: riga di 'rangeParameters.csv' con i percorsi già costruiti (row);
+							   range queries relative al dataset in questione (rangeQueries_df);
+							   eventuali processi worker a cui distribuire le queries (pool).
+	--> PARAMETRI IN USCITA: risultati delle queries, un dizionario per query con le colonne del file di output.
+	"""
+
+	# 1. Costruzione dei principali percorsi utili --------------------------------------------------------------------------
+	dataset_name = row.dataset_name															# Costruzione: datasetNumber.ext --> datasetNumber
+	dataset_filePath = os.path.join(row.pathSummaries, row.nameSummary)						# Costruzione: summaries + sum_datasetsData_Time_UniqueCode.csv --> summaries/sum_datasetsData_Time_UniqueCode.csv
+	d_minX, d_minY, d_maxX, d_maxY, tot_geom = MBR_values(dataset_filePath, dataset_name)	# Calcolo dei valori di finestra del dataset in questione e numero di geometrie totali appartenenti al dataset in questione
+
+	# 2. Cerco il tipo di geometrie contenute nel dataset in analisi --------------------------------------------------------
+	start_time_getGeometry = time.perf_counter()
+	try:
+		geometry = get_geometry(dataset_name, row.pathSummaries, row.nameSummary)
+	except ValueError as e:
+		print(f"<System> Dataset geometry type lookup failed for '{dataset_name}'. Error: {e}")
+		return
+	print(f"<System> The dataset you want to analyze is '{dataset_name}'. His geometry is '{geometry}'.")
+	total_time_getGeometry = float(time.perf_counter() - start_time_getGeometry)
+	print(f"<System>      Time taken: {total_time_getGeometry:.6f} s")
+
+
+	# 3. Analisi della Master Table relativa al dataset in questione --------------------------------------------------------
+	print(f"<System> Analysis of the Master Table file with reference to the '{dataset_name}'.")
+	start_time_loadMasterTable = time.perf_counter()
+	if index_is_stale(row.pathIndexes, os.path.join(row.pathDatasets, row.nameDataset)):	# Indice costruito su una versione diversa del dataset --> risultati non validi
+		print(f"<System> The spatial index '{row.pathIndexes}' is stale for dataset '{dataset_name}', rebuild it with 'Indexing.py'! Range queries skipped.")
+		return
+	if pool is None:																		# Con i processi worker l'indice viene aperto da ciascun worker
+		master_index = open_master_index(row.pathIndexes)
+	total_time_loadMasterTable = float(time.perf_counter() - start_time_loadMasterTable)
+	print(f"<System>      Time taken: {total_time_loadMasterTable:.6f} s")
+
+	# 4. Esecuzione delle singole range queries legate al dataset in questione ----------------------------------------------
+	print(f"<System> Analysis of the {len(rangeQueries_df)} range queries relating to the '{dataset_name}'.")
+	start_time_applicationRangeQueries = time.perf_counter()
+	partition_cache_stats(reset=True)														# Contatori della cache relativi al solo dataset in questione
+	query_bounds = rangeQueries_df[["minX", "minY", "maxX", "maxY"]].to_numpy(dtype=float)
+	if pool is not None:																	# Gruppi di queries inviati ai processi worker, risultati ricevuti in ordine man mano che sono pronti
+		tasks = [(row.pathIndexes, geometry, tot_geom, query_bounds[i:i + QUERY_CHUNK]) for i in range(0, len(query_bounds), QUERY_CHUNK)]
+		pool_results = pool.imap(process_queries, tasks)
+		process_stats = {"hits": 0, "misses": 0, "evictions": 0}
+		pending_results = []
+	elif BATCH_QUERIES:																		# Tutte le queries del dataset valutate partizione per partizione
+		batch_results = application_queries_batch(query_bounds, master_index, geometry, tot_geom)
+	for i, rq_row in enumerate(rangeQueries_df.itertuples(index=False)):
+		if pool is None and not BATCH_QUERIES:
+			print(f"<System>      Analysis of the range query '{rq_row.numQuery}' of the '{row.nameRangeQueries}' file.")
+
+		# Calcolo dell'area effettiva di query, che rientra nella finestra del dataset in questione
+		int_minX = max(rq_row.minX, d_minX)											# Prendo il valore massimo tra limite di query e limite di dataset (minX)
+		int_minY = max(rq_row.minY, d_minY)											# Prendo il valore massimo tra limite di query e limite di dataset (minY)
+		int_maxX = min(rq_row.maxX, d_maxX)											# Prendo il valore minimo tra limite di query e limite di dataset (maxX)
+		int_maxY = min(rq_row.maxY, d_maxY)											# Prendo il valore minimo tra limite di query e limite di dataset (maxY)
+		range_bounds = (rq_row.minX, rq_row.minY, rq_row.maxX, rq_row.maxY)			# Range relativi alla finestra di query in questione
+		area_int = (int_maxX - int_minX) * (int_maxY - int_minY)					# Area di query effettiva interna al dataset
+		if area_int < 0:															# Se la query è esterna alla finestra del dataset in questione...
+			area_int = 0															# ... l'area di query è zero
+		query_area = (rq_row.maxX - rq_row.minX) * (rq_row.maxY - rq_row.minY)		# Calcolo area della query in questione
+
+		# Calcolo dei parametri risultati della query e del dataset selezionati
+		if pool is not None:
+			if not pending_results:													# Attesa del prossimo gruppo di risultati
+				pending_results, stats = next(pool_results)
+				pending_results = list(reversed(pending_results))
+				for key in process_stats:
+					process_stats[key] += stats[key]
+			cardinality, mbr_tests, avarage_execution_time, number_parallel_threads, total_execution_time, phases = pending_results.pop()
+		elif BATCH_QUERIES:
+			cardinality, mbr_tests, avarage_execution_time, number_parallel_threads, total_execution_time, phases = batch_results[i]
+		else:
+			cardinality, mbr_tests, avarage_execution_time, number_parallel_threads, total_execution_time, phases = application_query(range_bounds, master_index, geometry, tot_geom)
+
+		# Restituisco il risultato della query in questione (salvato dal chiamante)
+		yield {
+			"datasetName": dataset_name,
+			"numQuery": rq_row.numQuery,
+			"queryArea": query_area,
+			"minX": rq_row.minX,
+			"minY": rq_row.minY,
+			"maxX": rq_row.maxX,
+			"maxY": rq_row.maxY,
+			"areaint": area_int,
+			"cardinality": cardinality,
+			"mbrTests": mbr_tests,
+			"averageExecutionTime": avarage_execution_time,
+			"numberParallelThreads": number_parallel_threads,
+			"totalExecutionTime": total_execution_time,
+			**{f"{name}Time": round(float(phases[name]), 3) for name in PHASES}		# Tempi per fase (ioTime, parseTime, ..., cpuTime)
+		}
+
+	total_time_applicationRangeQueries = float(time.perf_counter() - start_time_applicationRangeQueries)
+	print(f"<System>      Time taken: {total_time_applicationRangeQueries:.6f} s")
+	if PARTITION_CACHE and pool is not None:
+		print(f"<System>      Partition cache ({QUERY_PROCESSES} processes): {process_stats['hits']} hits, {process_stats['misses']} misses, {process_stats['evictions']} evictions.")
+	elif PARTITION_CACHE:
+		stats = partition_cache_stats()
+		print(f"<System>      Partition cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions, {stats['bytes'] / (1024 * 1024):.1f} MB in use.")
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'dataset_segment':
+def dataset_segment(task):
+
+	"""
+	Funzione eseguita dai processi worker con PARALLEL_DATASETS: esegue le range queries di un dataset e ne salva i risultati
+	in un segmento dedicato (senza header), unito in seguito dal processo principale al file di output. In questo modo più
+	dataset possono essere elaborati insieme anche se salvano sullo stesso file 'rqR_*.csv'.
+	--> PARAMETRI IN INGRESSO: task composta da posizione della riga in 'rangeParameters.csv', riga con i percorsi già
+							   costruiti (come dizionario) e range queries relative al dataset in questione (task).
+	--> PARAMETRI IN USCITA: percorso del file di output del dataset (output_filePath);
+							 percorso del segmento con i risultati, None se il dataset non ha prodotto risultati o è fallito (segment_filePath).
+	"""
+
+	position, row, rangeQueries_df = task
+	row = SimpleNamespace(**row)
+	print()
+	print(f"<System> Starting the range queries process for '{row.nameDataset}'!")
+	segment_filePath = os.path.join(os.path.dirname(row.output_filePath), "segments", f"{position}_{row.dataset_name}.csv")
+	buffer = []																					# Buffer dei risultati del dataset in questione
+	buffer_size = 250																			# Dimensione massima del buffer oltre il cui vengono salvati i risultati sul segmento
+	written = False																				# Il segmento è stato creato
+	try:
+		for result in range_queries_dataset(row, rangeQueries_df):								# Le queries del dataset vengono eseguite nel solo processo worker
+			buffer.append(result)
+			if len(buffer) >= buffer_size:
+				pd.DataFrame(buffer).to_csv(segment_filePath, sep=';', mode='a' if written else 'w', header=False, index=False)
+				buffer.clear()
+				written = True
+		if buffer:
+			pd.DataFrame(buffer).to_csv(segment_filePath, sep=';', mode='a' if written else 'w', header=False, index=False)
+			written = True
+	except Exception as e:																		# Errore limitato al dataset: il segmento parziale viene scartato e gli altri dataset proseguono
+		print(f"<System> Range queries failed for '{row.nameDataset}'. Error: {e}")
+		if written and os.path.exists(segment_filePath):
+			os.remove(segment_filePath)
+		return row.output_filePath, None
+	return row.output_filePath, segment_filePath if written else None
 
 
 
@@ -334,100 +1340,82 @@ def main():
 	total_time_analysisInputFile = float(time.perf_counter() - start_time_analysisInputFile)
 	print(f"<System>      Time taken: {total_time_analysisInputFile:.6f} s")
 
-	for row in df.itertuples(index=False):														# Esecuzione di tutte le Range Queries richieste dall'utente
+	# Percorsi di output e di range queries di ogni riga: i file condivisi da più dataset vengono letti e riscritti una sola volta
+	df["dataset_name"] = [name.removesuffix(".csv").removesuffix(".wkt") for name in df["nameDataset"]]											# Costruzione: datasetNumber.ext --> datasetNumber
+	df["output_filePath"] = [os.path.join("rangeQueriesResult", f"rqR_{os.path.basename(path)}.csv") for path in df["pathDatasets"]]			# Costruzione: rangeQueriesResult/rqR_datasetsData_Time_UniqueCode.csv
+	df["rangeQueries_filePath"] = [os.path.join(path, name) for path, name in zip(df["pathRangeQueries"], df["nameRangeQueries"])]			# Costruzione: rangeQueriesInputs/rqI_datasetsData_Time_UniqueCode.csv
+
+	print(f"<System> Output files and range queries files analysis for {len(df)} datasets.")
+	start_time_batchFiles = time.perf_counter()
+	os.makedirs("rangeQueriesResult", exist_ok=True)																	# Se la directory non esiste, viene generata
+	for output_filePath, group in df.groupby("output_filePath", sort=False):												# Un solo filtro/riscrittura per file di output
+		analysis_output_file(output_filePath, set(group["dataset_name"]))
+	rangeQueries_groups = {}																								# Queries raggruppate per dataset: (file, dataset) --> DataFrame
+	for rangeQueries_filePath, group in df.groupby("rangeQueries_filePath", sort=False):									# Una sola lettura per file di range queries
+		for name, queries in analyze_rangeQueries(rangeQueries_filePath, list(dict.fromkeys(group["dataset_name"]))).items():
+			rangeQueries_groups[(rangeQueries_filePath, name)] = queries
+	total_time_batchFiles = float(time.perf_counter() - start_time_batchFiles)
+	print(f"<System>      Time taken: {total_time_batchFiles:.6f} s")
+
+	if PARALLEL_DATASETS > 0:																	# Dataset elaborati in parallelo, ciascuno sul proprio segmento
+		if QUERY_PROCESSES > 0:
+			print(f"<System> QUERY_PROCESSES is ignored when PARALLEL_DATASETS is set: the queries of each dataset run inside its worker.")
+		print(f"<System> Datasets distributed across {PARALLEL_DATASETS} processes.")
+		segments_folder = os.path.join("rangeQueriesResult", "segments")
+		os.makedirs(segments_folder, exist_ok=True)
+		tasks = [
+			(position, row._asdict(), rangeQueries_groups[(row.rangeQueries_filePath, row.dataset_name)])
+			for position, row in enumerate(df.itertuples(index=False))
+		]
+		with Pool(PARALLEL_DATASETS) as dataset_pool:
+			for output_filePath, segment_filePath in dataset_pool.imap(dataset_segment, tasks):	# Segmenti uniti nell'ordine di 'rangeParameters.csv' man mano che sono pronti
+				if segment_filePath is None:
+					continue
+				with open(output_filePath, "ab") as output_file, open(segment_filePath, "rb") as segment_file:
+					shutil.copyfileobj(segment_file, output_file)
+				os.remove(segment_filePath)
+		if not os.listdir(segments_folder):														# Cartella dei segmenti rimossa se vuota
+			os.rmdir(segments_folder)
 		print()
-		print(f"<System> Starting the range queries process for '{row.nameDataset}'!")
-
-		# 1. Costruzione dei principali percorsi utili --------------------------------------------------------------------------
-		dataset_last = os.path.basename(row.pathDatasets)										# Costruzione: datasets/datasetsData_Time_UniqueCode --> datasetsData_Time_UniqueCode
-		output_fileName = f"rqR_{dataset_last}.csv"												# Costruzione: datasetsData_Time_UniqueCode --> rqR_datasetsData_Time_UniqueCode.csv
-		output_filePath = os.path.join("rangeQueriesResult", output_fileName)					# Costruzione: rangeQueriesResult + rqR_datasetsData_Time_UniqueCode.csv --> rangeQueriesResult/rqR_datasetsData_Time_UniqueCode.csv
-		output_fileDir = os.path.dirname(output_filePath)										# Costruzione: rangeQueriesResult/rqR_datasetsData_Time_UniqueCode.csv --> rangeQueriesResult
-		if not os.path.exists(output_fileDir):													# Se la directory non esiste...
-			os.makedirs(output_fileDir)															# ... viene generata
-		rangeQueries_filePath = os.path.join(row.pathRangeQueries, row.nameRangeQueries)		# Costruzione: rangeQueriesInputs + rqI_datasetsData_Time_UniqueCode.csv --> rangeQueriesInputs/rqI_datasetsData_Time_UniqueCode.csv
-		dataset_name = row.nameDataset.removesuffix(".csv").removesuffix(".wkt")				# Costruzione: datasetNumber.ext --> datasetNumber
-		dataset_filePath = os.path.join(row.pathSummaries, row.nameSummary)						# Costruzione: summaries + sum_datasetsData_Time_UniqueCode.csv --> summaries/sum_datasetsData_Time_UniqueCode.csv
-		d_minX, d_minY, d_maxX, d_maxY, tot_geom = MBR_values(dataset_filePath, dataset_name)	# Calcolo dei valori di finestra del dataset in questione e numero di geometrie totali appartenenti al dataset in questione
-		buffer = []																				# Imposto un buffer per il salvataggio dei risultati delle queries relative al dataset in questione
-		buffer_size = 250																		# Dimensione massima del buffer oltre il cui vengono salvati i risultati sulle queries
-
-		# 2. Cerco il tipo di geometrie contenute nel dataset in analisi --------------------------------------------------------
-		start_time_getGeometry = time.perf_counter()
+		print("<System> Program finished.\n")
+		return
+
+	buffer = []																					# Buffer dei risultati condiviso tra dataset che salvano sullo stesso file
+	buffer_filePath = None																		# File di output a cui si riferisce il contenuto del buffer
+	buffer_size = 250																			# Dimensione massima del buffer oltre il cui vengono salvati i risultati sulle queries
+	with (Pool(QUERY_PROCESSES) if QUERY_PROCESSES > 0 else nullcontext()) as pool:			# Processi worker condivisi da tutti i dataset (cache delle partizioni mantenute), chiusi anche in caso di errore
+		if pool is not None:
+			print(f"<System> Range queries distributed across {QUERY_PROCESSES} processes ({QUERY_CHUNK} queries per task).")
 		try:
-			geometry = get_geometry(dataset_name, row.pathSummaries, row.nameSummary)
-		except ValueError as e:
-			print(f"<System> Dataset geometry type lookup failed for '{dataset_name}'. Error: {e}")
-			continue
-		print(f"<System> The dataset you want to analyze is '{dataset_name}'. His geometry is '{geometry}'.")
-		total_time_getGeometry = float(time.perf_counter() - start_time_getGeometry)
-		print(f"<System>      Time taken: {total_time_getGeometry:.6f} s")
-
-
-		# 3. Analisi del file di output -----------------------------------------------------------------------------------------
-		print(f"<System> Output file analysis for dataset '{dataset_name}'.")
-		start_time_analysisOutputFile = time.perf_counter()
-		analysis_output_file(output_filePath, dataset_name)
-		total_time_analysisOutputFile = float(time.perf_counter() - start_time_analysisOutputFile)
-		print(f"<System>      Time taken: {total_time_analysisOutputFile:.6f} s")
-
-		# 4. Analisi del file contenente le range queries -----------------------------------------------------------------------
-		print(f"<System> Analysis of the '{row.nameRangeQueries}' file with reference to the '{dataset_name}'.")
-		start_time_analyzeRangeQueries = time.perf_counter()
-		rangeQueries_df = analyze_rangeQueries(rangeQueries_filePath, dataset_name)								# Funzione che mi restituisce un DataFrame contenente le sole righe di queries interessate al dataset in analisi
-		rangeQueries_df = rangeQueries_df.astype({"minX": float, "minY": float, "maxX": float, "maxY": float})	# Tipizzazione dei valori trovati
-		total_time_analyzeRangeQueries = float(time.perf_counter() - start_time_analyzeRangeQueries)
-		print(f"<System>      Time taken: {total_time_analyzeRangeQueries:.6f} s")
-
-		# 5. Analisi della Master Table relativa al dataset in questione --------------------------------------------------------
-		print(f"<System> Analysis of the Master Table file with reference to the '{dataset_name}'.")
-		start_time_loadMasterTable = time.perf_counter()
-		partition_files = load_master_table(row.pathIndexes)
-		partition_index = build_partition_index(partition_files)
-		total_time_loadMasterTable = float(time.perf_counter() - start_time_loadMasterTable)
-		print(f"<System>      Time taken: {total_time_loadMasterTable:.6f} s")
-
-		# 6. Esecuzione delle singole range queries legate al dataset in questione ----------------------------------------------
-		print(f"<System> Analysis of the {len(rangeQueries_df)} range queries relating to the '{dataset_name}'.")
-		start_time_applicationRangeQueries = time.perf_counter()
-		for rq_row in rangeQueries_df.itertuples(index=False):
-			print(f"<System>      Analysis of the range query '{rq_row.numQuery}' of the '{row.nameRangeQueries}' file.")
+			for row in df.itertuples(index=False):														# Esecuzione di tutte le Range Queries richieste dall'utente
+				print()
+				print(f"<System> Starting the range queries process for '{row.nameDataset}'!")
 
-			# Calcolo dell'area effettiva di query, che rientra nella finestra del dataset in questione
-			int_minX = max(rq_row.minX, d_minX)											# Prendo il valore massimo tra limite di query e limite di dataset (minX)
-			int_minY = max(rq_row.minY, d_minY)											# Prendo il valore massimo tra limite di query e limite di dataset (minY)
-			int_maxX = min(rq_row.maxX, d_maxX)											# Prendo il valore minimo tra limite di query e limite di dataset (maxX)
-			int_maxY = min(rq_row.maxY, d_maxY)											# Prendo il valore minimo tra limite di query e limite di dataset (maxY)
-			range_bounds = (rq_row.minX, rq_row.minY, rq_row.maxX, rq_row.maxY)			# Range relativi alla finestra di query in questione
-			area_int = (int_maxX - int_minX) * (int_maxY - int_minY)					# Area di query effettiva interna al dataset
-			if area_int < 0:															# Se la query è esterna alla finestra del dataset in questione...
-				area_int = 0															# ... l'area di query è zero
-			query_area = (rq_row.maxX - rq_row.minX) * (rq_row.maxY - rq_row.minY)		# Calcolo area della query in questione
-
-			# Calcolo dei parametri risultati della query e del dataset selezionati
-			cardinality, mbr_tests, avarage_execution_time, number_parallel_threads, total_execution_time = application_query(range_bounds, partition_files, partition_index, geometry, tot_geom)
-
-			# Aggiungo il risultato della query in questione al buffer di salvataggio
-			buffer.append({
-				"datasetName": dataset_name,
-				"numQuery": rq_row.numQuery,
-				"queryArea": query_area,
-				"minX": rq_row.minX,
-				"minY": rq_row.minY,
-				"maxX": rq_row.maxX,
-				"maxY": rq_row.maxY,
-				"areaint": area_int,
-				"cardinality": cardinality,
-				"mbrTests": mbr_tests,
-				"averageExecutionTime": avarage_execution_time,
-				"numberParallelThreads": number_parallel_threads,
-				"totalExecutionTime": total_execution_time
-			})
-
-			# Se il buffer è abbastanza pieno, procedo al salvataggio dei risultati e svuoto il buffer
-			if len(buffer) >= buffer_size:
+				if buffer and buffer_filePath != row.output_filePath:									# Cambio di file di output: salvo quanto accumulato per il file precedente
+					pd.DataFrame(buffer).to_csv(buffer_filePath, sep=';', mode='a', header=False, index=False)
+					buffer.clear()
+				buffer_filePath = row.output_filePath
+
+				# Range queries relative al dataset in questione (file già letto e raggruppato per dataset) ------------------------------
+				rangeQueries_df = rangeQueries_groups[(row.rangeQueries_filePath, row.dataset_name)]
+				for result in range_queries_dataset(row, rangeQueries_df, pool):
+					buffer.append(result)																# Aggiungo il risultato della query in questione al buffer di salvataggio
+
+					# Se il buffer è abbastanza pieno, procedo al salvataggio dei risultati e svuoto il buffer
+					if len(buffer) >= buffer_size:
+						pd.DataFrame(buffer).to_csv(						# Creo un DataFrame partendo dal buffer e lo stampo su un ".csv"
+							buffer_filePath,								# Salvo su questo file
+							sep=';',										# Carattere separatore
+							mode='a',										# Aggiungi in fondo al file
+							header=False,									# L'header non viene scritto
+							index=False										# Non scrive l'indice numerico riferito a ciascuna riga del buffer
+						)
+						buffer.clear()										# Pulizia del buffer
+		finally:
+			# Se terminata (o interrotta da un errore) l'analisi dei dataset il buffer ha ancora dei risultati al suo interno, procedo al loro salvataggio e svuoto il buffer
+			if buffer:
 				pd.DataFrame(buffer).to_csv(						# Creo un DataFrame partendo dal buffer e lo stampo su un ".csv"
-					output_filePath,								# Salvo su questo file
+					buffer_filePath,								# Salvo su questo file
 					sep=';',										# Carattere separatore
 					mode='a',										# Aggiungi in fondo al file
 					header=False,									# L'header non viene scritto
@@ -435,20 +1423,6 @@ def main():
 				)
 				buffer.clear()										# Pulizia del buffer
 
-		# Se terminata l'analisi del dataset il buffer ha ancora dei risultati al suo interno, procedo al loro salvataggio e svuoto il buffer
-		if buffer:
-			pd.DataFrame(buffer).to_csv(						# Creo un DataFrame partendo dal buffer e lo stampo su un ".csv"
-				output_filePath,								# Salvo su questo file
-				sep=';',										# Carattere separatore
-				mode='a',										# Aggiungi in fondo al file
-				header=False,									# L'header non viene scritto
-				index=False										# Non scrive l'indice numerico riferito a ciascuna riga del buffer
-			)
-			buffer.clear()										# Pulizia del buffer
-
-		total_time_applicationRangeQueries = float(time.perf_counter() - start_time_applicationRangeQueries)
-		print(f"<System>      Time taken: {total_time_applicationRangeQueries:.6f} s")
-
 	print()
 	print("<System> Program finished.\n")
 
@@ -0,0 +1,287 @@
+import numpy as np
+import os
+import time
+import pandas as pd
+from Indexing import border_geometries, partition_aggregates, source_hash
+from RangeQuery import load_master_rows, owned_coordinates, partition_entries, read_partition
+
+OPTIONAL_COLUMNS = {"seed": 0}													# Colonne facoltative del file 'samplingParameters.csv' con il relativo valore di default
+MASTER_COLUMNS = ["ID", "NamePartition", "NumberGeometries", "FileSize", "GeometryType", "Format", "PackedFile", "Offset", "Length", "LocalIndex",
+				  "Compression", "CompressionRatio", "DecodeMBps", "Replicated", "xMin", "yMin", "xMax", "yMax",
+				  "DataXMin", "DataYMin", "DataXMax", "DataYMax", "TotalArea", "AvgArea", "AvgWidth", "AvgHeight", "CountGrid",
+				  "SourceSize", "SourceMtime", "SourceHash", "IndexParameters"]
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'analyze_csv':
+def analyze_csv(file_path):
+
+	"""
+	Funzione che passato in ingresso un file '.csv', restituisce un DataFrame con le colonne del file in ingresso (le colonne
+	sono "pathDatasets", "nameDataset", "pathSummaries", "nameSummary", "pathIndexes", "percentage" e, facoltativa, "seed"):
+	--> PARAMETRI IN INGRESSO: percorso del file (file_path);
+	--> PARAMETRI IN USCITA: DataFrame con ciascuna riga un campione da generare composta da (["pathDatasets", "nameDataset",
+							 "pathSummaries", "nameSummary", "pathIndexes", "percentage", "seed"]).
+	"""
+
+	df = pd.read_csv(file_path, sep=';')
+	expected = ["pathDatasets", "nameDataset", "pathSummaries", "nameSummary", "pathIndexes", "percentage"]
+	if df.columns.tolist()[:len(expected)] != expected or not set(df.columns[len(expected):]).issubset(OPTIONAL_COLUMNS):
+		raise ValueError(f"<System> ERROR: the CSV header expected is '{expected}' (optional columns: {list(OPTIONAL_COLUMNS)})...")
+	for column, default in OPTIONAL_COLUMNS.items():							# Colonne facoltative assenti o vuote --> valore di default
+		if column not in df.columns:
+			df[column] = default
+		df[column] = df[column].fillna(default)
+	return df
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'sample_name':
+def sample_name(dataset_name, percentage):
+
+	"""
+	Funzione che costruisce il nome del dataset campionato a partire dal nome del dataset e dalla percentuale richiesta.
+	--> PARAMETRI IN INGRESSO: nome del dataset senza estensione (dataset_name);
+							   percentuale di geometrie da campionare (percentage).
+	--> PARAMETRI IN USCITA: nome del campione ('datasetNumber_sample10', 'datasetNumber_sample0_5', ...).
+	"""
+
+	return f"{dataset_name}_sample{percentage:g}".replace(".", "_")
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'record_keys':
+def record_keys(coords):
+
+	"""
+	Funzione che trasforma ogni geometria (riga di coordinate) in un unico valore confrontabile e ordinabile, usato per
+	ritrovare le repliche delle geometrie campionate nelle altre partizioni.
+	--> PARAMETRI IN INGRESSO: array (numero geometrie x 2 o 4) con le coordinate (coords).
+	--> PARAMETRI IN USCITA: array con i bytes delle coordinate di ciascuna geometria.
+	"""
+
+	records = np.ascontiguousarray(coords, dtype="<f8")
+	return records.view(np.dtype((np.void, 8 * records.shape[1]))).ravel()
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'replica_rows':
+def replica_rows(coords, mask, keys, picks):
+
+	"""
+	Funzione che individua, tra le geometrie non proprietarie di una partizione, le repliche delle geometrie campionate.
+	Le geometrie identiche hanno la stessa partizione proprietaria e vengono replicate nelle stesse partizioni: di ogni
+	geometria vengono quindi mantenute tante copie quante ne sono state estratte dalla partizione proprietaria (e non
+	tutte le copie identiche, come farebbe un semplice confronto di appartenenza).
+	--> PARAMETRI IN INGRESSO: array (numero geometrie x 2 o 4) con le coordinate della partizione (coords);
+							   array (boolean) con TRUE per le geometrie di cui la partizione è proprietaria (mask);
+							   geometrie campionate, ordinate e senza duplicati (keys);
+							   numero di copie estratte di ciascuna geometria campionata (picks).
+	--> PARAMETRI IN USCITA: indici (ordinati) delle righe della partizione da mantenere come repliche.
+	"""
+
+	candidates = np.flatnonzero(~mask)
+	if len(candidates) == 0 or len(keys) == 0:
+		return np.empty(0, dtype=np.int64)
+	candidate_keys = record_keys(coords[candidates])
+	order = np.argsort(candidate_keys, kind="stable")							# Copie identiche consecutive
+	candidates, candidate_keys = candidates[order], candidate_keys[order]
+	starts = np.r_[0, np.flatnonzero(candidate_keys[1:] != candidate_keys[:-1]) + 1]
+	rank = np.arange(len(candidates)) - np.repeat(starts, np.diff(np.r_[starts, len(candidates)]))	# Copia n-esima della geometria
+	position = np.minimum(np.searchsorted(keys, candidate_keys), len(keys) - 1)
+	found = (keys[position] == candidate_keys) & (rank < picks[position])
+	return np.sort(candidates[found])
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'allocate_sample':
+def allocate_sample(counts, fraction):
+
+	"""
+	Funzione che ripartisce la dimensione del campione tra le partizioni in modo proporzionale al numero di geometrie di
+	cui ciascuna è proprietaria (metodo dei resti più grandi): il totale è pari al numero di geometrie del dataset per la
+	frazione richiesta, arrotondato all'intero più vicino.
+	--> PARAMETRI IN INGRESSO: geometrie di cui ciascuna partizione è proprietaria (counts);
+							   frazione di geometrie da campionare (fraction).
+	--> PARAMETRI IN USCITA: array con il numero di geometrie da campionare in ciascuna partizione.
+	"""
+
+	counts = np.asarray(counts, dtype=np.int64)
+	quotas = counts * fraction
+	sizes = np.floor(quotas).astype(np.int64)
+	missing = int(round(counts.sum() * fraction)) - int(sizes.sum())			# Geometrie ancora da assegnare
+	if missing > 0:
+		order = np.argsort(-(quotas - sizes), kind="stable")					# Partizioni con il resto più grande per prime
+		sizes[order[:missing]] += 1
+	return np.minimum(sizes, counts)
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'write_sample_partition':
+def write_sample_partition(folder, partition_id, coords, parent_row, replicated):
+
+	"""
+	Funzione che salva una partizione dell'indice campionato (un file per partizione, non compresso, nello stesso formato
+	della partizione di partenza) con la stessa finestra della partizione di partenza, e ne restituisce la riga della master_table.
+	--> PARAMETRI IN INGRESSO: cartella dell'indice campionato (folder);
+							   numero della partizione (partition_id);
+							   array (numero geometrie x 2 o 4) con le coordinate campionate della partizione (coords);
+							   riga della master_table della partizione di partenza (parent_row);
+							   geometrie della partizione salvate anche in altre partizioni (replicated).
+	--> PARAMETRI IN USCITA: riga della master_table della partizione campionata.
+	"""
+
+	if parent_row["Format"] == "binary":										# Colonne float64 consecutive
+		name = f"partition_{partition_id}.bin"
+		content = np.ascontiguousarray(coords.T, dtype="<f8").tobytes()
+	else:																		# CSV senza intestazione
+		name = f"partition_{partition_id}.csv"
+		content = pd.DataFrame(coords).to_csv(index=False, header=False).encode()
+	with open(os.path.join(folder, name), "wb") as file:
+		file.write(content)
+	bounds = (parent_row["xMin"], parent_row["yMin"], parent_row["xMax"], parent_row["yMax"])
+	return {
+		"ID": partition_id,
+		"NamePartition": name,
+		"NumberGeometries": len(coords),
+		"FileSize": len(content),
+		"GeometryType": parent_row["GeometryType"],
+		"Format": parent_row["Format"],
+		"PackedFile": "",
+		"Offset": 0,
+		"Length": len(content),
+		"LocalIndex": "",
+		"Compression": "none",
+		"CompressionRatio": 1.0,
+		"DecodeMBps": 0.0,
+		"Replicated": replicated,
+		"xMin": bounds[0], "yMin": bounds[1], "xMax": bounds[2], "yMax": bounds[3],
+		**partition_aggregates(coords[:, [0, 1, -2, -1]], bounds)
+	}
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'sample_index':
+def sample_index(parentIndex, sampleIndex, fraction, seed):
+
+	"""
+	Funzione che costruisce il campione stratificato di un dataset a partire dal suo indice spaziale: da ogni partizione
+	viene estratta (senza reinserimento) una quota delle geometrie di cui è proprietaria proporzionale alla sua dimensione,
+	così che il campione conservi la distribuzione spaziale del dataset. Le geometrie replicate su più partizioni vengono
+	campionate una sola volta (dalla partizione proprietaria) e poi mantenute in tutte le partizioni che le contengono.
+	L'indice del campione riusa le finestre delle partizioni di partenza (le partizioni rimaste vuote non vengono salvate).
+	--> PARAMETRI IN INGRESSO: cartella dell'indice spaziale di partenza (parentIndex);
+							   cartella dell'indice spaziale del campione (sampleIndex);
+							   frazione di geometrie da campionare (fraction);
+							   seme del generatore casuale, per campioni riproducibili (seed).
+	--> PARAMETRI IN USCITA: array (numero geometrie campionate x 2 o 4) con le geometrie del campione;
+							 righe della master_table del campione (senza le colonne del dataset di origine).
+	"""
+
+	rows = load_master_rows(parentIndex)
+	geometry_type = str(rows[0]["GeometryType"]).lower() if rows else "box"
+	n_columns = {"point": 2, "box": 4}.get(geometry_type)
+	if n_columns is None:														# Poligoni non campionabili a coordinate
+		raise ValueError(f"<System> Sampling supports only 'point' and 'box' datasets (found '{geometry_type}').")
+
+	partitions, owned = [], []													# Coordinate e geometrie proprietarie di ciascuna partizione
+	for entry in partition_entries(parentIndex, rows):
+		coords = np.asarray(read_partition(entry, geometry_type), dtype=float)
+		partitions.append(coords)
+		owned.append(owned_coordinates(entry, coords[:, [0, 1, -2, -1]]))		# MBR delle geometrie (degeneri per i punti)
+	sizes = allocate_sample([mask.sum() for mask in owned], fraction)
+
+	rng = np.random.default_rng(seed)
+	chosen = []																	# Geometrie campionate da ciascuna partizione proprietaria
+	for coords, mask, size in zip(partitions, owned, sizes):
+		picked = rng.choice(np.flatnonzero(mask), size=size, replace=False) if size > 0 else np.empty(0, dtype=np.int64)
+		chosen.append(coords[np.sort(picked)])
+	sample = np.concatenate(chosen) if chosen else np.empty((0, n_columns))
+	keys, picks = np.unique(record_keys(sample), return_counts=True)			# Geometrie del campione e copie estratte (per ritrovarne le repliche)
+
+	os.makedirs(sampleIndex, exist_ok=True)
+	sample_rows = []
+	for row, coords, mask, picked in zip(rows, partitions, owned, chosen):
+		if row["Replicated"] is None or int(row["Replicated"]) == 0:			# Nessuna replica: la partizione contiene le sole geometrie campionate
+			kept, replicated = picked, 0
+		else:																	# Repliche delle geometrie campionate da altre partizioni
+			kept = np.concatenate([picked, coords[replica_rows(coords, mask, keys, picks)]])
+			replicated = border_geometries(kept[:, [0, 1, -2, -1]], (row["xMin"], row["yMin"], row["xMax"], row["yMax"]))
+		if len(kept) > 0:
+			sample_rows.append(write_sample_partition(sampleIndex, len(sample_rows), kept, row, replicated))
+	return sample, sample_rows
+
+# -------------------------------------------------------------------------------------------------------------------------------
+# FUNZIONE 'update_summary':
+def update_summary(path_summary, dataset_name, new_dataset_name, num_features):
+
+	"""
+	Funzione che aggiunge (o aggiorna) nel sommario la riga del dataset campionato, copiando quella del dataset di partenza
+	con il nuovo nome e il numero di geometrie del campione.
+	--> PARAMETRI IN INGRESSO: percorso del sommario dei dataset (path_summary);
+							   nome del dataset di partenza (dataset_name);
+							   nome del dataset campionato (new_dataset_name);
+							   numero di geometrie del campione (num_features).
+	"""
+
+	df = pd.read_csv(path_summary, sep=';')
+	parent = df.loc[df["datasetName"] == dataset_name]
+	if parent.empty:
+		raise ValueError(f"<System> Dataset '{dataset_name}' not found in summary file.")
+	new_row = parent.iloc[[0]].copy()
+	new_row["datasetName"] = new_dataset_name
+	new_row["num_features"] = num_features
+	df = pd.concat([df[df["datasetName"] != new_dataset_name], new_row], ignore_index=True)
+	df.to_csv(path_summary, sep=';', index=False)
+
+# -------------------------------------------------------------------------------------------------------------------------------
+def main():
+	file_input = "samplingParameters.csv"															# File '.csv' contenente gli input
+	print(f"<System> Starting the reading process for file '{file_input}'!")
+	if not os.path.exists(file_input):																# Verifica dell'esistenza del file 'samplingParameters.csv'
+		raise ValueError(f"<System> ERROR: The file '{file_input}' does not exist!")
+	df = analyze_csv(file_input)																	# Richiamo una funzione che analizzi gli input del file e restituisca un DataFrame
+
+	for row in df.itertuples(index=False):															# Generazione di tutti i campioni richiesti dall'utente
+		print()
+		start_time_sample = time.perf_counter()
+		dataset_name, extension = os.path.splitext(row.nameDataset)									# Costruzione: datasetNumber.ext --> datasetNumber, .ext
+		try:
+			percentage = float(row.percentage)
+			seed = int(row.seed)
+		except ValueError:
+			print(f"<System> Sampling of '{row.nameDataset}' skipped: the percentage '{row.percentage}' or the seed '{row.seed}' are incorrect!")
+			continue
+		if not 0 < percentage <= 100:
+			print(f"<System> Sampling of '{row.nameDataset}' skipped: the percentage must be in (0, 100]!")
+			continue
+		new_dataset_name = sample_name(dataset_name, percentage)									# Costruzione: datasetNumber --> datasetNumber_sample10
+		print(f"<System> Starting the sampling process of '{row.nameDataset}' ({percentage:g}%) --> '{new_dataset_name}'!")
+
+		# 1. Campionamento stratificato delle partizioni e indice spaziale del campione ---------------------------------------
+		sampleIndex = os.path.join(os.path.dirname(os.path.normpath(row.pathIndexes)), f"{new_dataset_name}_spatialIndex")	# Costruzione: indexes/datasetsData_Time_UniqueCode/datasetNumber_sample10_spatialIndex
+		try:
+			sample, sample_rows = sample_index(row.pathIndexes, sampleIndex, percentage / 100, seed)
+		except (FileNotFoundError, ValueError) as e:
+			print(f"<System> Sampling of '{row.nameDataset}' failed. Error: {e}")
+			continue
+
+		# 2. Salvataggio del dataset campionato (stesso formato del dataset di partenza) --------------------------------------
+		pathDataset = os.path.join(row.pathDatasets, f"{new_dataset_name}{extension}")
+		pd.DataFrame(sample).to_csv(pathDataset, index=False, header=False)
+
+		# 3. Master Table del campione (con i dati del dataset campionato, verificati da 'RangeQuery.py') ---------------------
+		source_stat = os.stat(pathDataset)
+		parent_parameters = load_master_rows(row.pathIndexes)[0]["IndexParameters"]
+		for sample_row in sample_rows:
+			sample_row["SourceSize"] = source_stat.st_size
+			sample_row["SourceMtime"] = source_stat.st_mtime_ns
+			sample_row["SourceHash"] = source_hash(pathDataset) if sample_row is sample_rows[0] else sample_rows[0]["SourceHash"]
+			sample_row["IndexParameters"] = f"{parent_parameters}|sample={percentage:g}|seed={seed}"	# Partizioni derivate: 'Indexing.py' ricostruisce l'indice se richiesto
+		pd.DataFrame(sample_rows, columns=MASTER_COLUMNS).to_csv(os.path.join(sampleIndex, "master_table.csv"), index=False)
+
+		# 4. Riga del campione nel sommario --------------------------------------------------------------------------------
+		update_summary(os.path.join(row.pathSummaries, row.nameSummary), dataset_name, new_dataset_name, len(sample))
+
+		total_time_sample = float(time.perf_counter() - start_time_sample)
+		print(f"<System> Sample '{new_dataset_name}' saved: {len(sample)} geometries in {len(sample_rows)} partitions.")
+		print(f"<System>      Time taken: {total_time_sample:.6f} s")
+
+	print()
+	print("<System> Program finished.\n")
+
+if __name__ == "__main__":
+	main()